@@ -1,43 +1,454 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_app_context, has_request_context, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider, JSONProvider
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from flask_sqlalchemy.session import Session
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import and_, create_engine, delete, event, func, insert, or_, select, text, union_all, update
+from sqlalchemy.orm import aliased
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import base64
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
 import jwt
 import bcrypt
 import os
+import re
+import signal
+import socket
+import threading
+import time
 from functools import wraps
+import math
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from hashing import HashPool, PoolBusy, hash_rounds
+from ids import new_id
+import archive
+import events
+import click
+import hierarchy
+import jobs
+import metrics
+import migrations
+import ratelimit
+import rollups
+import storage
+import tenancy
+
+# JSON providers: datetimes are serialized as ISO 8601 by both, so
+# serializers can hand them over as-is
+class IsoJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+class OrjsonProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+    
+    def dumpb(self, obj):
+        return orjson.dumps(obj)
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype='application/json')
 
 app = Flask(__name__)
+if orjson and os.environ.get('JSON_PROVIDER', 'orjson') == 'orjson':
+    app.json = OrjsonProvider(app)
+else:
+    app.json = IsoJSONProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 
-# Use persistent database path for Docker
-db_path = os.environ.get('DATABASE_PATH', '/app/data/feedback.db')
-os.makedirs(os.path.dirname(db_path), exist_ok=True)
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+# DATABASE_URL (e.g. a PostgreSQL DSN) takes precedence over the SQLite file;
+# DATABASE_READ_URL can point read-only traffic at a replica
+database_url = os.environ.get('DATABASE_URL')
+if database_url:
+    write_url = storage.normalize_url(database_url)
+    read_url = storage.normalize_url(os.environ.get('DATABASE_READ_URL', database_url))
+else:
+    # Use persistent database path for Docker
+    db_path = os.environ.get('DATABASE_PATH', '/app/data/feedback.db')
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    write_url = storage.sqlite_uri(db_path)
+    read_url = storage.sqlite_uri(db_path, readonly=True)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+app.config['DB_READ_POOL_SIZE'] = int(os.environ.get('DB_READ_POOL_SIZE', 20))
+app.config['DB_READ_MAX_OVERFLOW'] = int(os.environ.get('DB_READ_MAX_OVERFLOW', 40))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+# Negative values are KiB, so this is a 64 MiB page cache per connection
+app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))
+app.config['SQLALCHEMY_DATABASE_URI'] = write_url
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = storage.engine_options(app.config, url=write_url)
+# Read-only endpoints use their own pool so they never queue behind writers
+app.config['SQLALCHEMY_BINDS'] = {
+    'readonly': {
+        'url': read_url,
+        **storage.engine_options(app.config, readonly=True, url=read_url)
+    }
+}
+# Further databases for tenants' rows (see tenancy.py), as name=url pairs:
+# "big=postgresql://db2/feedback; eu=sqlite:////app/data/eu.db". A URL with
+# options=-csearch_path%3D<schema> makes a schema in a shared database a shard
+app.config['SHARDS'] = tenancy.parse_shards(os.environ.get('SHARDS', ''))
+for shard, shard_url in app.config['SHARDS'].items():
+    shard_url = storage.normalize_url(shard_url)
+    shard_read_url = storage.readonly_url(shard_url)
+    app.config['SQLALCHEMY_BINDS'][tenancy.bind_key(shard)] = {
+        'url': shard_url,
+        **storage.engine_options(app.config, url=shard_url)
+    }
+    app.config['SQLALCHEMY_BINDS'][tenancy.bind_key(shard, readonly=True)] = {
+        'url': shard_read_url,
+        **storage.engine_options(app.config, readonly=True, url=shard_read_url)
+    }
+# Tenant for logins that don't name one
+app.config['DEFAULT_TENANT'] = os.environ.get('DEFAULT_TENANT', tenancy.DEFAULT_TENANT)
+# How long each process trusts its cached copy of the tenant directory
+app.config['TENANT_CACHE_TTL'] = float(os.environ.get('TENANT_CACHE_TTL', 5))
+app.config['FEEDBACK_PAGE_SIZE'] = int(os.environ.get('FEEDBACK_PAGE_SIZE', 50))
+app.config['FEEDBACK_MAX_PAGE_SIZE'] = int(os.environ.get('FEEDBACK_MAX_PAGE_SIZE', 200))
+app.config['FEEDBACK_BATCH_LIMIT'] = int(os.environ.get('FEEDBACK_BATCH_LIMIT', 500))
+app.config['SEARCH_PAGE_SIZE'] = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+# Rows fetched per round trip and written per chunk by exports
+app.config['EXPORT_CHUNK_SIZE'] = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+app.config['ANALYTICS_MAX_BUCKETS'] = int(os.environ.get('ANALYTICS_MAX_BUCKETS', 400))
+app.config['EVENT_BROKER_URL'] = os.environ.get('EVENT_BROKER_URL')
+app.config['EVENT_HISTORY'] = int(os.environ.get('EVENT_HISTORY', 1000))
+app.config['SSE_HEARTBEAT'] = float(os.environ.get('SSE_HEARTBEAT', 15))
+app.config['SSE_RETRY_MS'] = int(os.environ.get('SSE_RETRY_MS', 3000))
+app.config['SSE_TOKEN_TTL'] = int(os.environ.get('SSE_TOKEN_TTL', 60))
+# Open event streams per process; 0 leaves /api/events to another deployment.
+# gunicorn.conf.py sizes it from the worker's threads or connections, and the
+# development server starts a thread per request
+app.config['SSE_MAX_STREAMS'] = int(os.environ.get('SSE_MAX_STREAMS', 16))
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+# Writes drop the user from their own process's cache only, so other workers
+# keep accepting a revoked token for up to USER_CACHE_TTL seconds
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 5))
+app.config['BCRYPT_ROUNDS'] = int(os.environ.get('BCRYPT_ROUNDS', 12))
+app.config['LOGIN_HASH_WORKERS'] = int(os.environ.get('LOGIN_HASH_WORKERS', 2))
+app.config['LOGIN_QUEUE_SIZE'] = int(os.environ.get('LOGIN_QUEUE_SIZE', 16))
+app.config['LOGIN_QUEUE_TIMEOUT'] = float(os.environ.get('LOGIN_QUEUE_TIMEOUT', 2))
+# Token-bucket rate limits (see ratelimit.py) as endpoint.scope=N/period rules.
+# Scopes are ip, user (from the token) and account (the login email from
+# one client IP); a route's own rule for a scope replaces the default one.
+# RATE_LIMITS is applied on top of these, e.g. "login.ip=60/minute; default.user=off"
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+app.config['RATE_LIMITS'] = ratelimit.parse_rules(
+    'default.ip=600/minute; default.user=300/minute;'
+    'login.ip=30/minute; login.account=10/minute;'
+    'create_feedback_batch.user=30/minute; export_feedback.user=10/minute; event_stream.user=30/minute;'
+    + os.environ.get('RATE_LIMITS', '')
+)
+# Share buckets between workers through Redis (redis://...); in memory per process otherwise
+app.config['RATE_LIMIT_STORAGE_URL'] = os.environ.get('RATE_LIMIT_STORAGE_URL')
+app.config['RATE_LIMIT_MAX_KEYS'] = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+# Reverse proxies in front of the app whose X-Forwarded-For is trusted for the client IP
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# Requests slower than this get their sampled stacks written to PROFILE_DIR; 0 turns the profiler off
+app.config['PROFILE_SLOW_REQUEST_MS'] = float(os.environ.get('PROFILE_SLOW_REQUEST_MS', 0))
+app.config['PROFILE_INTERVAL_MS'] = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', '/app/data/profiles')
+# Startup: migrate and seed from create_app, or leave both to `flask init-db`
+app.config['INIT_DB_ON_START'] = os.environ.get('INIT_DB_ON_START', 'true').lower() == 'true'
+app.config['SEED_DEMO_DATA'] = os.environ.get('SEED_DEMO_DATA', 'true').lower() == 'true'
+app.config['DEMO_FIXTURE'] = os.environ.get('DEMO_FIXTURE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'demo.json'))
+# Notification transports: smtp(s)://, an http(s):// chat webhook, log:// or fake://.
+# A channel with no transport is off and nothing is queued for it
+app.config['NOTIFY_EMAIL_URL'] = os.environ.get('NOTIFY_EMAIL_URL')
+app.config['NOTIFY_CHAT_URL'] = os.environ.get('NOTIFY_CHAT_URL')
+app.config['NOTIFY_TIMEOUT'] = float(os.environ.get('NOTIFY_TIMEOUT', 10))
+# Background job worker (flask --app app run-worker)
+app.config['JOB_BATCH_SIZE'] = int(os.environ.get('JOB_BATCH_SIZE', 100))
+app.config['JOB_POLL_INTERVAL'] = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+app.config['JOB_LEASE_SECONDS'] = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 8))
+app.config['JOB_BACKOFF_BASE'] = float(os.environ.get('JOB_BACKOFF_BASE', 10))
+app.config['JOB_BACKOFF_CAP'] = float(os.environ.get('JOB_BACKOFF_CAP', 3600))
+app.config['JOB_RETENTION_DAYS'] = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+# Employees with feedback left unacknowledged this long get a reminder every REMINDER_INTERVAL_HOURS
+app.config['REMINDER_AFTER_HOURS'] = float(os.environ.get('REMINDER_AFTER_HOURS', 72))
+app.config['REMINDER_INTERVAL_HOURS'] = float(os.environ.get('REMINDER_INTERVAL_HOURS', 24))
+app.config['REMINDER_SCAN_MINUTES'] = float(os.environ.get('REMINDER_SCAN_MINUTES', 15))
+# Acknowledged feedback older than this moves to the compressed archive (see
+# archive.py), which reads only reach with include_archived=true; 0 keeps everything hot
+app.config['FEEDBACK_ARCHIVE_AFTER_DAYS'] = float(os.environ.get('FEEDBACK_ARCHIVE_AFTER_DAYS', 0))
+app.config['FEEDBACK_ARCHIVE_INTERVAL_HOURS'] = float(os.environ.get('FEEDBACK_ARCHIVE_INTERVAL_HOURS', 24))
+# Rows moved per transaction, so writers never wait long on the archiver
+app.config['FEEDBACK_ARCHIVE_BATCH_SIZE'] = int(os.environ.get('FEEDBACK_ARCHIVE_BATCH_SIZE', 1000))
+
+def current_shard():
+    # Set per request by route_to_tenant() and by use_shard() in commands
+    return g.get('shard', tenancy.DEFAULT_SHARD) if has_app_context() else tenancy.DEFAULT_SHARD
+
+def shard_names():
+    return [tenancy.DEFAULT_SHARD, *app.config['SHARDS']]
+
+class ShardSession(Session):
+    # db.session: every statement goes to the current shard's writer
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind if bind is not None else self._db.engines[tenancy.bind_key(current_shard())]
+
+db = SQLAlchemy(app, session_options={'class_': ShardSession})
+# Expose the rate limit headers so the SPA can back off
+CORS(app, expose_headers=['ETag', 'Retry-After', 'RateLimit-Limit', 'RateLimit-Remaining', 'RateLimit-Reset', 'RateLimit-Policy'])
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+with app.app_context():
+    for shard in shard_names():
+        storage.install_sqlite_pragmas(db.engines[tenancy.bind_key(shard)], storage.sqlite_pragmas(app.config))
+        storage.install_sqlite_pragmas(db.engines[tenancy.bind_key(shard, readonly=True)], storage.sqlite_pragmas(app.config, readonly=True))
+    read_session = storage.create_read_session(lambda: db.engines[tenancy.bind_key(current_shard(), readonly=True)])
+
+@contextmanager
+def use_shard(shard):
+    # Points db.session and read_session at another shard for a command's
+    # work; both are closed on the way in and out so no transaction spans two
+    previous = current_shard()
+    db.session.close()
+    read_session.close()
+    g.shard = shard
+    try:
+        yield
+    finally:
+        db.session.close()
+        read_session.close()
+        g.shard = previous
+
+@app.teardown_appcontext
+def remove_read_session(exception=None):
+    read_session.remove()
+
+# Instrumentation, exposed in Prometheus text format at /metrics
+registry = metrics.Registry()
+request_seconds = registry.histogram('http_request_duration_seconds', 'Time to build a response, by route.', ('method', 'route', 'status'))
+request_queries = registry.histogram('http_request_db_queries', 'SQL statements executed per request.', ('route',), metrics.COUNT_BUCKETS)
+request_query_seconds = registry.histogram('http_request_db_seconds', 'Time spent executing SQL per request.', ('route',))
+query_seconds = registry.histogram('db_query_duration_seconds', 'SQL statement execution time.', ('bind',))
+bcrypt_seconds = registry.histogram('bcrypt_duration_seconds', 'bcrypt hash and check time in the login pool.', ('operation',))
+bcrypt_wait_seconds = registry.histogram('bcrypt_queue_wait_seconds', 'Time spent waiting for a login pool slot.', ('operation',))
+jwt_seconds = registry.histogram('jwt_duration_seconds', 'JWT encode and decode time.', ('operation',))
+slow_profiles = registry.counter('slow_request_profiles_total', 'Slow requests whose stacks were written to PROFILE_DIR.', ('route',))
+rate_limited = registry.counter('rate_limited_requests_total', 'Requests rejected with 429 by a rate limit.', ('route', 'scope'))
+
+profiler = None
+if app.config['PROFILE_SLOW_REQUEST_MS'] > 0:
+    profiler = metrics.SlowRequestProfiler(
+        app.config['PROFILE_SLOW_REQUEST_MS'] / 1000,
+        app.config['PROFILE_INTERVAL_MS'] / 1000,
+        app.config['PROFILE_DIR']
+    )
+
+def instrument_engine(engine, bind):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
 
-db = SQLAlchemy(app)
-CORS(app)
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('query_start')
+        query_seconds.observe(elapsed, bind=bind)
+        if has_request_context():
+            g.db_queries = g.get('db_queries', 0) + 1
+            g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+
+if app.config['METRICS_ENABLED']:
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_engine(engine, bind or 'primary')
+
+if app.config['METRICS_ENABLED'] or profiler:
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        if profiler:
+            profiler.start()
+
+    # Registered before compress_response so it runs after it (after_request
+    # hooks run in reverse); streamed bodies are timed to their first byte
+    @app.after_request
+    def record_request_metrics(response):
+        elapsed = time.perf_counter() - g.request_start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        request_queries.observe(g.get('db_queries', 0), route=route)
+        request_query_seconds.observe(g.get('db_seconds', 0.0), route=route)
+        if profiler and profiler.stop(elapsed, f'{request.method} {route}'):
+            slow_profiles.inc(route=route)
+        return response
+
+# Response compression for large JSON bodies
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough
+            or response.mimetype != 'application/json'
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.content_length is None
+            or response.content_length < app.config['COMPRESS_MIN_SIZE']):
+        return response
+    
+    accepted = request.accept_encodings
+    if brotli and accepted['br']:
+        encoding = 'br'
+        body = brotli.compress(response.get_data(), quality=min(app.config['COMPRESS_LEVEL'], 11))
+    elif accepted['gzip']:
+        encoding = 'gzip'
+        body = gzip.compress(response.get_data(), compresslevel=app.config['COMPRESS_LEVEL'])
+    else:
+        return response
+    
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # A strong ETag has to differ between encodings of the same resource
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+# Real-time events; set EVENT_BROKER_URL (redis://...) when running more than one worker
+broker = events.create_broker(app.config['EVENT_BROKER_URL'], app.config['EVENT_HISTORY'])
+# Each open stream occupies a worker thread (or greenlet) until the client leaves
+event_streams = threading.BoundedSemaphore(app.config['SSE_MAX_STREAMS']) if app.config['SSE_MAX_STREAMS'] else None
+
+# Notifications are delivered by the job worker, never on the request path
+transports = {
+    'email': jobs.create_transport('email', app.config['NOTIFY_EMAIL_URL'], app.config['NOTIFY_TIMEOUT']),
+    'chat': jobs.create_transport('chat', app.config['NOTIFY_CHAT_URL'], app.config['NOTIFY_TIMEOUT'])
+}
+notify_channels = tuple(channel for channel, transport in transports.items() if transport)
+
+# bcrypt checks for /api/auth/login run here so a login storm can't tie up every request thread
+def observe_hash(operation, wait_seconds, run_seconds):
+    bcrypt_wait_seconds.observe(wait_seconds, operation=operation)
+    bcrypt_seconds.observe(run_seconds, operation=operation)
+
+login_pool = HashPool(
+    app.config['LOGIN_HASH_WORKERS'],
+    app.config['LOGIN_QUEUE_SIZE'],
+    app.config['LOGIN_QUEUE_TIMEOUT'],
+    observer=observe_hash
+)
+
+# Rate limiting. Per-IP buckets are checked before any other work; per-user
+# ones in token_required once the token is verified, so a forged token
+# can't spend someone else's quota
+rate_limit_store = ratelimit.create_store(app.config['RATE_LIMIT_STORAGE_URL'], app.config['RATE_LIMIT_MAX_KEYS'])
+if isinstance(rate_limit_store, ratelimit.MemoryStore):
+    registry.gauge('rate_limit_buckets', 'Rate limit buckets held in memory by this process.', (),
+                   lambda: [(len(rate_limit_store),)])
+
+def check_rate_limit(scope, identity):
+    # Returns a 429 response once identity has run out of tokens on this route
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return None
+    rules = app.config['RATE_LIMITS']
+    name = request.endpoint if scope in rules.get(request.endpoint, {}) else 'default'
+    limit = rules.get(name, {}).get(scope)
+    if limit is None:
+        return None
+    try:
+        decision = rate_limit_store.take(f'{scope}:{name}:{identity}', limit)
+    except Exception:
+        # Fail open; a store outage must not take the API down with it
+        app.logger.exception('Rate limit check failed')
+        return None
+    # The headers describe whichever bucket is closest to running out
+    current = g.get('rate_limit')
+    if current is None or not decision.allowed or (current.allowed and decision.remaining < current.remaining):
+        g.rate_limit = decision
+    if decision.allowed:
+        return None
+    rate_limited.inc(route=request.url_rule.rule if request.url_rule else 'unmatched', scope=scope)
+    return jsonify({'message': 'Too many requests, please slow down'}), 429
+
+@app.before_request
+def limit_by_ip():
+    if request.path.startswith('/api/') and request.method != 'OPTIONS':
+        return check_rate_limit('ip', request.remote_addr)
+
+@app.after_request
+def add_rate_limit_headers(response):
+    decision = g.get('rate_limit')
+    if decision:
+        response.headers['RateLimit-Limit'] = str(decision.limit.count)
+        response.headers['RateLimit-Remaining'] = str(decision.remaining)
+        response.headers['RateLimit-Reset'] = str(math.ceil(decision.reset))
+        response.headers['RateLimit-Policy'] = f'{decision.limit.count};w={decision.limit.period}'
+        if not decision.allowed:
+            response.headers['Retry-After'] = str(max(1, math.ceil(decision.retry_after)))
+    return response
 
 # Database Models
+
+# Directory of organizations and the shard holding each one's rows. Every
+# shard has the table, but only the primary database's copy is read
+class Tenant(db.Model):
+    id = db.Column(db.String(50), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    shard = db.Column(db.String(50), nullable=False, default=tenancy.DEFAULT_SHARD)
+    status = db.Column(db.String(20), nullable=False, default=tenancy.ACTIVE)  # 'active' or 'moving'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class User(db.Model):
     id = db.Column(db.String(50), primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    tenant_id = db.Column(db.String(50), nullable=False, default=tenancy.DEFAULT_TENANT, server_default=tenancy.DEFAULT_TENANT)
+    email = db.Column(db.String(120), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    role = db.Column(db.String(20), nullable=False)  # 'manager' or 'employee'
+    role = db.Column(db.String(20), nullable=False)  # 'manager', 'employee' or 'admin' (HR)
     team_id = db.Column(db.String(50), nullable=False)
     manager_id = db.Column(db.String(50), nullable=True)
+    # Bumped whenever token claims change; tokens carrying an older value are rejected
+    token_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Emails are unique within an organization
+    __table_args__ = (
+        db.Index('ix_user_tenant_email', 'tenant_id', 'email', unique=True),
+    )
 
 class Team(db.Model):
     id = db.Column(db.String(50), primary_key=True)
+    tenant_id = db.Column(db.String(50), nullable=False, default=tenancy.DEFAULT_TENANT, server_default=tenancy.DEFAULT_TENANT)
     name = db.Column(db.String(100), nullable=False)
     manager_id = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Feedback(db.Model):
     id = db.Column(db.String(50), primary_key=True)
+    tenant_id = db.Column(db.String(50), nullable=False, default=tenancy.DEFAULT_TENANT, server_default=tenancy.DEFAULT_TENANT)
     manager_id = db.Column(db.String(50), nullable=False)
     employee_id = db.Column(db.String(50), nullable=False)
     strengths = db.Column(db.Text, nullable=False)
@@ -47,43 +458,400 @@ class Feedback(db.Model):
     acknowledged_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by every write; it is the row's ETag, and If-Match on a write must name it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # Keyset pagination walks (owner, created_at, id) newest first
+    __table_args__ = (
+        db.Index('ix_feedback_manager_created', 'manager_id', 'created_at', 'id'),
+        db.Index('ix_feedback_employee_created', 'employee_id', 'created_at', 'id'),
+        # Organization-wide reads (HR exports) walk one tenant in id order
+        db.Index('ix_feedback_tenant', 'tenant_id', 'id'),
+    )
+
+# Cold tier of Feedback (see archive.py): the columns reads filter and sort
+# by, plus everything else compressed into payload. Archived rows are read-only
+class FeedbackArchive(db.Model):
+    id = db.Column(db.String(50), primary_key=True)
+    tenant_id = db.Column(db.String(50), nullable=False)
+    manager_id = db.Column(db.String(50), nullable=False)
+    employee_id = db.Column(db.String(50), nullable=False)
+    sentiment = db.Column(db.String(20), nullable=False)
+    acknowledged = db.Column(db.Boolean)
+    acknowledged_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON of the remaining Feedback columns
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_feedback_archive_manager_created', 'manager_id', 'created_at', 'id'),
+        db.Index('ix_feedback_archive_employee_created', 'employee_id', 'created_at', 'id'),
+        db.Index('ix_feedback_archive_tenant', 'tenant_id', 'id'),
+    )
+
+# Running totals per manager and employee, upserted by every Feedback write
+# so the dashboard never has to scan feedback history. archived_* columns
+# hold the same totals for the archive, which archiving moves counts into.
+# `version` goes up with each write to the pair and versions the feedback
+# list's ETag
+class FeedbackCounter(db.Model):
+    manager_id = db.Column(db.String(50), primary_key=True)
+    employee_id = db.Column(db.String(50), primary_key=True)
+    positive = db.Column(db.Integer, nullable=False, default=0)
+    neutral = db.Column(db.Integer, nullable=False, default=0)
+    negative = db.Column(db.Integer, nullable=False, default=0)
+    acknowledged = db.Column(db.Integer, nullable=False, default=0)
+    archived_positive = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    archived_neutral = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    archived_negative = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    archived_acknowledged = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_feedback_counter_employee', 'employee_id'),
+    )
+
+# Daily and weekly series for /api/analytics/trends, upserted alongside
+# Feedback writes (see rollups.py)
+class FeedbackRollup(db.Model):
+    period = db.Column(db.String(10), primary_key=True)  # 'day' or 'week'
+    bucket_start = db.Column(db.Date, primary_key=True)
+    manager_id = db.Column(db.String(50), primary_key=True)
+    employee_id = db.Column(db.String(50), primary_key=True)
+    positive = db.Column(db.Integer, nullable=False, default=0)
+    neutral = db.Column(db.Integer, nullable=False, default=0)
+    negative = db.Column(db.Integer, nullable=False, default=0)
+    acknowledged = db.Column(db.Integer, nullable=False, default=0)
+    ack_seconds_total = db.Column(db.Float, nullable=False, default=0)
+    # Acknowledgement latency histogram, rollups.LATENCY_BUCKETS
+    ack_le_5m = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_15m = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_1h = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_4h = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_12h = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_1d = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_2d = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_3d = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_7d = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_14d = db.Column(db.Integer, nullable=False, default=0)
+    ack_le_30d = db.Column(db.Integer, nullable=False, default=0)
+    ack_gt_30d = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_feedback_rollup_manager', 'manager_id', 'period', 'bucket_start'),
+        db.Index('ix_feedback_rollup_employee', 'employee_id', 'period', 'bucket_start'),
+    )
+
+# Transitive closure of User.manager_id (see hierarchy.py), maintained by
+# the User mapper events below
+class UserHierarchy(db.Model):
+    ancestor_id = db.Column(db.String(50), primary_key=True)
+    descendant_id = db.Column(db.String(50), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_user_hierarchy_descendant', 'descendant_id', 'depth'),
+    )
+
+# Background work queued by writes and drained by the worker (see jobs.py)
+class Job(db.Model):
+    id = db.Column(db.String(50), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default=jobs.PENDING)  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    # When the job is next due; while running, its lease expiry; once done, when it finished
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_due', 'status', 'run_at'),
+    )
+
+def job_queue_depth():
+    # Summed over shards; each has its own queue
+    depth = {}
+    for shard in shard_names():
+        with db.engines[tenancy.bind_key(shard, readonly=True)].connect() as connection:
+            for kind, status, count in jobs.depth(connection, Job.__table__):
+                depth[kind, status] = depth.get((kind, status), 0) + count
+    return [(kind, status, count) for (kind, status), count in depth.items()]
+
+registry.gauge('job_queue_depth', 'Jobs not yet done, by kind and status.', ('kind', 'status'), job_queue_depth)
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+# In-process user cache, keyed by (shard, user id): user ids are only
+# unique within a shard
+CachedUser = namedtuple('CachedUser', 'id tenant_id email name role team_id manager_id token_version')
+
+# What token_required hands to routes, built from the token claims alone
+TokenUser = namedtuple('TokenUser', 'id tenant_id role team_id manager_id')
+
+class UserCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+    
+    def put(self, key, user):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+user_cache = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+def load_user(user_id):
+    key = (current_shard(), user_id)
+    user = user_cache.get(key)
+    if user is None:
+        row = read_session.get(User, user_id)
+        if not row:
+            return None
+        user = CachedUser(row.id, row.tenant_id, row.email, row.name, row.role, row.team_id, row.manager_id,
+                          row.token_version)
+        user_cache.put(key, user)
+    return user
+
+TOKEN_CLAIM_FIELDS = ('role', 'team_id', 'manager_id', 'password_hash')
+
+@event.listens_for(User, 'before_update')
+def bump_token_version(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in TOKEN_CLAIM_FIELDS):
+        target.token_version = (target.token_version or 1) + 1
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate((current_shard(), target.id))
+
+# Managers must be flushed before (or with, ahead of) their reports
+@event.listens_for(User, 'after_insert')
+def add_to_hierarchy(mapper, connection, target):
+    hierarchy.insert_user(connection, UserHierarchy.__table__, target.id, target.manager_id)
+
+@event.listens_for(User, 'after_update')
+def move_in_hierarchy(mapper, connection, target):
+    if db.inspect(target).attrs.manager_id.history.has_changes():
+        hierarchy.move_subtree(connection, UserHierarchy.__table__, target.id, target.manager_id)
+
+@event.listens_for(User, 'after_delete')
+def remove_from_hierarchy(mapper, connection, target):
+    hierarchy.remove_user(connection, UserHierarchy.__table__, target.id)
+
+def reports_of(manager_id):
+    # Everyone under manager_id at any depth, served by the hierarchy primary key
+    return select(UserHierarchy.descendant_id).where(UserHierarchy.ancestor_id == manager_id, UserHierarchy.depth > 0)
+
+def is_report(manager_id, user_id):
+    return db.session.execute(
+        select(UserHierarchy.depth).where(
+            UserHierarchy.ancestor_id == manager_id,
+            UserHierarchy.descendant_id == user_id,
+            UserHierarchy.depth > 0
+        )
+    ).first() is not None
+
+def visible_feedback(current_user, model=Feedback):
+    # Managers see everything their reports (direct or skip-level) received
+    # and everything they wrote, which includes feedback for people who have
+    # since moved to another team. Employees see what they received.
+    # Works for any model with manager_id and employee_id columns
+    if current_user.role == 'manager':
+        return or_(model.employee_id.in_(reports_of(current_user.id)), model.manager_id == current_user.id)
+    return model.employee_id == current_user.id
+
+# SQLite's default cap on the SELECTs in one compound statement
+VISIBLE_BRANCHES_MAX = 500
+
+def visible_branches(current_user, model=Feedback):
+    # visible_feedback() as predicates that each match one (manager_id or
+    # employee_id, created_at, id) index range: what the manager wrote, then
+    # one per report. Past VISIBLE_BRANCHES_MAX reports the rest share a
+    # last branch, which is sorted rather than read in order
+    if current_user.role != 'manager':
+        return [model.employee_id == current_user.id]
+    reports = read_session.scalars(reports_of(current_user.id)).all()
+    branches = [model.manager_id == current_user.id]
+    if len(reports) >= VISIBLE_BRANCHES_MAX:
+        reports, rest = reports[:VISIBLE_BRANCHES_MAX - 2], reports[VISIBLE_BRANCHES_MAX - 2:]
+        branches.append(model.employee_id.in_(rest))
+    return branches + [model.employee_id == report for report in reports]
+
+def newest_visible(current_user, model, columns, filters, limit=None, **options):
+    # Newest first rows of one tier that current_user may see. The branches
+    # are read as one UNION ALL, which SQLite and PostgreSQL merge in index
+    # order, so a keyset page doesn't sort a manager's whole history. May
+    # return more than limit rows; archived rows come back unpacked
+    queries = [select(*columns).where(branch, *filters) for branch in visible_branches(current_user, model)]
+    query = queries[0] if len(queries) == 1 else union_all(*queries)
+    query = query.order_by(query.selected_columns.created_at.desc(), query.selected_columns.id.desc())
+    if limit is not None:
+        # Feedback a manager wrote for a report matches two branches
+        query = query.limit(limit if len(queries) == 1 else limit * 2)
+    rows = read_session.execute(query.execution_options(**options))
+    if len(queries) > 1:
+        rows = distinct_rows(rows)
+    return rows if model is Feedback else unpack_archived(rows)
+
+def distinct_rows(rows):
+    # Duplicates arrive next to each other in (created_at, id) order
+    last_id = None
+    for row in rows:
+        if row.id != last_id:
+            yield row
+        last_id = row.id
+
+def merge_newest(streams):
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda row: (row.created_at, row.id), reverse=True)
+
+# Tenant routing: the directory lives in the primary database and is cached
+# per process for TENANT_CACHE_TTL seconds
+def lookup_tenant(tenant_id):
+    with db.engine.connect() as connection:
+        row = connection.execute(select(Tenant.id, Tenant.shard, Tenant.status).where(Tenant.id == tenant_id)).first()
+    return tenancy.Tenant(*row) if row else None
+
+tenant_directory = tenancy.TenantDirectory(lookup_tenant, app.config['TENANT_CACHE_TTL'])
+
+def route_to_tenant(tenant_id):
+    # Sends the rest of this request's queries to the tenant's shard; None for unknown tenants
+    tenant = tenant_directory.get(tenant_id)
+    if tenant is not None:
+        g.shard = tenant.shard
+    return tenant
+
+def tenant_frozen(tenant):
+    # While a tenant moves between shards its rows are read from the old
+    # shard, and writes would be lost, so they are refused
+    if tenant.status == tenancy.MOVING and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return jsonify({'message': 'Your organization is being moved, please retry shortly'}), 503, {'Retry-After': '30'}
+    return None
 
 # Authentication decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
+        # EventSource can't send headers, so streaming routes opt in to a query
+        # token. Only short-lived stream tokens are taken from the URL, and
+        # they are good for nothing else (see generate_stream_token)
+        in_query = not token and getattr(f, 'query_token_allowed', False)
+        if in_query:
+            token = request.args.get('access_token')
         if not token:
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
+            start = time.perf_counter()
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
-            if not current_user:
+            jwt_seconds.observe(time.perf_counter() - start, operation='decode')
+            if in_query != (data.get('scope') == 'events'):
+                return jsonify({'message': 'Invalid token'}), 401
+            # Tokens issued before tenants existed belong to the default one
+            tenant = route_to_tenant(data.get('tenant', tenancy.DEFAULT_TENANT))
+            if not tenant:
+                return jsonify({'message': 'Invalid token'}), 401
+            user = load_user(data['user_id'])
+            # The user must still belong to the organization the token names
+            if not user or user.tenant_id != tenant.id:
                 return jsonify({'message': 'Invalid token'}), 401
+            # Tokens issued before claims were embedded carry no version
+            if data.get('ver', 1) != user.token_version:
+                return jsonify({'message': 'Token has been revoked'}), 401
+            if 'role' in data:
+                current_user = TokenUser(user.id, tenant.id, data['role'], data['team_id'], data['manager_id'])
+            else:
+                current_user = TokenUser(user.id, tenant.id, user.role, user.team_id, user.manager_id)
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Invalid token'}), 401
         
+        frozen = tenant_frozen(tenant)
+        if frozen:
+            return frozen
+        limited = check_rate_limit('user', f'{tenant.id}:{current_user.id}')
+        if limited:
+            return limited
         return f(current_user, *args, **kwargs)
     return decorated
 
+def query_token_allowed(f):
+    f.query_token_allowed = True
+    return f
+
 # Helper functions
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(app.config['BCRYPT_ROUNDS'])).decode('utf-8')
 
 def check_password(password, hashed):
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def generate_token(user_id):
-    payload = {
-        'user_id': user_id,
+def encode_token(payload):
+    start = time.perf_counter()
+    token = jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+    jwt_seconds.observe(time.perf_counter() - start, operation='encode')
+    return token
+
+def generate_token(user):
+    return encode_token({
+        'user_id': user.id,
+        'tenant': user.tenant_id,
+        'role': user.role,
+        'team_id': user.team_id,
+        'manager_id': user.manager_id,
+        'ver': user.token_version,
         'exp': datetime.utcnow() + timedelta(days=7)
-    }
-    return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+    })
+
+def generate_stream_token(current_user, token_version):
+    # EventSource can only send credentials in the URL, where they may end
+    # up in proxy and server logs, so this token expires within
+    # SSE_TOKEN_TTL seconds and is refused by every other route
+    return encode_token({
+        'user_id': current_user.id,
+        'tenant': current_user.tenant_id,
+        'role': current_user.role,
+        'team_id': current_user.team_id,
+        'manager_id': current_user.manager_id,
+        'ver': token_version,
+        'scope': 'events',
+        'exp': datetime.utcnow() + timedelta(seconds=app.config['SSE_TOKEN_TTL'])
+    })
 
 def user_to_dict(user):
     return {
@@ -95,24 +863,726 @@ def user_to_dict(user):
         'managerId': user.manager_id
     }
 
+# Column order matches FEEDBACK_KEYS; list endpoints select these directly
+# instead of hydrating Feedback objects
+FEEDBACK_COLUMNS = (
+    Feedback.id, Feedback.manager_id, Feedback.employee_id, Feedback.strengths,
+    Feedback.areas_to_improve, Feedback.sentiment, Feedback.acknowledged,
+    Feedback.acknowledged_at, Feedback.created_at, Feedback.updated_at, Feedback.version
+)
+FEEDBACK_KEYS = (
+    'id', 'managerId', 'employeeId', 'strengths',
+    'areasToImprove', 'sentiment', 'acknowledged',
+    'acknowledgedAt', 'createdAt', 'updatedAt', 'version'
+)
+
 def feedback_to_dict(feedback):
+    return {key: getattr(feedback, column.key) for key, column in zip(FEEDBACK_KEYS, FEEDBACK_COLUMNS)}
+
+def feedback_row_to_dict(row):
+    return dict(zip(FEEDBACK_KEYS, row))
+
+# Archived rows are unpacked into the shape of FEEDBACK_COLUMNS rows, so
+# paging and rendering treat both tiers alike
+ArchivedFeedback = namedtuple('ArchivedFeedback', [column.key for column in FEEDBACK_COLUMNS])
+
+def unpack_archived(rows):
+    for row in rows:
+        values = archive.unpack(row._mapping, Feedback.__table__)
+        yield ArchivedFeedback(**{field: values[field] for field in ArchivedFeedback._fields})
+
+COUNTER_COLUMNS = SENTIMENTS + ('acknowledged',)
+ARCHIVED_COUNTER_COLUMNS = tuple(f'archived_{column}' for column in COUNTER_COLUMNS)
+
+def add_to_counters(deltas, manager_id, employee_id, **values):
+    # Accumulates into {(manager_id, employee_id): {column: delta}}. Each
+    # recorded pair's version goes up by one plus any `version` delta, so a
+    # pair added with no values is just marked as changed
+    row = deltas.setdefault((manager_id, employee_id), {})
+    for column, value in values.items():
+        row[column] = row.get(column, 0) + value
+
+def record_counters(deltas):
+    # Same transaction as the feedback write. One upsert creates missing rows
+    # and adds to existing ones, so concurrent first writes for a pair can't
+    # collide; rows go in key order so writers lock them in the same order
+    if not deltas:
+        return
+    table = FeedbackCounter.__table__
+    statement = storage.dialect_insert(db.session.connection(), table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['manager_id', 'employee_id'],
+        set_={column: table.c[column] + statement.excluded[column]
+              for column in COUNTER_COLUMNS + ARCHIVED_COUNTER_COLUMNS + ('version',)}
+    )
+    db.session.execute(statement, [
+        {'manager_id': manager_id, 'employee_id': employee_id, 'version': values.get('version', 0) + 1,
+         **{column: values.get(column, 0) for column in COUNTER_COLUMNS + ARCHIVED_COUNTER_COLUMNS}}
+        for (manager_id, employee_id), values in sorted(deltas.items())
+    ])
+
+def counter_stats(*conditions, include_archived=False):
+    # Sums the counter rows matching `conditions`; a pair without feedback has no row
+    columns = COUNTER_COLUMNS + ARCHIVED_COUNTER_COLUMNS if include_archived else COUNTER_COLUMNS
+    row = read_session.execute(
+        select(*[func.coalesce(func.sum(FeedbackCounter.__table__.c[column]), 0) for column in columns])
+            .where(*conditions)
+    ).one()
+    totals = dict(zip(columns, row))
+    return {column: totals[column] + totals.get(f'archived_{column}', 0) for column in COUNTER_COLUMNS}
+
+def counter_values(prefix, sentiment, acknowledged, count=1):
+    # The counter columns `count` feedback rows add to, in the hot columns or the archived_ ones
+    values = {prefix + sentiment: count} if sentiment in SENTIMENTS else {}
+    if acknowledged:
+        values[prefix + 'acknowledged'] = count
+    return values
+
+def rebuild_counters():
+    # Recomputes every counter from feedback history in one transaction.
+    # Versions carry on from the old rows, so no list ETag is reused
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE feedback IN SHARE MODE'))
+    versions = {(manager_id, employee_id): version for manager_id, employee_id, version in db.session.execute(
+        select(FeedbackCounter.manager_id, FeedbackCounter.employee_id, FeedbackCounter.version))}
+    db.session.execute(delete(FeedbackCounter))
+    
+    deltas = {}
+    for model, prefix in ((Feedback, ''), (FeedbackArchive, 'archived_')):
+        rows = db.session.execute(
+            select(model.manager_id, model.employee_id, model.sentiment, model.acknowledged, func.count())
+                .group_by(model.manager_id, model.employee_id, model.sentiment, model.acknowledged)
+        )
+        for manager_id, employee_id, sentiment, acknowledged, count in rows:
+            add_to_counters(deltas, manager_id, employee_id, **counter_values(prefix, sentiment, acknowledged, count))
+    for pair, version in versions.items():
+        if pair in deltas:
+            add_to_counters(deltas, *pair, version=version)
+    record_counters(deltas)
+    db.session.commit()
+    return len(deltas)
+
+def record_rollups(deltas):
+    # Same transaction as the feedback write; see rollups.py
+    rollups.upsert(db.session.connection(), FeedbackRollup.__table__, deltas)
+
+def rebuild_rollups(batch_size=5000):
+    # Recomputes every rollup from feedback history in one transaction
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Holds off feedback writes so none land between the scan and the commit;
+        # on SQLite the DELETE below already takes the write lock
+        db.session.execute(text('LOCK TABLE feedback IN SHARE MODE'))
+    db.session.execute(delete(FeedbackRollup))
+    
+    deltas = {}
+    # The lock also keeps the archiver from moving rows between the two scans
+    for model in (Feedback, FeedbackArchive):
+        rows = db.session.execute(
+            select(model.manager_id, model.employee_id, model.sentiment, model.acknowledged,
+                   model.acknowledged_at, model.created_at)
+                .where(model.created_at.isnot(None), model.sentiment.in_(SENTIMENTS))
+                .execution_options(yield_per=batch_size)
+        )
+        for row in rows:
+            rollups.add_feedback(deltas, row.manager_id, row.employee_id, row.sentiment, row.created_at,
+                                 row.acknowledged_at if row.acknowledged else None)
+    record_rollups(deltas)
+    db.session.commit()
+    return len(deltas)
+
+def rebuild_hierarchy():
+    users = db.session.execute(select(User.id, User.manager_id)).all()
+    db.session.execute(delete(UserHierarchy))
+    rows = hierarchy.closure_rows(users)
+    if rows:
+        db.session.execute(insert(UserHierarchy), rows)
+    db.session.commit()
+    return len(rows)
+
+def rollup_to_dict(start, values, percentiles):
+    total = sum(values.get(sentiment, 0) for sentiment in SENTIMENTS)
+    acknowledged = values.get('acknowledged', 0)
+    histogram = [values.get(column, 0) for column in rollups.LATENCY_COLUMNS]
+    latency = {'mean': values.get('ack_seconds_total', 0) / acknowledged if acknowledged else None}
+    for pct in percentiles:
+        latency[f'p{pct:g}'] = rollups.percentile(histogram, pct / 100)
+    return {
+        'start': start.isoformat(),
+        'total': total,
+        'sentiment': {sentiment: values.get(sentiment, 0) for sentiment in SENTIMENTS},
+        'acknowledged': acknowledged,
+        'ackLatencySeconds': latency
+    }
+
+def stats_to_dict(stats):
+    total = sum(stats[sentiment] for sentiment in SENTIMENTS)
     return {
-        'id': feedback.id,
-        'managerId': feedback.manager_id,
-        'employeeId': feedback.employee_id,
-        'strengths': feedback.strengths,
-        'areasToImprove': feedback.areas_to_improve,
-        'sentiment': feedback.sentiment,
-        'acknowledged': feedback.acknowledged,
-        'acknowledgedAt': feedback.acknowledged_at.isoformat() if feedback.acknowledged_at else None,
-        'createdAt': feedback.created_at.isoformat(),
-        'updatedAt': feedback.updated_at.isoformat()
+        'total': total,
+        'acknowledged': stats['acknowledged'],
+        'pending': total - stats['acknowledged'],
+        'sentiment': {sentiment: stats[sentiment] for sentiment in SENTIMENTS}
     }
 
+FEEDBACK_FIELDS = ('employeeId', 'strengths', 'areasToImprove', 'sentiment')
+EDITABLE_FIELDS = ('strengths', 'areasToImprove', 'sentiment')
+
+def validate_feedback_item(data, fields=FEEDBACK_FIELDS):
+    # Creates check every field; edits only the ones they send
+    for field in fields:
+        if not data.get(field):
+            return f'{field} is required'
+        if not isinstance(data[field], str):
+            return f'{field} must be a string'
+    
+    if 'sentiment' in fields and data['sentiment'] not in SENTIMENTS:
+        return 'sentiment must be one of positive, neutral, negative'
+    return None
+
+# Conditional GET: the ETag is derived from a cheap per-scope version, so a
+# 304 can be answered before the response body is built
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    # The 304 names the representation the client holds: compressed ones
+    # carry their encoding (see compress_response), as long as the client
+    # still accepts it
+    if_none_match = request.if_none_match
+    candidates = [etag] + [f'{etag}-{encoding}' for encoding in ('gzip', 'br') if request.accept_encodings[encoding]]
+    matched = etag if if_none_match.star_tag else next(filter(if_none_match.contains, candidates), None)
+    if matched is None:
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(matched)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Conditional writes: a feedback row's version is its ETag. A write is one
+# UPDATE ... RETURNING whose WHERE clause carries the id, the caller's
+# ownership and the If-Match version, so nothing is read before it; only a
+# write that matched no row looks the row up, to tell 404, 403 and 409 apart
+def if_match_versions():
+    # None when the client sent no If-Match (or *); ETags of compressed
+    # responses carry an encoding suffix
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    versions = []
+    for etag in if_match.as_set():
+        etag = etag.removesuffix('-gzip').removesuffix('-br')
+        if etag.isdigit():
+            versions.append(int(etag))
+    return versions
+
+def write_feedback(feedback_id, *conditions, **values):
+    # Returns the updated row as FEEDBACK_COLUMNS, or None if nothing matched
+    statement = update(Feedback).where(Feedback.id == feedback_id, *conditions)
+    versions = if_match_versions()
+    if versions is not None:
+        statement = statement.where(Feedback.version.in_(versions))
+    return db.session.execute(
+        statement.values(version=Feedback.version + 1, **values)
+            .returning(*FEEDBACK_COLUMNS)
+            .execution_options(synchronize_session=False)
+    ).first()
+
+def current_feedback(feedback_id):
+    # (feedback dict or None, whether it is archived)
+    row = db.session.execute(select(*FEEDBACK_COLUMNS).where(Feedback.id == feedback_id)).first()
+    if row:
+        return feedback_row_to_dict(row), False
+    rows = db.session.execute(select(*FeedbackArchive.__table__.columns).where(FeedbackArchive.id == feedback_id))
+    for row in unpack_archived(rows):
+        return feedback_row_to_dict(row), True
+    return None, False
+
+def feedback_response(feedback):
+    return with_etag(jsonify({'feedback': feedback}), str(feedback['version']))
+
+def feedback_conflict(feedback):
+    # The current row comes back so the client can merge and retry with its version
+    response = jsonify({'message': 'Feedback was changed by someone else', 'feedback': feedback})
+    return with_etag(response, str(feedback['version'])), 409
+
+def feedback_archived(feedback):
+    return jsonify({'message': 'Archived feedback can no longer be changed', 'feedback': feedback}), 409
+
+def event_channel(tenant_id, user_id):
+    # User ids are only unique within a shard, and a tenant keeps its id
+    # when it moves to another shard
+    return f'{tenant_id}:{user_id}'
+
+def publish_feedback_event(tenant_id, event, feedback):
+    # Delivery is best effort; a broker outage must not fail the write
+    try:
+        # Skip-level managers follow their reports' feedback too
+        ancestors = db.session.execute(
+            select(UserHierarchy.ancestor_id)
+                .where(UserHierarchy.descendant_id == feedback['employeeId'], UserHierarchy.depth > 0)
+        ).scalars().all()
+        broker.publish(
+            [event_channel(tenant_id, user_id) for user_id in (feedback['managerId'], feedback['employeeId'], *ancestors)],
+            event,
+            app.json.dumps({'feedback': feedback})
+        )
+    except Exception:
+        app.logger.exception('Failed to publish %s event', event)
+
+# Background jobs: writes enqueue them in their own transaction, which costs
+# one INSERT; delivery and its retries happen in the worker
+def enqueue_jobs(items):
+    jobs.enqueue(db.session.connection(), Job.__table__, items, datetime.utcnow(), app.config['JOB_MAX_ATTEMPTS'])
+
+def notification_jobs(event, feedback_ids):
+    return [
+        {'kind': 'notify', 'payload': {'event': event, 'feedbackId': feedback_id, 'channel': channel},
+         'key': f'{event}:{feedback_id}:{channel}'}
+        for feedback_id in feedback_ids
+        for channel in notify_channels
+    ]
+
+ClaimedJob = namedtuple('ClaimedJob', 'id kind payload attempts max_attempts')
+
+def notification_messages(batch):
+    # One query for every feedback row the batch mentions; feedback deleted
+    # since the job was queued gets no message
+    manager = aliased(User)
+    employee = aliased(User)
+    rows = db.session.execute(
+        select(Feedback.id, Feedback.sentiment, manager.name.label('manager_name'), manager.email.label('manager_email'),
+               employee.name.label('employee_name'), employee.email.label('employee_email'))
+            .join(manager, manager.id == Feedback.manager_id)
+            .join(employee, employee.id == Feedback.employee_id)
+            .where(Feedback.id.in_({job.payload['feedbackId'] for job in batch}))
+    )
+    feedback = {row.id: row for row in rows}
+    messages = {}
+    for job in batch:
+        row = feedback.get(job.payload['feedbackId'])
+        if row is None:
+            continue
+        if job.payload['event'] == 'feedback.created':
+            messages[job.id] = jobs.Message(
+                row.employee_email,
+                f'{row.manager_name} shared feedback with you',
+                f'{row.manager_name} left you {row.sentiment} feedback. Open FeedbackFlow to read and acknowledge it.'
+            )
+        elif job.payload['event'] == 'feedback.acknowledged':
+            messages[job.id] = jobs.Message(
+                row.manager_email,
+                f'{row.employee_name} acknowledged your feedback',
+                f'{row.employee_name} has read and acknowledged the feedback you gave them.'
+            )
+    return messages
+
+def reminder_messages(batch):
+    # Counted at delivery time, so anything acknowledged since the scan is left out
+    employee_ids = {job.payload['employeeId'] for job in batch}
+    cutoff = datetime.utcnow() - timedelta(hours=app.config['REMINDER_AFTER_HOURS'])
+    pending = dict(db.session.execute(
+        select(Feedback.employee_id, func.count())
+            .where(Feedback.employee_id.in_(employee_ids), Feedback.acknowledged.is_(False), Feedback.created_at < cutoff)
+            .group_by(Feedback.employee_id)
+    ).all())
+    emails = dict(db.session.execute(select(User.id, User.email).where(User.id.in_(employee_ids))).all())
+    messages = {}
+    for job in batch:
+        employee_id = job.payload['employeeId']
+        count = pending.get(employee_id)
+        if count and employee_id in emails:
+            items = 'item' if count == 1 else 'items'
+            messages[job.id] = jobs.Message(
+                emails[employee_id],
+                f'You have {count} feedback {items} to acknowledge',
+                f'{count} feedback {items} shared with you {"is" if count == 1 else "are"} still waiting for your acknowledgement.'
+            )
+    return messages
+
+def deliver(batch, build_messages):
+    # One send per channel for the whole batch; returns {job id: error or None}
+    messages = build_messages(batch)
+    errors = {job.id: None for job in batch}
+    by_channel = {}
+    for job in batch:
+        if job.id in messages:
+            by_channel.setdefault(job.payload['channel'], []).append(job)
+    for channel, channel_jobs in by_channel.items():
+        transport = transports.get(channel)
+        if transport is None:
+            # Queued before the channel was switched off
+            continue
+        try:
+            results = transport.send([messages[job.id] for job in channel_jobs])
+        except Exception as error:
+            results = [repr(error)] * len(channel_jobs)
+        for job, error in zip(channel_jobs, results):
+            errors[job.id] = error
+    return errors
+
+def scan_reminders(batch):
+    # Queues one reminder per employee and channel per REMINDER_INTERVAL_HOURS;
+    # the idempotency key makes rescans within an interval no-ops
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=app.config['REMINDER_AFTER_HOURS'])
+    interval = int(time.time() // (app.config['REMINDER_INTERVAL_HOURS'] * 3600))
+    employee_ids = db.session.execute(
+        select(Feedback.employee_id).where(Feedback.acknowledged.is_(False), Feedback.created_at < cutoff).distinct()
+    ).scalars().all()
+    enqueue_jobs([
+        {'kind': 'reminder', 'payload': {'employeeId': employee_id, 'channel': channel},
+         'key': f'reminder:{employee_id}:{channel}:{interval}'}
+        for employee_id in employee_ids
+        for channel in notify_channels
+    ])
+    jobs.prune(db.session.connection(), Job.__table__, now - timedelta(days=app.config['JOB_RETENTION_DAYS']))
+    return {job.id: None for job in batch}
+
+def archive_feedback(before):
+    # Moves acknowledged feedback created before `before` to the archive, one
+    # committed batch at a time; returns how many rows moved. Pending
+    # feedback stays hot, where it can still be acknowledged
+    where = and_(Feedback.acknowledged.is_(True), Feedback.created_at < before)
+    batch_size = app.config['FEEDBACK_ARCHIVE_BATCH_SIZE']
+    total = 0
+    while True:
+        moved = archive.archive(db.session.connection(), Feedback.__table__, FeedbackArchive.__table__,
+                                where, batch_size, datetime.utcnow())
+        # The moved rows' counts move to the archived_ columns, which also
+        # bumps the pairs' versions and so the list ETags
+        counter_deltas = {}
+        for row in moved:
+            add_to_counters(counter_deltas, row.manager_id, row.employee_id,
+                            **counter_values('archived_', row.sentiment, row.acknowledged))
+            add_to_counters(counter_deltas, row.manager_id, row.employee_id,
+                            **counter_values('', row.sentiment, row.acknowledged, -1))
+        record_counters(counter_deltas)
+        db.session.commit()
+        total += len(moved)
+        if len(moved) < batch_size:
+            return total
+
+def archive_old_feedback(batch):
+    moved = archive_feedback(datetime.utcnow() - timedelta(days=app.config['FEEDBACK_ARCHIVE_AFTER_DAYS']))
+    if moved:
+        app.logger.info('Archived %d feedback rows', moved)
+    return {job.id: None for job in batch}
+
+JOB_HANDLERS = {
+    'notify': lambda batch: deliver(batch, notification_messages),
+    'reminder': lambda batch: deliver(batch, reminder_messages),
+    'scan_reminders': scan_reminders,
+    'archive_feedback': archive_old_feedback
+}
+
+def work_batch(worker):
+    # Claims, runs and settles one batch; returns how many jobs it claimed
+    table = Job.__table__
+    claimed = jobs.claim(db.session.connection(), table, worker, app.config['JOB_BATCH_SIZE'],
+                         app.config['JOB_LEASE_SECONDS'], datetime.utcnow())
+    db.session.commit()
+    if not claimed:
+        return 0
+    
+    errors = {}
+    by_kind = {}
+    for job in claimed:
+        if job.attempts > job.max_attempts:
+            # Its lease ran out max_attempts times; whatever ran it kept dying
+            errors[job.id] = 'lease expired'
+        else:
+            by_kind.setdefault(job.kind, []).append(ClaimedJob(job.id, job.kind, json.loads(job.payload), job.attempts, job.max_attempts))
+    for kind, batch in by_kind.items():
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            errors.update({job.id: f'unknown job kind {kind}' for job in batch})
+            continue
+        try:
+            errors.update(handler(batch))
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            app.logger.exception('%s jobs failed', kind)
+            errors.update({job.id: repr(error) for job in batch})
+    
+    now = datetime.utcnow()
+    connection = db.session.connection()
+    jobs.complete(connection, table, [job.id for job in claimed if errors.get(job.id) is None], now)
+    for job in claimed:
+        if errors.get(job.id) is not None:
+            app.logger.warning('Job %s (%s) attempt %d failed: %s', job.id, job.kind, job.attempts, errors[job.id])
+            jobs.retry(connection, table, job, errors[job.id], now, app.config['JOB_BACKOFF_BASE'], app.config['JOB_BACKOFF_CAP'])
+    db.session.commit()
+    return len(claimed)
+
+def run_worker(worker, stop, drain=False):
+    # Each shard has its own queue; a worker takes a batch from each in turn
+    intervals = {}
+    if notify_channels:
+        intervals['scan_reminders'] = app.config['REMINDER_SCAN_MINUTES'] * 60
+    if app.config['FEEDBACK_ARCHIVE_AFTER_DAYS']:
+        intervals['archive_feedback'] = app.config['FEEDBACK_ARCHIVE_INTERVAL_HOURS'] * 3600
+    scheduled = {}
+    while not stop.is_set():
+        # Every worker proposes the same periodic jobs each period; the idempotency key keeps one
+        periods = {kind: int(time.time() // seconds) for kind, seconds in intervals.items()}
+        due = [{'kind': kind, 'payload': {}, 'key': f'{kind}:{period}'}
+               for kind, period in periods.items() if scheduled.get(kind) != period]
+        claimed = 0
+        for shard in shard_names():
+            with use_shard(shard):
+                if due:
+                    enqueue_jobs(due)
+                    db.session.commit()
+                claimed += work_batch(worker)
+        scheduled = periods
+        if not claimed:
+            if drain:
+                return
+            stop.wait(app.config['JOB_POLL_INTERVAL'])
+
+def encode_cursor(feedback):
+    raw = f"{feedback.created_at.isoformat()}|{feedback.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+# Full-text search: FTS5 on SQLite, a tsvector column on PostgreSQL (migration 3)
+SEARCH_SELECT = ', '.join(f'f.{column.key}' for column in FEEDBACK_COLUMNS)
+
+SQLITE_SEARCH = text(f"""
+    SELECT {SEARCH_SELECT},
+           -bm25(feedback_fts) AS score,
+           snippet(feedback_fts, 0, '<mark>', '</mark>', '…', 16) AS strengths_snippet,
+           snippet(feedback_fts, 1, '<mark>', '</mark>', '…', 16) AS areas_snippet
+    FROM feedback_fts JOIN feedback f ON f.search_id = feedback_fts.rowid
+    WHERE feedback_fts MATCH :query AND {{scope}}
+    ORDER BY bm25(feedback_fts)
+    LIMIT :limit OFFSET :offset
+""")
+
+POSTGRES_SEARCH = text(f"""
+    SELECT {SEARCH_SELECT},
+           ts_rank(f.search_vector, q.query) AS score,
+           ts_headline('english', f.strengths, q.query, 'StartSel=<mark>, StopSel=</mark>, MaxFragments=1') AS strengths_snippet,
+           ts_headline('english', f.areas_to_improve, q.query, 'StartSel=<mark>, StopSel=</mark>, MaxFragments=1') AS areas_snippet
+    FROM feedback f, websearch_to_tsquery('english', :query) AS q(query)
+    WHERE f.search_vector @@ q.query AND {{scope}}
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+# Same visibility rules as visible_feedback()
+SEARCH_SCOPES = {
+    'manager': '(f.employee_id IN (SELECT descendant_id FROM user_hierarchy WHERE ancestor_id = :user_id AND depth > 0)'
+               ' OR f.manager_id = :user_id)',
+    'employee': 'f.employee_id = :user_id'
+}
+
+def fts5_query(q):
+    # Quote every term so user input can't inject FTS5 syntax; the last term
+    # is a prefix match for search-as-you-type
+    terms = re.findall(r'\w+', q)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+def search_feedback(scope, user_id, q, limit, offset):
+    if read_session.get_bind().dialect.name == 'postgresql':
+        statement, query = POSTGRES_SEARCH, q
+    else:
+        statement, query = SQLITE_SEARCH, fts5_query(q)
+        if query is None:
+            return []
+    
+    # Typed like the ORM columns, so booleans and datetimes come back as such
+    statement = text(statement.text.replace('{scope}', SEARCH_SCOPES[scope])).columns(
+        *FEEDBACK_COLUMNS, score=db.Float, strengths_snippet=db.Text, areas_snippet=db.Text
+    )
+    column_count = len(FEEDBACK_COLUMNS)
+    rows = read_session.execute(statement, {'query': query, 'user_id': user_id, 'limit': limit, 'offset': offset})
+    return [{
+        'feedback': feedback_row_to_dict(row[:column_count]),
+        'score': row.score,
+        'highlights': {'strengths': row.strengths_snippet, 'areasToImprove': row.areas_snippet}
+    } for row in rows]
+
+def search_archived(current_user, q, limit):
+    # The archive has no search index: its text is compressed, so visible
+    # archived rows are unpacked newest first and kept if every term starts
+    # a word in them. Matches score 0 and highlight every term in full text
+    terms = re.findall(r'\w+', q)
+    if not terms:
+        return []
+    patterns = [re.compile(r'\b' + re.escape(term), re.IGNORECASE) for term in terms]
+    highlight = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\w*', re.IGNORECASE)
+    rows = newest_visible(current_user, FeedbackArchive, FeedbackArchive.__table__.columns, [],
+                          yield_per=app.config['FEEDBACK_MAX_PAGE_SIZE'])
+    results = []
+    for row in rows:
+        text = f'{row.strengths}\n{row.areas_to_improve}'
+        if not all(pattern.search(text) for pattern in patterns):
+            continue
+        results.append({
+            'feedback': feedback_row_to_dict(row),
+            'score': 0.0,
+            'highlights': {
+                'strengths': highlight.sub(r'<mark>\g<0></mark>', row.strengths),
+                'areasToImprove': highlight.sub(r'<mark>\g<0></mark>', row.areas_to_improve)
+            }
+        })
+        if len(results) == limit:
+            break
+    return results
+
+def stream_feedback(rows, limit):
+    # Same document as the buffered response, emitted row by row
+    dumps = app.json.dumps
+    yield '{"feedback":['
+    last = None
+    emitted = 0
+    next_cursor = None
+    for row in rows:
+        if limit is not None and emitted == limit:
+            next_cursor = encode_cursor(last)
+            break
+        yield (',' if emitted else '') + dumps(feedback_row_to_dict(row))
+        last = row
+        emitted += 1
+    yield '],"nextCursor":' + dumps(next_cursor) + '}'
+
+# HR exports: every feedback row with manager and employee names, in id
+# order so an interrupted export resumes with after=<last id received>
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_KEYS = ('id', 'managerId', 'managerName', 'employeeId', 'employeeName', 'strengths', 'areasToImprove',
+               'sentiment', 'acknowledged', 'acknowledgedAt', 'createdAt', 'updatedAt')
+
+def export_feedback_query(after=None, filters=(), model=Feedback):
+    manager = aliased(User)
+    employee = aliased(User)
+    if model is Feedback:
+        # Columns in EXPORT_KEYS order
+        columns = (
+            Feedback.id, Feedback.manager_id, manager.name, Feedback.employee_id, employee.name,
+            Feedback.strengths, Feedback.areas_to_improve, Feedback.sentiment, Feedback.acknowledged,
+            Feedback.acknowledged_at, Feedback.created_at, Feedback.updated_at
+        )
+    else:
+        # Put in EXPORT_KEYS order by unpack_archived_export
+        columns = (*model.__table__.columns, manager.name.label('manager_name'), employee.name.label('employee_name'))
+    query = select(*columns).select_from(model) \
+        .outerjoin(manager, manager.id == model.manager_id) \
+        .outerjoin(employee, employee.id == model.employee_id) \
+        .where(*filters)
+    if after:
+        query = query.where(model.id > after)
+    return query.order_by(model.id)
+
+def unpack_archived_export(rows):
+    for row in rows:
+        values = archive.unpack(row._mapping, Feedback.__table__)
+        yield (
+            values['id'], values['manager_id'], row.manager_name, values['employee_id'], row.employee_name,
+            values['strengths'], values['areas_to_improve'], values['sentiment'], values['acknowledged'],
+            values['acknowledged_at'], values['created_at'], values['updated_at']
+        )
+
+def export_feedback_rows(after, filters, include_archived, chunk_size):
+    # filters(model) gives the WHERE clauses for a tier; with include_archived
+    # the archive is read alongside and merged in, still in id order
+    tiers = (Feedback, FeedbackArchive) if include_archived else (Feedback,)
+    streams = [
+        read_session.execute(export_feedback_query(after, filters(model), model).execution_options(yield_per=chunk_size))
+        for model in tiers
+    ]
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(streams[0], unpack_archived_export(streams[1]), key=lambda row: row[0])
+
+def csv_text(value):
+    # Keep spreadsheets from evaluating free text as a formula
+    if value and value[0] in '=+-@\t\r':
+        return "'" + value
+    return value
+
+def csv_bool(value):
+    return 'true' if value else 'false'
+
+def csv_datetime(value):
+    return value.isoformat() if value else ''
+
+def csv_id(value):
+    return value
+
+CSV_CONVERTERS = (csv_id, csv_id, csv_text, csv_id, csv_text, csv_text, csv_text,
+                  csv_id, csv_bool, csv_datetime, csv_datetime, csv_datetime)
+
+def stream_export(rows, fmt, chunk_size, header=True):
+    # Rows are buffered so each chunk written to the client carries many of them
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    dumps = app.json.dumps
+    if fmt == 'csv' and header:
+        writer.writerow(EXPORT_KEYS)
+    for count, row in enumerate(rows, 1):
+        if fmt == 'csv':
+            writer.writerow([convert(value) for convert, value in zip(CSV_CONVERTERS, row)])
+        else:
+            buffer.write(dumps(dict(zip(EXPORT_KEYS, row))) + '\n')
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_at, feedback_id = raw.split('|', 1)
+    return datetime.fromisoformat(created_at), feedback_id
+
+def parse_feedback_filters(args, model=Feedback):
+    filters = []
+
+    sentiment = args.get('sentiment')
+    if sentiment:
+        if sentiment not in SENTIMENTS:
+            raise ValueError('sentiment must be one of positive, neutral, negative')
+        filters.append(model.sentiment == sentiment)
+
+    acknowledged = args.get('acknowledged')
+    if acknowledged:
+        if acknowledged not in ('true', 'false'):
+            raise ValueError('acknowledged must be true or false')
+        filters.append(model.acknowledged == (acknowledged == 'true'))
+
+    # 'from' is inclusive, 'to' is exclusive
+    for param, op in (('from', model.created_at.__ge__), ('to', model.created_at.__lt__)):
+        value = args.get(param)
+        if value:
+            try:
+                filters.append(op(datetime.fromisoformat(value)))
+            except ValueError:
+                raise ValueError(f'{param} must be an ISO 8601 date')
+
+    return filters
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'loginPool': login_pool.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'message': 'Metrics are disabled'}), 404
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # Routes
 @app.route('/api/auth/login', methods=['POST'])
@@ -124,11 +1594,42 @@ def login():
     if not email or not password:
         return jsonify({'message': 'Email and password required'}), 400
     
-    user = User.query.filter_by(email=email).first()
-    if not user or not check_password(password, user.password_hash):
+    # The organization comes from the body or X-Tenant, e.g. set by a proxy per hostname
+    tenant_id = str(data.get('tenant') or request.headers.get('X-Tenant') or app.config['DEFAULT_TENANT'])
+    
+    # Caps guesses against one account from one address. The address is part
+    # of the key, so failed logins from elsewhere can't lock the owner out
+    limited = check_rate_limit('account', f'{tenant_id}:{str(email).strip().lower()}:{request.remote_addr}')
+    if limited:
+        return limited
+    
+    tenant = route_to_tenant(tenant_id)
+    if not tenant:
+        return jsonify({'message': 'Invalid credentials'}), 401
+    user = User.query.filter_by(tenant_id=tenant.id, email=email).first()
+    if not user:
+        return jsonify({'message': 'Invalid credentials'}), 401
+    
+    try:
+        valid = login_pool.check_password(password, user.password_hash)
+    except PoolBusy:
+        return jsonify({'message': 'Too many logins in progress, please retry'}), 429, {'Retry-After': '1'}
+    if not valid:
         return jsonify({'message': 'Invalid credentials'}), 401
     
-    token = generate_token(user.id)
+    # Transparently move the stored hash to the configured cost factor, unless
+    # the tenant is moving and the write could be lost
+    if hash_rounds(user.password_hash) != app.config['BCRYPT_ROUNDS'] and tenant.status == tenancy.ACTIVE:
+        try:
+            new_hash = login_pool.hash_password(password, app.config['BCRYPT_ROUNDS'])
+        except PoolBusy:
+            new_hash = None
+        if new_hash:
+            # Core UPDATE so the rehash doesn't bump token_version
+            db.session.execute(update(User).where(User.id == user.id).values(password_hash=new_hash))
+            db.session.commit()
+    
+    token = generate_token(user)
     return jsonify({
         'token': token,
         'user': user_to_dict(user)
@@ -137,36 +1638,259 @@ def login():
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
 def get_current_user(current_user):
-    return jsonify({'user': user_to_dict(current_user)})
+    return jsonify({'user': user_to_dict(load_user(current_user.id))})
 
 @app.route('/api/users', methods=['GET'])
 @token_required
 def get_users(current_user):
     if current_user.role == 'manager':
-        # Managers can see their team members
-        team_members = User.query.filter_by(manager_id=current_user.id).all()
-        return jsonify({'users': [user_to_dict(user) for user in team_members]})
+        # Managers can see everyone under them, direct and skip-level reports
+        reports = User.id.in_(reports_of(current_user.id))
+        count, last_updated = read_session.query(func.count(User.id), func.max(func.coalesce(User.updated_at, User.created_at))) \
+            .filter(reports) \
+            .one()
+        etag = make_etag('users', current_user.id, count, last_updated)
+        response = not_modified(etag)
+        if response:
+            return response
+        
+        team_members = read_session.query(User).filter(reports).all()
+        return with_etag(jsonify({'users': [user_to_dict(user) for user in team_members]}), etag)
     else:
-        # Employees can only see themselves and their manager
-        users = []
-        users.append(user_to_dict(current_user))
+        # Employees can only see themselves and their manager, both served from the user cache
+        users = [load_user(current_user.id)]
         if current_user.manager_id:
-            manager = User.query.get(current_user.manager_id)
+            manager = load_user(current_user.manager_id)
             if manager:
-                users.append(user_to_dict(manager))
-        return jsonify({'users': users})
+                users.append(manager)
+        etag = make_etag('users', *users)
+        response = not_modified(etag)
+        if response:
+            return response
+        
+        return with_etag(jsonify({'users': [user_to_dict(user) for user in users]}), etag)
 
 @app.route('/api/feedback', methods=['GET'])
 @token_required
 def get_feedback(current_user):
-    if current_user.role == 'manager':
-        # Managers can see feedback they've given
-        feedback_list = Feedback.query.filter_by(manager_id=current_user.id).all()
+    # Archived feedback is only read when asked for; the tiers are then paged
+    # with the same filters and cursor and merged newest first
+    tiers = (Feedback, FeedbackArchive) if request.args.get('include_archived') == 'true' else (Feedback,)
+    
+    # Every write to feedback, archiving included, bumps the version of its
+    # manager and employee's counter row, so the rows in scope version the
+    # list without touching feedback itself
+    versions = read_session.execute(
+        select(func.count(), func.sum(FeedbackCounter.version)).where(visible_feedback(current_user, FeedbackCounter))
+    ).one()
+    etag = make_etag('feedback', current_user.id, *versions, request.query_string.decode('utf-8'))
+    response = not_modified(etag)
+    if response:
+        return response
+    
+    # Streaming has constant memory, so it may return the whole history
+    stream = request.args.get('stream') == 'true'
+    
+    try:
+        limit = request.args.get('limit')
+        if limit is None:
+            limit = None if stream else app.config['FEEDBACK_PAGE_SIZE']
+        else:
+            limit = max(1, int(limit))
+            if not stream:
+                limit = min(limit, app.config['FEEDBACK_MAX_PAGE_SIZE'])
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    
+    try:
+        filters = {model: parse_feedback_filters(request.args, model) for model in tiers}
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, feedback_id = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+        for model in tiers:
+            filters[model].append(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < feedback_id)
+            ))
+    
+    # Fetch one extra row to know whether another page exists
+    options = {'yield_per': app.config['FEEDBACK_MAX_PAGE_SIZE']} if stream else {}
+    rows = merge_newest([
+        newest_visible(current_user, model, FEEDBACK_COLUMNS if model is Feedback else FeedbackArchive.__table__.columns,
+                       filters[model], None if limit is None else limit + 1, **options)
+        for model in tiers
+    ])
+    
+    if stream:
+        response = Response(stream_with_context(stream_feedback(rows, limit)), mimetype='application/json')
+        return with_etag(response, etag)
+    
+    rows = list(rows)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    
+    return with_etag(jsonify({
+        'feedback': [feedback_row_to_dict(row) for row in rows[:limit]],
+        'nextCursor': next_cursor
+    }), etag)
+
+@app.route('/api/admin/feedback/export', methods=['GET'])
+@token_required
+def export_feedback(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Only admins can export feedback'}), 403
+    
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': 'format must be csv or ndjson'}), 400
+    
+    try:
+        filters = {
+            model: [model.tenant_id == current_user.tenant_id, *parse_feedback_filters(request.args, model)]
+            for model in (Feedback, FeedbackArchive)
+        }
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # yield_per streams from a server-side cursor, so memory stays flat however
+    # large the table is; the response goes out with chunked transfer encoding
+    after = request.args.get('after')
+    chunk_size = app.config['EXPORT_CHUNK_SIZE']
+    rows = export_feedback_rows(after, filters.get, request.args.get('include_archived') == 'true', chunk_size)
+    response = Response(stream_with_context(stream_export(rows, fmt, chunk_size, header=not after)), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="feedback-export.{fmt}"'
+    return response
+
+@app.route('/api/feedback/search', methods=['GET'])
+@token_required
+def search_feedback_route(current_user):
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'message': 'q is required'}), 400
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', app.config['SEARCH_PAGE_SIZE'])), app.config['FEEDBACK_MAX_PAGE_SIZE']))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'message': 'limit and offset must be integers'}), 400
+    
+    # Same visibility rules as get_feedback
+    scope = 'manager' if current_user.role == 'manager' else 'employee'
+    if request.args.get('include_archived') == 'true':
+        # Archived matches follow all the ranked ones, so the page is cut
+        # from the start of the combined list
+        results = search_feedback(scope, current_user.id, q, offset + limit + 1, 0)
+        if len(results) <= offset + limit:
+            results += search_archived(current_user, q, offset + limit + 1 - len(results))
+        results = results[offset:]
     else:
-        # Employees can see feedback they've received
-        feedback_list = Feedback.query.filter_by(employee_id=current_user.id).all()
+        results = search_feedback(scope, current_user.id, q, limit + 1, offset)
+    
+    return jsonify({
+        'results': results[:limit],
+        'nextOffset': offset + limit if len(results) > limit else None
+    })
+
+@app.route('/api/feedback/stats', methods=['GET'])
+@token_required
+def get_feedback_stats(current_user):
+    # Read from the counters alone; writes keep them current. Counts the
+    # same feedback the list shows, archived feedback included on request
+    stats = counter_stats(visible_feedback(current_user, FeedbackCounter),
+                          include_archived=request.args.get('include_archived') == 'true')
     
-    return jsonify({'feedback': [feedback_to_dict(f) for f in feedback_list]})
+    return jsonify({'stats': stats_to_dict(stats)})
+
+@app.route('/api/analytics/trends', methods=['GET'])
+@token_required
+def get_trends(current_user):
+    period = request.args.get('period', 'week')
+    if period not in rollups.PERIODS:
+        return jsonify({'message': 'period must be day or week'}), 400
+
+    group_by = request.args.get('groupBy')
+    group_columns = {None: [], 'team': [FeedbackRollup.manager_id], 'employee': [FeedbackRollup.employee_id]}
+    if group_by not in group_columns:
+        return jsonify({'message': 'groupBy must be team or employee'}), 400
+
+    try:
+        percentiles = [float(pct) for pct in request.args.get('percentiles', '50,90,99').split(',')]
+    except ValueError:
+        percentiles = None
+    if not percentiles or not all(0 < pct <= 100 for pct in percentiles):
+        return jsonify({'message': 'percentiles must be numbers between 0 and 100'}), 400
+
+    # 'from' is inclusive, 'to' is exclusive; the default is the last 90 days
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow().date() + timedelta(days=1)
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=90)
+    except ValueError:
+        return jsonify({'message': 'from and to must be ISO 8601 dates'}), 400
+    step = timedelta(days=7 if period == 'week' else 1)
+    first = rollups.bucket_start(period, start)
+    if end <= first or (end - first) / step > app.config['ANALYTICS_MAX_BUCKETS']:
+        return jsonify({'message': f"Range must cover between 1 and {app.config['ANALYTICS_MAX_BUCKETS']} buckets"}), 400
+
+    # Same visibility rules as get_feedback; admins see every team in their organization
+    filters = [FeedbackRollup.period == period, FeedbackRollup.bucket_start >= first, FeedbackRollup.bucket_start < end]
+    if current_user.role == 'manager':
+        filters.append(visible_feedback(current_user, FeedbackRollup))
+    elif current_user.role == 'admin':
+        # Rollups carry no tenant, but every manager belongs to exactly one
+        filters.append(FeedbackRollup.manager_id.in_(select(User.id).where(User.tenant_id == current_user.tenant_id)))
+        if request.args.get('managerId'):
+            filters.append(FeedbackRollup.manager_id == request.args['managerId'])
+    else:
+        filters.append(FeedbackRollup.employee_id == current_user.id)
+    if request.args.get('employeeId'):
+        filters.append(FeedbackRollup.employee_id == request.args['employeeId'])
+
+    columns = group_columns[group_by]
+    rows = read_session.execute(
+        select(*columns, FeedbackRollup.bucket_start,
+               *[func.sum(getattr(FeedbackRollup, column)).label(column) for column in rollups.VALUE_COLUMNS])
+            .where(*filters)
+            .group_by(*columns, FeedbackRollup.bucket_start)
+    ).all()
+
+    series = {}
+    for row in rows:
+        key = tuple(row[:len(columns)])
+        series.setdefault(key, {})[row.bucket_start] = dict(row._mapping)
+    if not columns:
+        series.setdefault((), {})
+
+    # Dense series: buckets without feedback are filled in with zeros
+    starts = []
+    bucket = first
+    while bucket < end:
+        starts.append(bucket)
+        bucket += step
+
+    teams = {}
+    if group_by == 'team' and series:
+        teams = dict(read_session.query(Team.manager_id, Team.id).filter(Team.manager_id.in_([key[0] for key in series])))
+
+    empty = rollup_to_dict(first, {}, percentiles)
+    result = []
+    for key, buckets in sorted(series.items()):
+        if group_by == 'team':
+            labels = {'managerId': key[0], 'teamId': teams.get(key[0])}
+        elif group_by == 'employee':
+            labels = {'employeeId': key[0]}
+        else:
+            labels = {}
+        result.append({**labels, 'buckets': [
+            rollup_to_dict(bucket, buckets[bucket], percentiles) if bucket in buckets else {**empty, 'start': bucket.isoformat()}
+            for bucket in starts
+        ]})
+
+    return jsonify({'period': period, 'groupBy': group_by, 'series': result})
 
 @app.route('/api/feedback', methods=['POST'])
 @token_required
@@ -176,417 +1900,623 @@ def create_feedback(current_user):
     
     data = request.get_json()
     
-    # Validate required fields
-    required_fields = ['employeeId', 'strengths', 'areasToImprove', 'sentiment']
-    for field in required_fields:
-        if not data.get(field):
-            return jsonify({'message': f'{field} is required'}), 400
+    error = validate_feedback_item(data)
+    if error:
+        return jsonify({'message': error}), 400
     
-    # Verify employee belongs to manager's team
-    employee = User.query.get(data['employeeId'])
-    if not employee or employee.manager_id != current_user.id:
+    # Verify the employee reports to this manager, directly or further down
+    if not is_report(current_user.id, data['employeeId']):
         return jsonify({'message': 'Employee not found or not in your team'}), 404
     
     # Create feedback
+    now = datetime.utcnow()
     feedback = Feedback(
-        id=f"fb{int(datetime.utcnow().timestamp() * 1000)}",
+        id=new_id('fb'),
+        tenant_id=current_user.tenant_id,
         manager_id=current_user.id,
         employee_id=data['employeeId'],
         strengths=data['strengths'],
         areas_to_improve=data['areasToImprove'],
-        sentiment=data['sentiment']
+        sentiment=data['sentiment'],
+        created_at=now,
+        updated_at=now,
+        version=1
     )
     
+    counter_deltas = {}
+    add_to_counters(counter_deltas, current_user.id, data['employeeId'], **{data['sentiment']: 1})
+    record_counters(counter_deltas)
+    deltas = {}
+    rollups.add_feedback(deltas, current_user.id, data['employeeId'], data['sentiment'], now)
+    record_rollups(deltas)
+    enqueue_jobs(notification_jobs('feedback.created', [feedback.id]))
     db.session.add(feedback)
     db.session.commit()
     
-    return jsonify({'feedback': feedback_to_dict(feedback)}), 201
+    feedback_dict = feedback_to_dict(feedback)
+    publish_feedback_event(current_user.tenant_id, 'feedback.created', feedback_dict)
+    return jsonify({'feedback': feedback_dict}), 201
 
-@app.route('/api/feedback/<feedback_id>', methods=['PUT'])
+@app.route('/api/feedback/batch', methods=['POST'])
 @token_required
-def update_feedback(current_user, feedback_id):
-    feedback = Feedback.query.get(feedback_id)
-    if not feedback:
-        return jsonify({'message': 'Feedback not found'}), 404
+def create_feedback_batch(current_user):
+    if current_user.role != 'manager':
+        return jsonify({'message': 'Only managers can create feedback'}), 403
+    
+    items = (request.get_json() or {}).get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'items must be a non-empty list'}), 400
+    if len(items) > app.config['FEEDBACK_BATCH_LIMIT']:
+        return jsonify({'message': f"At most {app.config['FEEDBACK_BATCH_LIMIT']} items per batch"}), 400
     
-    if feedback.manager_id != current_user.id:
-        return jsonify({'message': 'Unauthorized'}), 403
+    errors = [validate_feedback_item(item) if isinstance(item, dict) else 'item must be an object' for item in items]
     
+    # One hierarchy lookup for every employee referenced by the valid items
+    employee_ids = {item['employeeId'] for item, error in zip(items, errors) if error is None}
+    team_member_ids = set(db.session.execute(
+        reports_of(current_user.id).where(UserHierarchy.descendant_id.in_(employee_ids))
+    ).scalars())
+    
+    now = datetime.utcnow()
+    results = []
+    rows = []
+    deltas = {}
+    rollup_deltas = {}
+    for index, (item, error) in enumerate(zip(items, errors)):
+        if error:
+            results.append({'index': index, 'status': 400, 'message': error})
+            continue
+        if item['employeeId'] not in team_member_ids:
+            results.append({'index': index, 'status': 404, 'message': 'Employee not found or not in your team'})
+            continue
+        
+        row = {
+            'id': new_id('fb'),
+            'tenant_id': current_user.tenant_id,
+            'manager_id': current_user.id,
+            'employee_id': item['employeeId'],
+            'strengths': item['strengths'],
+            'areas_to_improve': item['areasToImprove'],
+            'sentiment': item['sentiment'],
+            'acknowledged': False,
+            'acknowledged_at': None,
+            'created_at': now,
+            'updated_at': now,
+            'version': 1
+        }
+        rows.append(row)
+        add_to_counters(deltas, current_user.id, item['employeeId'], **{item['sentiment']: 1})
+        rollups.add_feedback(rollup_deltas, current_user.id, item['employeeId'], item['sentiment'], now)
+        results.append({'index': index, 'status': 201, 'feedback': feedback_to_dict(Feedback(**row))})
+    
+    if rows:
+        # All rows and the counter updates commit together, or not at all
+        record_counters(deltas)
+        record_rollups(rollup_deltas)
+        enqueue_jobs(notification_jobs('feedback.created', [row['id'] for row in rows]))
+        db.session.execute(insert(Feedback), rows)
+        db.session.commit()
+        
+        for result in results:
+            if 'feedback' in result:
+                publish_feedback_event(current_user.tenant_id, 'feedback.created', result['feedback'])
+    
+    if not rows:
+        status = 400
+    elif len(rows) < len(items):
+        status = 207
+    else:
+        status = 201
+    return jsonify({'created': len(rows), 'results': results}), status
+
+@app.route('/api/feedback/<feedback_id>', methods=['PATCH', 'PUT'])
+@token_required
+def update_feedback(current_user, feedback_id):
+    # Both methods change only the fields in the body; PUT is kept for older clients
+    user_id = current_user.id
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Body must be a JSON object'}), 400
     
-    # Update fields if provided
+    error = validate_feedback_item(data, [field for field in EDITABLE_FIELDS if field in data])
+    if error:
+        return jsonify({'message': error}), 400
+    
+    now = datetime.utcnow()
+    values = {'updated_at': now}
     if 'strengths' in data:
-        feedback.strengths = data['strengths']
+        values['strengths'] = data['strengths']
     if 'areasToImprove' in data:
-        feedback.areas_to_improve = data['areasToImprove']
-    if 'sentiment' in data:
-        feedback.sentiment = data['sentiment']
+        values['areas_to_improve'] = data['areasToImprove']
+    
+    # Sentiment is left to a second statement, so this one returns the old
+    # sentiment the counters and rollups need
+    row = write_feedback(feedback_id, Feedback.manager_id == user_id, **values)
+    if row is None:
+        db.session.rollback()
+        feedback, archived = current_feedback(feedback_id)
+        if not feedback:
+            return jsonify({'message': 'Feedback not found'}), 404
+        if feedback['managerId'] != user_id:
+            return jsonify({'message': 'Unauthorized'}), 403
+        if archived:
+            return feedback_archived(feedback)
+        return feedback_conflict(feedback)
     
-    feedback.updated_at = datetime.utcnow()
+    feedback_dict = feedback_row_to_dict(row)
+    # Any edit bumps the pair's counter version, which the list ETag follows
+    counter_deltas = {}
+    add_to_counters(counter_deltas, row.manager_id, row.employee_id)
+    sentiment = data.get('sentiment')
+    if sentiment is not None and sentiment != row.sentiment:
+        # The row stays locked by the UPDATE above until commit
+        deltas = {sentiment: 1}
+        if row.sentiment in SENTIMENTS:
+            deltas[row.sentiment] = -1
+        add_to_counters(counter_deltas, row.manager_id, row.employee_id, **deltas)
+        if row.created_at:
+            rollup_deltas = {}
+            rollups.add(rollup_deltas, row.manager_id, row.employee_id, row.created_at, **deltas)
+            record_rollups(rollup_deltas)
+        db.session.execute(
+            update(Feedback)
+                .where(Feedback.id == feedback_id)
+                .values(sentiment=sentiment, updated_at=now)
+                .execution_options(synchronize_session=False)
+        )
+        feedback_dict['sentiment'] = sentiment
+    record_counters(counter_deltas)
     db.session.commit()
     
-    return jsonify({'feedback': feedback_to_dict(feedback)})
+    publish_feedback_event(current_user.tenant_id, 'feedback.updated', feedback_dict)
+    return feedback_response(feedback_dict)
 
 @app.route('/api/feedback/<feedback_id>/acknowledge', methods=['POST'])
 @token_required
 def acknowledge_feedback(current_user, feedback_id):
-    feedback = Feedback.query.get(feedback_id)
-    if not feedback:
-        return jsonify({'message': 'Feedback not found'}), 404
-    
-    if feedback.employee_id != current_user.id:
-        return jsonify({'message': 'Unauthorized'}), 403
+    user_id = current_user.id
+    now = datetime.utcnow()
+    row = write_feedback(
+        feedback_id, Feedback.employee_id == user_id, Feedback.acknowledged.isnot(True),
+        acknowledged=True, acknowledged_at=now, updated_at=now
+    )
+    if row is None:
+        db.session.rollback()
+        feedback, archived = current_feedback(feedback_id)
+        if not feedback:
+            return jsonify({'message': 'Feedback not found'}), 404
+        if feedback['employeeId'] != user_id:
+            return jsonify({'message': 'Unauthorized'}), 403
+        if archived and not feedback['acknowledged']:
+            return feedback_archived(feedback)
+        if not feedback['acknowledged']:
+            return feedback_conflict(feedback)
+        # Acknowledging twice is a no-op that keeps the first acknowledgement time
+        return feedback_response(feedback)
     
-    feedback.acknowledged = True
-    feedback.acknowledged_at = datetime.utcnow()
+    counter_deltas = {}
+    add_to_counters(counter_deltas, row.manager_id, row.employee_id, acknowledged=1)
+    record_counters(counter_deltas)
+    if row.created_at:
+        deltas = {}
+        rollups.add_acknowledgement(deltas, row.manager_id, row.employee_id, row.created_at, now)
+        record_rollups(deltas)
+    enqueue_jobs(notification_jobs('feedback.acknowledged', [feedback_id]))
     db.session.commit()
     
-    return jsonify({'feedback': feedback_to_dict(feedback)})
+    feedback_dict = feedback_row_to_dict(row)
+    publish_feedback_event(current_user.tenant_id, 'feedback.acknowledged', feedback_dict)
+    return feedback_response(feedback_dict)
+
+@app.route('/api/events/token', methods=['POST'])
+@token_required
+def create_stream_token(current_user):
+    user = load_user(current_user.id)
+    return jsonify({
+        'token': generate_stream_token(current_user, user.token_version),
+        'expiresIn': app.config['SSE_TOKEN_TTL']
+    })
+
+@app.route('/api/events', methods=['GET'])
+@token_required
+@query_token_allowed
+def event_stream(current_user):
+    if event_streams is None or not event_streams.acquire(blocking=False):
+        response = jsonify({'message': 'No event streams available on this server'})
+        response.headers['Retry-After'] = str(app.config['SSE_RETRY_MS'] // 1000 or 1)
+        return response, 503
+    
+    channel = event_channel(current_user.tenant_id, current_user.id)
+    heartbeat = app.config['SSE_HEARTBEAT']
+    retry_ms = app.config['SSE_RETRY_MS']
+    # Browsers send Last-Event-ID when they reconnect; lastEventId lets a fresh page resume too
+    try:
+        last_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId') or broker.latest_id(channel)
+    except Exception:
+        event_streams.release()
+        raise
+    
+    def generate(last_id):
+        yield f'retry: {retry_ms}\n\n'
+        while True:
+            pending = broker.read(channel, last_id, heartbeat)
+            if not pending:
+                yield ': keepalive\n\n'
+                continue
+            for event in pending:
+                yield f'id: {event.id}\nevent: {event.event}\ndata: {event.data}\n\n'
+                last_id = event.id
+    
+    response = Response(generate(last_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Called when the server closes the response, however the stream ended
+    response.call_on_close(event_streams.release)
+    return response
 
 @app.route('/api/teams', methods=['GET'])
 @token_required
 def get_teams(current_user):
     if current_user.role == 'manager':
-        team = Team.query.get(current_user.team_id)
-        return jsonify({'teams': [{'id': team.id, 'name': team.name, 'managerId': team.manager_id}] if team else []})
+        team = read_session.get(Team, current_user.team_id)
+        teams = [{'id': team.id, 'name': team.name, 'managerId': team.manager_id}] if team else []
     else:
-        return jsonify({'teams': []})
+        teams = []
+    
+    etag = make_etag('teams', current_user.id, *(tuple(team.values()) for team in teams))
+    response = not_modified(etag)
+    if response:
+        return response
+    return with_etag(jsonify({'teams': teams}), etag)
+
+# Derived tables that a migration adds to an existing database start from
+# the rows already there
+BACKFILLS = {
+    'feedback_rollups': rebuild_rollups,
+    'user_hierarchy': rebuild_hierarchy,
+    'feedback_counter_pairs': rebuild_counters,
+    'feedback_counter_archived': rebuild_counters
+}
+
+def upgrade_db():
+    # Migrates every shard; returns {shard: migrations applied}. Processes
+    # starting together take turns; all but the first find nothing to do
+    ran = {}
+    for shard in shard_names():
+        with use_shard(shard):
+            engine = db.session.get_bind()
+            with migrations.exclusive(engine):
+                ran[shard] = migrations.upgrade(engine)
+                # Several migrations may share a backfill; it runs once
+                backfills = []
+                for name in ran[shard]:
+                    if name in BACKFILLS and BACKFILLS[name] not in backfills:
+                        backfills.append(BACKFILLS[name])
+                for backfill in backfills:
+                    backfill()
+    return ran
+
+# Moving tenants between shards
+def tenant_tables(tenant_id, job_ids):
+    # (table, WHERE clause) for every row that belongs to the tenant, parents first
+    users = select(User.id).where(User.tenant_id == tenant_id)
+    return [
+        (Team.__table__, Team.tenant_id == tenant_id),
+        (User.__table__, User.tenant_id == tenant_id),
+        (UserHierarchy.__table__, UserHierarchy.descendant_id.in_(users)),
+        (Feedback.__table__, Feedback.tenant_id == tenant_id),
+        (FeedbackArchive.__table__, FeedbackArchive.tenant_id == tenant_id),
+        (FeedbackCounter.__table__, FeedbackCounter.manager_id.in_(users)),
+        (FeedbackRollup.__table__, FeedbackRollup.manager_id.in_(users)),
+        (Job.__table__, Job.id.in_(job_ids))
+    ]
+
+def tenant_job_ids(connection, tenant_id):
+    # Unfinished jobs about the tenant's feedback or people. Payloads are
+    # JSON, so they are matched here; shard-wide jobs (reminder scans) stay
+    by_subject = {}
+    for job_id, payload in connection.execute(select(Job.id, Job.payload).where(Job.status != jobs.DONE)):
+        payload = json.loads(payload)
+        subject = payload.get('feedbackId') or payload.get('employeeId')
+        if subject:
+            by_subject.setdefault(subject, []).append(job_id)
+    owned = set(connection.execute(
+        union_all(
+            select(Feedback.id).where(Feedback.id.in_(list(by_subject)), Feedback.tenant_id == tenant_id),
+            select(FeedbackArchive.id).where(FeedbackArchive.id.in_(list(by_subject)), FeedbackArchive.tenant_id == tenant_id),
+            select(User.id).where(User.id.in_(list(by_subject)), User.tenant_id == tenant_id)
+        )
+    ).scalars())
+    return [job_id for subject in owned for job_id in by_subject[subject]]
+
+def purge_tenant_rows(shard, tenant_id):
+    with db.engines[tenancy.bind_key(shard)].begin() as connection:
+        tables = tenant_tables(tenant_id, tenant_job_ids(connection, tenant_id))
+        return sum(connection.execute(delete(table).where(where)).rowcount for table, where in reversed(tables))
 
-# Initialize database and create sample data
+def update_tenant(tenant_id, **values):
+    with db.engine.begin() as connection:
+        connection.execute(update(Tenant).where(Tenant.id == tenant_id).values(**values))
+    tenant_directory.invalidate(tenant_id)
+
+def move_tenant(tenant_id, shard, batch_size=1000, log=print):
+    # Leaves the tenant's rows on `shard` and nowhere else, so rerunning it
+    # completes an interrupted move. Each directory change is followed by a
+    # wait of TENANT_CACHE_TTL, after which every process has seen it
+    tenant = lookup_tenant(tenant_id)
+    if tenant is None:
+        raise ValueError(f'Unknown tenant {tenant_id}')
+    if shard not in shard_names():
+        raise ValueError(f"Unknown shard {shard}; configured: {', '.join(shard_names())}")
+    settle = app.config['TENANT_CACHE_TTL'] + 1
+    
+    if tenant.shard != shard:
+        update_tenant(tenant_id, status=tenancy.MOVING)
+        log(f'Writes to {tenant_id} are paused; waiting {settle:g}s for those in flight')
+        time.sleep(settle)
+        try:
+            # Rows an interrupted move left behind would collide with the copy
+            purge_tenant_rows(shard, tenant_id)
+            source_engine = db.engines[tenancy.bind_key(tenant.shard)]
+            target_engine = db.engines[tenancy.bind_key(shard)]
+            with source_engine.connect() as source, target_engine.connect() as target:
+                for table, where in tenant_tables(tenant_id, tenant_job_ids(source, tenant_id)):
+                    log(f'{table.name}: {tenancy.copy_rows(source, target, table, where, batch_size)} rows copied')
+        except Exception:
+            update_tenant(tenant_id, status=tenancy.ACTIVE)
+            raise
+        update_tenant(tenant_id, shard=shard, status=tenancy.ACTIVE)
+        log(f'{tenant_id} now lives on {shard}; waiting {settle:g}s for reads of {tenant.shard} to finish')
+        time.sleep(settle)
+    
+    for other in shard_names():
+        if other != shard:
+            removed = purge_tenant_rows(other, tenant_id)
+            if removed:
+                log(f'Removed {removed} rows of {tenant_id} from {other}')
+
+def load_fixture(path):
+    # Bulk-loads {table: [rows]}; password hashes are stored precomputed, so
+    # no bcrypt work happens here
+    with open(path, encoding='utf-8') as f:
+        fixture = json.load(f)
+    connection = db.session.connection()
+    for model in (Team, User, Feedback):
+        rows = fixture.get(model.__tablename__, [])
+        # JSON has no datetime type; DateTime columns are ISO 8601 strings
+        for column in model.__table__.columns:
+            if isinstance(column.type, db.DateTime):
+                for row in rows:
+                    if row.get(column.key):
+                        row[column.key] = datetime.fromisoformat(row[column.key])
+        if rows:
+            connection.execute(insert(model), rows)
+    
+    # Core inserts skip the User mapper events, so derived tables are filled here
+    closure = hierarchy.closure_rows([(user['id'], user.get('manager_id')) for user in fixture.get('user', [])])
+    if closure:
+        connection.execute(insert(UserHierarchy), closure)
+    deltas = {}
+    counter_deltas = {}
+    for row in fixture.get('feedback', []):
+        rollups.add_feedback(deltas, row['manager_id'], row['employee_id'], row['sentiment'], row['created_at'],
+                             row.get('acknowledged_at') if row.get('acknowledged') else None)
+        add_to_counters(counter_deltas, row['manager_id'], row['employee_id'],
+                        **{row['sentiment']: 1, 'acknowledged': 1 if row.get('acknowledged') else 0})
+    record_rollups(deltas)
+    record_counters(counter_deltas)
+    db.session.commit()
+    return {name: len(rows) for name, rows in fixture.items()}
+
+# Apply migrations and load the demo data into an empty database
 def init_db():
     with app.app_context():
-        db.create_all()
-        
-        # Check if data already exists
-        if User.query.first():
+        upgrade_db()
+        if not app.config['SEED_DEMO_DATA']:
             return
-        
-        # Create sample teams
-        teams = [
-            Team(id='team1', name='Engineering Team', manager_id='mgr1'),
-            Team(id='team2', name='Design Team', manager_id='mgr2'),
-            Team(id='team3', name='Marketing Team', manager_id='mgr3'),
-            Team(id='team4', name='Sales Team', manager_id='mgr4'),
-            Team(id='team5', name='Product Team', manager_id='mgr5')
-        ]
-        
-        # Create sample users - Managers
-        managers = [
-            User(
-                id='mgr1',
-                email='sarah.manager@company.com',
-                name='Sarah Johnson',
-                password_hash=hash_password('password123'),
-                role='manager',
-                team_id='team1'
-            ),
-            User(
-                id='mgr2',
-                email='alex.manager@company.com',
-                name='Alex Wilson',
-                password_hash=hash_password('password123'),
-                role='manager',
-                team_id='team2'
-            ),
-            User(
-                id='mgr3',
-                email='maria.manager@company.com',
-                name='Maria Rodriguez',
-                password_hash=hash_password('password123'),
-                role='manager',
-                team_id='team3'
-            ),
-            User(
-                id='mgr4',
-                email='david.manager@company.com',
-                name='David Chen',
-                password_hash=hash_password('password123'),
-                role='manager',
-                team_id='team4'
-            ),
-            User(
-                id='mgr5',
-                email='jennifer.manager@company.com',
-                name='Jennifer Taylor',
-                password_hash=hash_password('password123'),
-                role='manager',
-                team_id='team5'
-            )
-        ]
-        
-        # Create sample users - Employees
-        employees = [
-            # Engineering Team (Sarah's team)
-            User(
-                id='emp1',
-                email='john.smith@company.com',
-                name='John Smith',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team1',
-                manager_id='mgr1'
-            ),
-            User(
-                id='emp2',
-                email='emily.davis@company.com',
-                name='Emily Davis',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team1',
-                manager_id='mgr1'
-            ),
-            User(
-                id='emp3',
-                email='michael.brown@company.com',
-                name='Michael Brown',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team1',
-                manager_id='mgr1'
-            ),
-            User(
-                id='emp4',
-                email='rachel.green@company.com',
-                name='Rachel Green',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team1',
-                manager_id='mgr1'
-            ),
-            
-            # Design Team (Alex's team)
-            User(
-                id='emp5',
-                email='lisa.jones@company.com',
-                name='Lisa Jones',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team2',
-                manager_id='mgr2'
-            ),
-            User(
-                id='emp6',
-                email='tom.wilson@company.com',
-                name='Tom Wilson',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team2',
-                manager_id='mgr2'
-            ),
-            User(
-                id='emp7',
-                email='anna.lee@company.com',
-                name='Anna Lee',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team2',
-                manager_id='mgr2'
-            ),
-            
-            # Marketing Team (Maria's team)
-            User(
-                id='emp8',
-                email='james.miller@company.com',
-                name='James Miller',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team3',
-                manager_id='mgr3'
-            ),
-            User(
-                id='emp9',
-                email='sophie.clark@company.com',
-                name='Sophie Clark',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team3',
-                manager_id='mgr3'
-            ),
-            User(
-                id='emp10',
-                email='kevin.white@company.com',
-                name='Kevin White',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team3',
-                manager_id='mgr3'
-            ),
-            
-            # Sales Team (David's team)
-            User(
-                id='emp11',
-                email='natalie.adams@company.com',
-                name='Natalie Adams',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team4',
-                manager_id='mgr4'
-            ),
-            User(
-                id='emp12',
-                email='robert.garcia@company.com',
-                name='Robert Garcia',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team4',
-                manager_id='mgr4'
-            ),
-            
-            # Product Team (Jennifer's team)
-            User(
-                id='emp13',
-                email='olivia.martinez@company.com',
-                name='Olivia Martinez',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team5',
-                manager_id='mgr5'
-            ),
-            User(
-                id='emp14',
-                email='daniel.thompson@company.com',
-                name='Daniel Thompson',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team5',
-                manager_id='mgr5'
-            ),
-            User(
-                id='emp15',
-                email='grace.anderson@company.com',
-                name='Grace Anderson',
-                password_hash=hash_password('password123'),
-                role='employee',
-                team_id='team5',
-                manager_id='mgr5'
-            )
-        ]
-        
-        # Create sample feedback
-        feedback_items = [
-            # Sarah's feedback to her engineering team
-            Feedback(
-                id='fb1',
-                manager_id='mgr1',
-                employee_id='emp1',
-                strengths='Excellent problem-solving skills and always delivers high-quality code. Great team collaboration and willingness to help others.',
-                areas_to_improve='Could benefit from improving time estimation for tasks and communicating blockers earlier.',
-                sentiment='positive',
-                acknowledged=True,
-                acknowledged_at=datetime(2024, 1, 16, 9, 30),
-                created_at=datetime(2024, 1, 15, 10, 0),
-                updated_at=datetime(2024, 1, 15, 10, 0)
-            ),
-            Feedback(
-                id='fb2',
-                manager_id='mgr1',
-                employee_id='emp2',
-                strengths='Outstanding attention to detail and thorough testing. Excellent documentation skills.',
-                areas_to_improve='Could be more proactive in suggesting process improvements and taking on leadership opportunities.',
-                sentiment='positive',
-                created_at=datetime(2024, 1, 10, 14, 30),
-                updated_at=datetime(2024, 1, 10, 14, 30)
-            ),
-            Feedback(
-                id='fb3',
-                manager_id='mgr1',
-                employee_id='emp3',
-                strengths='Strong technical knowledge and quick learner. Good at asking the right questions.',
-                areas_to_improve='Needs to work on confidence in presenting ideas and be more vocal in team discussions.',
-                sentiment='neutral',
-                acknowledged=True,
-                acknowledged_at=datetime(2024, 1, 9, 8, 45),
-                created_at=datetime(2024, 1, 8, 11, 15),
-                updated_at=datetime(2024, 1, 8, 11, 15)
-            ),
-            Feedback(
-                id='fb4',
-                manager_id='mgr1',
-                employee_id='emp4',
-                strengths='Excellent communication skills and great at mentoring junior developers. Shows strong leadership potential.',
-                areas_to_improve='Could focus more on code optimization and performance improvements.',
-                sentiment='positive',
-                created_at=datetime(2024, 1, 20, 16, 0),
-                updated_at=datetime(2024, 1, 20, 16, 0)
-            ),
-            
-            # Alex's feedback to design team
-            Feedback(
-                id='fb5',
-                manager_id='mgr2',
-                employee_id='emp5',
-                strengths='Creative problem solver with excellent design intuition. Great at user research and understanding customer needs.',
-                areas_to_improve='Could improve on meeting deadlines and better time management for multiple projects.',
-                sentiment='positive',
-                created_at=datetime(2024, 1, 18, 11, 0),
-                updated_at=datetime(2024, 1, 18, 11, 0)
-            ),
-            Feedback(
-                id='fb6',
-                manager_id='mgr2',
-                employee_id='emp6',
-                strengths='Exceptional visual design skills and attention to brand consistency. Works well with development team.',
-                areas_to_improve='Could benefit from learning more about accessibility standards and inclusive design.',
-                sentiment='positive',
-                acknowledged=True,
-                acknowledged_at=datetime(2024, 1, 19, 14, 20),
-                created_at=datetime(2024, 1, 17, 9, 30),
-                updated_at=datetime(2024, 1, 17, 9, 30)
-            ),
-            
-            # Maria's feedback to marketing team
-            Feedback(
-                id='fb7',
-                manager_id='mgr3',
-                employee_id='emp8',
-                strengths='Great analytical skills and data-driven approach to campaigns. Excellent at A/B testing and optimization.',
-                areas_to_improve='Could work on creative storytelling and emotional connection in campaigns.',
-                sentiment='positive',
-                created_at=datetime(2024, 1, 22, 15, 45),
-                updated_at=datetime(2024, 1, 22, 15, 45)
-            ),
-            
-            # David's feedback to sales team
-            Feedback(
-                id='fb8',
-                manager_id='mgr4',
-                employee_id='emp11',
-                strengths='Outstanding relationship building skills and consistently exceeds targets. Great at understanding client needs.',
-                areas_to_improve='Could improve on CRM data entry and follow-up documentation.',
-                sentiment='positive',
-                acknowledged=True,
-                acknowledged_at=datetime(2024, 1, 21, 10, 15),
-                created_at=datetime(2024, 1, 19, 13, 20),
-                updated_at=datetime(2024, 1, 19, 13, 20)
-            ),
-            
-            # Jennifer's feedback to product team
-            Feedback(
-                id='fb9',
-                manager_id='mgr5',
-                employee_id='emp13',
-                strengths='Excellent strategic thinking and roadmap planning. Great at stakeholder communication and requirement gathering.',
-                areas_to_improve='Could benefit from more hands-on technical knowledge to better communicate with engineering.',
-                sentiment='positive',
-                created_at=datetime(2024, 1, 23, 10, 30),
-                updated_at=datetime(2024, 1, 23, 10, 30)
-            )
-        ]
-        
-        # Add all data to database
-        for team in teams:
-            db.session.add(team)
-        for manager in managers:
-            db.session.add(manager)
-        for employee in employees:
-            db.session.add(employee)
-        for feedback in feedback_items:
-            db.session.add(feedback)
-        
-        db.session.commit()
+        with migrations.exclusive(db.engine):
+            if db.session.query(User.id).first():
+                return
+            load_fixture(app.config['DEMO_FIXTURE'])
         print("Database initialized with multi-team sample data")
 
-if __name__ == '__main__':
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Apply pending schema migrations to every shard."""
+    for shard, ran in upgrade_db().items():
+        click.echo(f"{shard}: applied {', '.join(ran)}" if ran else f'{shard}: up to date')
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Apply migrations and, on an empty database, load the demo data."""
     init_db()
+    click.echo('Database is ready')
+
+@app.cli.command('copy-data')
+@click.argument('source_url')
+@click.option('--batch-size', default=1000, show_default=True)
+def copy_data_command(source_url, batch_size):
+    """Copy all rows from SOURCE_URL (e.g. the old SQLite file) into the primary database."""
+    source = create_engine(storage.normalize_url(source_url))
+    upgrade_db()
+    migrations.copy_data(source, db.engine, db.metadata.sorted_tables, batch_size, log=click.echo)
+    source.dispose()
+    # The source may predate the derived tables, so rebuild them from the copied rows
+    click.echo(f'Rebuilt {rebuild_hierarchy()} hierarchy rows, {rebuild_rollups()} rollup rows'
+               f' and {rebuild_counters()} counter rows')
+
+@app.cli.command('rebuild-hierarchy')
+def rebuild_hierarchy_command():
+    """Recompute the org hierarchy index from User.manager_id."""
+    upgrade_db()
+    for shard in shard_names():
+        with use_shard(shard):
+            click.echo(f'{shard}: rebuilt {rebuild_hierarchy()} hierarchy rows')
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recompute the per-manager and per-employee feedback counters from feedback history."""
+    upgrade_db()
+    for shard in shard_names():
+        with use_shard(shard):
+            click.echo(f'{shard}: rebuilt {rebuild_counters()} counter rows')
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the daily and weekly analytics rollups from feedback history."""
+    upgrade_db()
+    for shard in shard_names():
+        with use_shard(shard):
+            start = time.monotonic()
+            click.echo(f'{shard}: rebuilt {rebuild_rollups()} rollup rows in {time.monotonic() - start:.1f}s')
+
+@app.cli.command('run-worker')
+@click.option('--drain', is_flag=True, help='Exit once no jobs are due instead of polling for more.')
+def run_worker_command(drain):
+    """Deliver notifications and reminders, and archive old feedback, from the background job queue."""
+    upgrade_db()
+    stop = threading.Event()
+    # Finish the current batch on shutdown rather than leaving it to lease expiry
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: stop.set())
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    click.echo(f"Worker {worker} delivering {', '.join(notify_channels) or 'no'} notifications")
+    run_worker(worker, stop, drain)
+
+@app.cli.command('archive-feedback')
+@click.option('--older-than-days', type=float, default=lambda: app.config['FEEDBACK_ARCHIVE_AFTER_DAYS'],
+              show_default='FEEDBACK_ARCHIVE_AFTER_DAYS')
+def archive_feedback_command(older_than_days):
+    """Move acknowledged feedback older than the cutoff to the compressed archive."""
+    if not older_than_days:
+        raise click.ClickException('Archiving is off (FEEDBACK_ARCHIVE_AFTER_DAYS=0); pass --older-than-days')
+    upgrade_db()
+    before = datetime.utcnow() - timedelta(days=older_than_days)
+    for shard in shard_names():
+        with use_shard(shard):
+            click.echo(f'{shard}: archived {archive_feedback(before)} feedback rows')
+
+@app.cli.command('retry-jobs')
+@click.option('--kind', help='Only jobs of this kind, e.g. notify or reminder.')
+def retry_jobs_command(kind):
+    """Requeue background jobs that ran out of attempts."""
+    upgrade_db()
+    count = 0
+    for shard in shard_names():
+        with use_shard(shard):
+            count += jobs.requeue_failed(db.session.connection(), Job.__table__, datetime.utcnow(), kind)
+            db.session.commit()
+    click.echo(f'Requeued {count} jobs')
+
+@app.cli.command('export-feedback')
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', default='-', help='File to write; appended to when resuming with --after.')
+@click.option('--after', help='Resume after this feedback id (the last one already exported).')
+@click.option('--tenant', 'tenant_id', default=lambda: app.config['DEFAULT_TENANT'], show_default='DEFAULT_TENANT')
+@click.option('--include-archived', is_flag=True, help='Also export feedback moved to the archive.')
+def export_feedback_command(fmt, output, after, tenant_id, include_archived):
+    """Stream an organization's feedback records with manager and employee names."""
+    tenant = tenant_directory.get(tenant_id)
+    if not tenant:
+        raise click.ClickException(f'Unknown tenant {tenant_id}')
+    chunk_size = app.config['EXPORT_CHUNK_SIZE']
+    with use_shard(tenant.shard):
+        rows = export_feedback_rows(after, lambda model: [model.tenant_id == tenant.id], include_archived, chunk_size)
+        with click.open_file(output, 'a' if after else 'w', encoding='utf-8') as f:
+            for chunk in stream_export(rows, fmt, chunk_size, header=not after):
+                f.write(chunk)
+
+@app.cli.command('create-admin')
+@click.option('--email', required=True)
+@click.option('--name', required=True)
+@click.option('--tenant', 'tenant_id', default=lambda: app.config['DEFAULT_TENANT'], show_default='DEFAULT_TENANT')
+@click.password_option()
+def create_admin_command(email, name, tenant_id, password):
+    """Create an HR admin account, which can export its organization's feedback."""
+    upgrade_db()
+    tenant = tenant_directory.get(tenant_id)
+    if not tenant:
+        raise click.ClickException(f'Unknown tenant {tenant_id}')
+    with use_shard(tenant.shard):
+        if User.query.filter_by(tenant_id=tenant.id, email=email).first():
+            raise click.ClickException(f'{email} already exists in {tenant.id}')
+        db.session.add(User(id=new_id('usr'), tenant_id=tenant.id, email=email, name=name,
+                            password_hash=hash_password(password), role='admin', team_id='hr'))
+        db.session.commit()
+    click.echo(f'Created admin {email} in {tenant.id}')
+
+@app.cli.command('create-tenant')
+@click.argument('tenant_id')
+@click.option('--name', required=True)
+@click.option('--shard', default=tenancy.DEFAULT_SHARD, show_default=True)
+def create_tenant_command(tenant_id, name, shard):
+    """Register an organization and the shard that will hold its rows."""
+    upgrade_db()
+    if not re.fullmatch(r'[a-z0-9_-]+', tenant_id):
+        raise click.ClickException('Tenant ids are lowercase letters, digits, - and _')
+    if shard not in shard_names():
+        raise click.ClickException(f"Unknown shard {shard}; configured: {', '.join(shard_names())}")
+    if db.session.get(Tenant, tenant_id):
+        raise click.ClickException(f'{tenant_id} already exists')
+    db.session.add(Tenant(id=tenant_id, name=name, shard=shard))
+    db.session.commit()
+    click.echo(f'Created tenant {tenant_id} on {shard}')
+
+@app.cli.command('list-tenants')
+def list_tenants_command():
+    """Show each organization's shard, status and number of users."""
+    upgrade_db()
+    tenants = db.session.execute(select(Tenant.id, Tenant.name, Tenant.shard, Tenant.status).order_by(Tenant.id)).all()
+    for tenant in tenants:
+        with use_shard(tenant.shard):
+            users = db.session.scalar(select(func.count()).where(User.tenant_id == tenant.id))
+        click.echo(f'{tenant.id}\t{tenant.name}\t{tenant.shard}\t{tenant.status}\t{users} users')
+
+@app.cli.command('move-tenant')
+@click.argument('tenant_id')
+@click.argument('shard')
+@click.option('--batch-size', default=1000, show_default=True)
+def move_tenant_command(tenant_id, shard, batch_size):
+    """Move an organization's rows to SHARD. Its writes are refused while
+    they are copied; rerunning the command finishes an interrupted move."""
+    upgrade_db()
+    try:
+        move_tenant(tenant_id, shard, batch_size, log=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'{tenant_id} is on {shard}')
+
+@app.cli.command('seed-data')
+@click.option('--teams', default=50, show_default=True)
+@click.option('--users', default=1000, show_default=True, help='Total users, including one manager per team.')
+@click.option('--feedback', default=100000, show_default=True)
+@click.option('--prefix', default='seed', show_default=True, help='Prefix for generated ids and emails.')
+@click.option('--rounds', default=4, show_default=True, help='bcrypt cost for the shared fixture password.')
+@click.option('--seed', 'random_seed', default=0, show_default=True)
+def seed_data_command(teams, users, feedback, prefix, rounds, random_seed):
+    """Bulk-load synthetic teams, users and feedback (password: password123)."""
+    import seed
+    upgrade_db()
+    start = time.monotonic()
+    seed.generate(teams, users, feedback, prefix=prefix, rounds=rounds, seed=random_seed, log=click.echo)
+    click.echo(f'Seeded in {time.monotonic() - start:.1f}s')
+
+_initialized = False
+
+# Entry point for WSGI servers (see wsgi.py); with gunicorn's preload_app this
+# runs once in the master before workers are forked. With INIT_DB_ON_START
+# off the database is left alone and `flask init-db` runs as a deploy step
+def create_app():
+    global _initialized
+    if not _initialized:
+        if app.config['INIT_DB_ON_START']:
+            init_db()
+        _initialized = True
+    return app
+
+# Development server only; production runs gunicorn -c gunicorn.conf.py wsgi:app
+if __name__ == '__main__':
+    create_app()
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=os.environ.get('FLASK_ENV') != 'production', host='0.0.0.0', port=port)
\ No newline at end of file
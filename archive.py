@@ -0,0 +1,44 @@
+from datetime import datetime
+import json
+import zlib
+from sqlalchemy import DateTime, delete, select
+
+# Cold storage for old feedback.
+#
+# The archive table keeps the columns reads filter and sort by (owner,
+# sentiment, dates) as they are and packs every other column of the hot
+# table, the free text above all, into one zlib-compressed JSON document
+# per row. Rows move with DELETE ... RETURNING followed by an INSERT in the
+# same transaction, so each row is in exactly one tier at any time, and a
+# write racing the move either lands before it or finds no row.
+
+def pack(row, cold, now):
+    # row: {hot column: value} -> {cold column: value}
+    stored = {name: value for name, value in row.items() if name in cold.c}
+    packed = {name: value.isoformat() if isinstance(value, datetime) else value
+              for name, value in row.items() if name not in cold.c}
+    stored['payload'] = zlib.compress(json.dumps(packed, separators=(',', ':')).encode('utf-8'))
+    stored['archived_at'] = now
+    return stored
+
+def unpack(row, hot):
+    # An archived row (a mapping with payload) -> {hot column: value}
+    values = json.loads(zlib.decompress(row['payload']))
+    for name, value in values.items():
+        if value is not None and isinstance(hot.c[name].type, DateTime):
+            values[name] = datetime.fromisoformat(value)
+    values.update((name, row[name]) for name in row.keys() if name in hot.c)
+    return values
+
+def archive(connection, hot, cold, where, limit, now):
+    # Moves up to `limit` rows matching `where`; returns the moved hot rows.
+    # Unordered, so a scan stops at the first `limit` matches
+    pk = hot.primary_key.columns.values()[0]
+    moved = connection.execute(
+        delete(hot)
+            .where(pk.in_(select(pk).where(where).limit(limit).scalar_subquery()))
+            .returning(*hot.columns)
+    ).all()
+    if moved:
+        connection.execute(cold.insert(), [pack(dict(row._mapping), cold, now) for row in moved])
+    return moved
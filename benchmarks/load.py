@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Mixed-workload load test: login, list, create and acknowledge.
+#
+# Without --url the app runs in-process against a fresh SQLite database
+# seeded by seed.py, one Flask test client per worker thread. With --url
+# it drives a running server over HTTP; seed that server first with the
+# same shape, and start it with RATE_LIMIT_ENABLED=false since all workers
+# share one client address, e.g.
+#
+#   flask --app app seed-data --teams 20 --users 400 --feedback 20000
+#   python -m benchmarks.load --url http://localhost:5000 --teams 20 --users 400
+#
+# Results are written as JSON (--save) and can be compared with an earlier
+# run (--baseline); a p95 regression beyond --threshold exits non-zero.
+#
+#   python -m benchmarks.load --save before.json
+#   python -m benchmarks.load --baseline before.json --threshold 0.2
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--url', help='Base URL of a running server; in-process when omitted')
+parser.add_argument('--teams', type=int, default=20)
+parser.add_argument('--users', type=int, default=400)
+parser.add_argument('--feedback', type=int, default=20000, help='Rows seeded in-process mode')
+parser.add_argument('--prefix', default='seed')
+parser.add_argument('--password', default='password123')
+parser.add_argument('--concurrency', type=int, default=4)
+parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+parser.add_argument('--mix', default='login=1,list=6,create=2,ack=1', help='Relative weights per operation')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--save', help='Write results to this JSON file')
+parser.add_argument('--baseline', help='Compare with results saved by an earlier run')
+parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 slowdown against the baseline')
+OPERATIONS = ('login', 'list', 'create', 'ack')
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            parser.error(f'unknown operation in --mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, token=None, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+class TestClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, token=None, body=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+def setup_in_process():
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'load.db')
+    os.environ.pop('DATABASE_URL', None)
+    # Match the fixture cost so logins don't rehash to the production default
+    os.environ.setdefault('BCRYPT_ROUNDS', '4')
+    # Every worker shares one client address, which the per-IP limit would throttle
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import migrations
+    import seed
+    from app import app, db
+
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        start = time.monotonic()
+        seed.generate(args.teams, args.users, args.feedback, prefix=args.prefix, password=args.password, seed=args.seed, log=lambda message: None)
+        print(f'Seeded {args.teams} teams, {args.users} users, {args.feedback} feedback in {time.monotonic() - start:.1f}s')
+    return lambda: TestClient(app)
+
+class Worker(threading.Thread):
+    def __init__(self, index, client, mix):
+        super().__init__(daemon=True)
+        self.client = client
+        self.rng = random.Random(args.seed * 1000 + index)
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.deadline = None
+        self.samples = {name: [] for name in self.operations}
+        self.errors = {name: 0 for name in self.operations}
+        self.unacknowledged = []
+
+        # Each worker acts as one manager and one of that manager's employees
+        self.manager = self.rng.randrange(args.teams)
+        employees = range(self.manager, args.users - args.teams, args.teams)
+        self.employees = [f'{args.prefix}-emp-{n}' for n in employees]
+        self.employee = self.rng.choice(employees) if employees else None
+        self.manager_token = self.login(manager_email(self.manager))
+        self.employee_token = self.login(employee_email(self.employee)) if self.employee is not None else None
+
+    def login(self, email):
+        status, body = self.client.request('POST', '/api/auth/login', body={'email': email, 'password': args.password})
+        if status != 200:
+            raise SystemExit(f'Login as {email} failed with {status}; is the server seeded with --prefix {args.prefix}?')
+        return body['token']
+
+    def op_login(self):
+        n = self.rng.randrange(args.users)
+        email = manager_email(n) if n < args.teams else employee_email(n - args.teams)
+        return self.client.request('POST', '/api/auth/login', body={'email': email, 'password': args.password})
+
+    def op_list(self):
+        return self.client.request('GET', '/api/feedback?limit=50', token=self.manager_token)
+
+    def op_create(self):
+        return self.client.request('POST', '/api/feedback', token=self.manager_token, body={
+            'employeeId': self.rng.choice(self.employees),
+            'strengths': 'Clear written updates and strong ownership of the release.',
+            'areasToImprove': 'Could raise blockers earlier in the sprint.',
+            'sentiment': self.rng.choice(('positive', 'neutral', 'negative'))
+        })
+
+    def op_ack(self):
+        return self.client.request('POST', f'/api/feedback/{self.unacknowledged.pop()}/acknowledge', token=self.employee_token)
+
+    def refill(self):
+        status, body = self.client.request('GET', '/api/feedback?acknowledged=false&limit=50', token=self.employee_token)
+        if status == 200:
+            self.unacknowledged = [item['id'] for item in body['feedback']]
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            name = self.rng.choices(self.operations, self.weights)[0]
+            if name == 'ack':
+                if self.employee_token is None:
+                    continue
+                # Refilling the queue of ids is not part of the timed operation
+                if not self.unacknowledged:
+                    self.refill()
+                    if not self.unacknowledged:
+                        continue
+            start = time.perf_counter()
+            status, _ = getattr(self, f'op_{name}')()
+            elapsed = time.perf_counter() - start
+            if status >= 400:
+                self.errors[name] += 1
+            else:
+                self.samples[name].append(elapsed)
+
+def manager_email(n):
+    return f'{args.prefix}-manager-{n}@example.com'
+
+def employee_email(n):
+    return f'{args.prefix}-employee-{n}@example.com'
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(samples, errors, seconds):
+    samples = sorted(samples)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': len(samples) / seconds,
+        'mean_ms': sum(samples) / len(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    regressions = []
+    for name, current in results['operations'].items():
+        previous = baseline['operations'].get(name)
+        if not previous or not previous['p95_ms']:
+            continue
+        change = current['p95_ms'] / previous['p95_ms'] - 1
+        marker = '  REGRESSION' if change > args.threshold else ''
+        print(f'  {name:<8} p95 {previous["p95_ms"]:8.2f} -> {current["p95_ms"]:8.2f} ms  {change:+7.1%}{marker}')
+        if marker:
+            regressions.append(name)
+    return regressions
+
+def main():
+    mix = parse_mix(args.mix)
+    make_client = (lambda: HttpClient(args.url)) if args.url else setup_in_process()
+
+    workers = [Worker(index, make_client(), mix) for index in range(args.concurrency)]
+    start = time.monotonic()
+    deadline = start + args.duration
+    for worker in workers:
+        worker.deadline = deadline
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.monotonic() - start
+
+    operations = {}
+    for name in mix:
+        operations[name] = summarize(
+            [sample for worker in workers for sample in worker.samples[name]],
+            sum(worker.errors[name] for worker in workers),
+            seconds
+        )
+    results = {
+        'commit': git_commit(),
+        'mode': 'http' if args.url else 'in-process',
+        'config': {key: getattr(args, key) for key in ('teams', 'users', 'feedback', 'concurrency', 'duration', 'mix', 'seed')},
+        'seconds': seconds,
+        'operations': operations,
+        'total': summarize(
+            [sample for worker in workers for name in mix for sample in worker.samples[name]],
+            sum(sum(worker.errors.values()) for worker in workers),
+            seconds
+        )
+    }
+
+    print(f'{results["mode"]}, {args.concurrency} workers, {seconds:.1f}s, commit {results["commit"]}')
+    print(f'  {"":<8} {"req":>7} {"err":>5} {"req/s":>8} {"mean":>8} {"p50":>8} {"p95":>8} {"p99":>8}  (ms)')
+    for name, stats in list(operations.items()) + [('total', results['total'])]:
+        print(
+            f'  {name:<8} {stats["requests"]:>7} {stats["errors"]:>5} {stats["throughput"]:>8.1f} '
+            f'{stats["mean_ms"]:>8.2f} {stats["p50_ms"]:>8.2f} {stats["p95_ms"]:>8.2f} {stats["p99_ms"]:>8.2f}'
+        )
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f'Against {args.baseline} (commit {baseline.get("commit")}), threshold {args.threshold:.0%}')
+        if compare(results, baseline):
+            sys.exit(1)
+
+# Login hashing runs in a forkserver pool whose workers import this module
+# again, so parse and run only when started as a script
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.users <= args.teams:
+        parser.error('--users must be greater than --teams (one manager per team)')
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Compares the original list serialization (ORM objects, per-row
+# .isoformat(), stdlib json) with the column-tuple + JSON provider path
+# used by GET /api/feedback.
+#
+#   python -m benchmarks.serialization --rows 20000
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rows', type=int, default=20000)
+parser.add_argument('--repeat', type=int, default=5)
+args = parser.parse_args()
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.pop('DATABASE_URL', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select
+import migrations
+from app import FEEDBACK_COLUMNS, Feedback, app, db, feedback_row_to_dict, read_session
+from ids import new_id
+
+def legacy_to_dict(feedback):
+    return {
+        'id': feedback.id,
+        'managerId': feedback.manager_id,
+        'employeeId': feedback.employee_id,
+        'strengths': feedback.strengths,
+        'areasToImprove': feedback.areas_to_improve,
+        'sentiment': feedback.sentiment,
+        'acknowledged': feedback.acknowledged,
+        'acknowledgedAt': feedback.acknowledged_at.isoformat() if feedback.acknowledged_at else None,
+        'createdAt': feedback.created_at.isoformat(),
+        'updatedAt': feedback.updated_at.isoformat()
+    }
+
+def legacy():
+    rows = Feedback.query.filter_by(manager_id='mgr1').all()
+    body = json.dumps({'feedback': [legacy_to_dict(f) for f in rows]}, sort_keys=True)
+    db.session.remove()
+    return len(body)
+
+def fast():
+    rows = read_session.execute(select(*FEEDBACK_COLUMNS).where(Feedback.manager_id == 'mgr1')).all()
+    body = app.json.dumps({'feedback': [feedback_row_to_dict(row) for row in rows]})
+    read_session.remove()
+    return len(body)
+
+def timed(fn):
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+with app.app_context():
+    migrations.upgrade(db.engine)
+    start = datetime(2024, 1, 1)
+    db.session.execute(insert(Feedback), [{
+        'id': new_id('fb'),
+        'manager_id': 'mgr1',
+        'employee_id': f'emp{i % 10}',
+        'strengths': 'Strong ownership of the release process and clear written updates. ' * 2,
+        'areas_to_improve': 'Could delegate more of the routine review work to the rest of the team.',
+        'sentiment': ('positive', 'neutral', 'negative')[i % 3],
+        'acknowledged': i % 2 == 0,
+        'acknowledged_at': start + timedelta(minutes=i + 30) if i % 2 == 0 else None,
+        'created_at': start + timedelta(minutes=i),
+        'updated_at': start + timedelta(minutes=i)
+    } for i in range(args.rows)])
+    db.session.commit()
+
+    print(f'{args.rows} rows, best of {args.repeat} ({type(app.json).__name__})')
+    baseline, _ = timed(legacy)
+    for name, fn in (('orm + isoformat + json', legacy), ('columns + provider', fast)):
+        seconds, size = timed(fn)
+        print(f'  {name:<24} {seconds * 1000:8.1f} ms  {size / 1024:8.0f} KiB  {baseline / seconds:5.2f}x')
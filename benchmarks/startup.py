@@ -0,0 +1,56 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Process startup time, measured as the wall time of a fresh interpreter
+# that imports wsgi.py (what gunicorn does) and exits.
+#
+#   first boot  empty SQLite database: migrations plus the demo fixture
+#   restart     database already initialized
+#   no init     INIT_DB_ON_START=false, database left to `flask init-db`
+#   floor       importing Flask and Flask-SQLAlchemy alone, for reference
+#
+#   python -m benchmarks.startup --runs 10
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--runs', type=int, default=5)
+args = parser.parse_args()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def measure(name, code, env, fresh=False):
+    samples = []
+    for _ in range(args.runs):
+        if fresh:
+            for entry in os.listdir(os.path.dirname(env['DATABASE_PATH'])):
+                os.remove(os.path.join(os.path.dirname(env['DATABASE_PATH']), entry))
+        samples.append(run(code, env))
+    print(f'  {name:<11} median {statistics.median(samples) * 1000:7.0f} ms   min {min(samples) * 1000:7.0f} ms')
+
+def main():
+    directory = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_PATH=os.path.join(directory, 'startup.db'))
+    env.pop('DATABASE_URL', None)
+    env.pop('DATABASE_READ_URL', None)
+    try:
+        # Compile bytecode first so no run pays for it
+        run('import wsgi', env)
+        print(f'{args.runs} runs each')
+        measure('first boot', 'import wsgi', env, fresh=True)
+        measure('restart', 'import wsgi', env)
+        measure('no init', 'import wsgi', dict(env, INIT_DB_ON_START='false'))
+        measure('floor', 'import flask, flask_sqlalchemy, sqlalchemy.orm', env)
+    finally:
+        shutil.rmtree(directory)
+
+main()
@@ -0,0 +1,83 @@
+from collections import deque, namedtuple
+import threading
+import time
+
+# Per-user event fan-out for the /api/events stream.
+#
+# Brokers expose latest_id(user_id), publish(user_ids, event, data) and
+# read(user_id, after_id, timeout), where a user id is any string naming
+# one user's channel (app.py scopes them by tenant). Event ids are opaque strings that only
+# need to be comparable by the broker that issued them; clients echo the
+# last one back as Last-Event-ID to replay what they missed.
+
+Event = namedtuple('Event', 'id event data')
+
+class MemoryBroker:
+    # Single-process broker; keeps the last `history` events for replay
+    def __init__(self, history):
+        self._events = deque(maxlen=history)
+        self._condition = threading.Condition()
+        self._last_id = 0
+
+    def latest_id(self, user_id):
+        with self._condition:
+            return str(self._last_id)
+
+    def publish(self, user_ids, event, data):
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, frozenset(user_ids), event, data))
+            self._condition.notify_all()
+
+    def read(self, user_id, after_id, timeout):
+        try:
+            after = int(after_id)
+        except (TypeError, ValueError):
+            after = self._last_id
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                events = [
+                    Event(str(event_id), event, data)
+                    for event_id, user_ids, event, data in self._events
+                    if event_id > after and user_id in user_ids
+                ]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._condition.wait(remaining)
+
+class RedisBroker:
+    # One Redis stream per user, so every worker sees every event and
+    # stream ids double as Last-Event-ID values
+    def __init__(self, url, history):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._history = history
+
+    def _key(self, user_id):
+        return f'feedbackflow:events:{user_id}'
+
+    def latest_id(self, user_id):
+        entries = self._redis.xrevrange(self._key(user_id), count=1)
+        return entries[0][0] if entries else '0-0'
+
+    def publish(self, user_ids, event, data):
+        pipeline = self._redis.pipeline()
+        for user_id in set(user_ids):
+            pipeline.xadd(self._key(user_id), {'event': event, 'data': data}, maxlen=self._history, approximate=True)
+        pipeline.execute()
+
+    def read(self, user_id, after_id, timeout):
+        response = self._redis.xread({self._key(user_id): after_id or self.latest_id(user_id)}, count=100, block=int(timeout * 1000))
+        return [
+            Event(event_id, fields['event'], fields['data'])
+            for _, entries in response
+            for event_id, fields in entries
+        ]
+
+def create_broker(url, history):
+    if url:
+        return RedisBroker(url, history)
+    return MemoryBroker(history)
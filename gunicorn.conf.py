@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+
+# Production server settings, all overridable from the environment
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Threaded workers: requests mostly wait on SQLite and the bcrypt pool.
+# Every open /api/events stream holds one of these threads, so the event
+# stream is best served by a separate deployment with
+# GUNICORN_WORKER_CLASS=gevent and GUNICORN_PRELOAD=false (see
+# docker-compose.yml), where each stream is a greenlet
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Each open /api/events stream holds one of a worker's threads, or one of
+# its connections under gevent, until the client leaves. Size the per-process
+# cap (read by app.py) from that budget, keeping room for ordinary requests.
+# Without a shared broker several workers can't all serve the stream, so it
+# defaults to off there and the worker count still applies
+if worker_class == 'gthread':
+    stream_budget = threads // 2
+elif worker_class in ('gevent', 'eventlet'):
+    stream_budget = worker_connections * 9 // 10
+else:
+    stream_budget = 0
+if workers > 1 and not os.environ.get('EVENT_BROKER_URL'):
+    stream_budget = 0
+os.environ.setdefault('SSE_MAX_STREAMS', str(stream_budget))
+
+# Recycle workers periodically; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Import the app (and run init_db) once in the master, then fork
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+accesslog = '-'
+# The default format with the path in place of the full request line: query
+# strings can carry credentials (the event stream's access_token)
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def on_starting(server):
+    # The in-process event broker only reaches streams held by the worker
+    # that handled the write, so several workers need a shared one
+    if server.cfg.workers == 1 or os.environ.get('EVENT_BROKER_URL'):
+        return
+    if int(os.environ['SSE_MAX_STREAMS']):
+        server.log.warning(
+            '%s workers keep their own events, so clients miss changes made through other workers; '
+            'set EVENT_BROKER_URL=redis://...', server.cfg.workers
+        )
+    else:
+        server.log.warning(
+            '/api/events is off with %s workers and no EVENT_BROKER_URL; set EVENT_BROKER_URL=redis://..., '
+            'run one worker, or serve the stream from another deployment', server.cfg.workers
+        )
+
+def post_fork(server, worker):
+    # Don't reuse database connections opened by the master before forking
+    from app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+import multiprocessing
+import os
+import threading
+import time
+
+# Password hashing off the request thread.
+#
+# Kept apart from app.py so pool workers only import bcrypt, not Flask and
+# the models.
+
+class PoolBusy(Exception):
+    pass
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_rounds(hashed):
+    # $2b$12$<salt+hash>
+    return int(hashed.split('$')[2])
+
+class HashPool:
+    def __init__(self, workers, queue_size, timeout, observer=None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        # Called as observer(operation, wait_seconds, run_seconds) for each
+        # completed hash, e.g. to feed metrics
+        self.observer = observer
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+
+    def _get_executor(self):
+        # Created lazily and per process, so a pool built before a server
+        # forks its workers is never shared with them. Pool processes come
+        # from a forkserver: forking this threaded process directly could
+        # copy a lock another thread holds. The server preloads just this
+        # module rather than __main__
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        queued = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusy()
+
+        with self._lock:
+            self.admitted += 1
+        start = time.monotonic()
+        try:
+            if self.workers > 0:
+                return self._get_executor().submit(fn, *args).result()
+            return fn(*args)
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.admitted -= 1
+                self.completed += 1
+                self.hash_seconds_total += elapsed
+                self.hash_seconds_max = max(self.hash_seconds_max, elapsed)
+            self._slots.release()
+            if self.observer is not None:
+                self.observer(fn.__name__.lstrip('_'), start - queued, elapsed)
+
+    def check_password(self, password, hashed):
+        return self.run(_checkpw, password, hashed)
+
+    def hash_password(self, password, rounds):
+        return self.run(_hashpw, password, rounds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'inFlight': self.admitted,
+                'queueDepth': max(0, self.admitted - max(self.workers, 1)),
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'avgHashSeconds': self.hash_seconds_total / self.completed if self.completed else 0.0,
+                'maxHashSeconds': self.hash_seconds_max
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
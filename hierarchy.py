@@ -0,0 +1,65 @@
+from sqlalchemy import and_, delete, insert, literal, select
+from sqlalchemy.orm import aliased
+
+# Closure table over User.manager_id.
+#
+# Every user has a row for itself at depth 0 plus one row per ancestor
+# (depth 1 is the direct manager, 2 the skip-level, ...). "Is X somewhere
+# under Y" is a primary key lookup on (ancestor_id, descendant_id), and
+# "everyone under Y" is a range scan on ancestor_id.
+
+def insert_user(connection, table, user_id, manager_id):
+    connection.execute(insert(table).values(ancestor_id=user_id, descendant_id=user_id, depth=0))
+    if manager_id:
+        connection.execute(insert(table).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(table.c.ancestor_id, literal(user_id), table.c.depth + 1)
+                .where(table.c.descendant_id == manager_id)
+        ))
+
+def move_subtree(connection, table, user_id, manager_id):
+    # Re-parents user_id and everyone under it
+    if manager_id and connection.execute(
+        select(table.c.depth).where(table.c.ancestor_id == user_id, table.c.descendant_id == manager_id)
+    ).first():
+        raise ValueError(f'{manager_id} reports to {user_id}; the move would create a cycle')
+
+    subtree = select(table.c.descendant_id).where(table.c.ancestor_id == user_id)
+    # Detach: drop every link from outside the subtree into it
+    connection.execute(delete(table).where(
+        table.c.descendant_id.in_(subtree),
+        table.c.ancestor_id.not_in(subtree)
+    ))
+    if manager_id:
+        above = aliased(table)
+        below = aliased(table)
+        connection.execute(insert(table).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+                .select_from(above.join(below, and_(above.c.descendant_id == manager_id, below.c.ancestor_id == user_id)))
+        ))
+
+def remove_user(connection, table, user_id):
+    # Reports of a removed user keep their own subtrees but lose the link upwards
+    subtree = select(table.c.descendant_id).where(table.c.ancestor_id == user_id)
+    connection.execute(delete(table).where(
+        table.c.descendant_id.in_(subtree),
+        table.c.ancestor_id.not_in(subtree.where(table.c.descendant_id != user_id))
+    ))
+
+def closure_rows(users):
+    # users: (id, manager_id) pairs. Walks up from each user; a manager_id
+    # cycle or a missing manager just ends the walk.
+    managers = dict(users)
+    rows = []
+    for user_id in managers:
+        rows.append({'ancestor_id': user_id, 'descendant_id': user_id, 'depth': 0})
+        seen = {user_id}
+        ancestor = managers.get(user_id)
+        depth = 1
+        while ancestor and ancestor not in seen and ancestor in managers:
+            rows.append({'ancestor_id': ancestor, 'descendant_id': user_id, 'depth': depth})
+            seen.add(ancestor)
+            ancestor = managers[ancestor]
+            depth += 1
+    return rows
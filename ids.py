@@ -0,0 +1,45 @@
+import base64
+import os
+import threading
+import time
+
+# ULID-style identifiers: 48-bit millisecond timestamp + 80 random bits,
+# Crockford base32 encoded. They sort by creation time, and ids generated
+# within the same millisecond stay ordered by incrementing the random part.
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+RANDOM_BITS = 80
+
+# base64.b32encode does the bit shuffling in C; translate its RFC 4648
+# alphabet to Crockford's afterwards
+_CROCKFORD = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ234567', ALPHABET)
+
+class UlidGenerator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self):
+        with self._lock:
+            ms = int(time.time() * 1000)
+            if ms <= self._last_ms:
+                # Same millisecond (or the clock stepped back): stay monotonic
+                ms = self._last_ms
+                random = self._last_random + 1
+                if random >> RANDOM_BITS:
+                    ms += 1
+                    random = int.from_bytes(os.urandom(10), 'big')
+            else:
+                random = int.from_bytes(os.urandom(10), 'big')
+            self._last_ms = ms
+            self._last_random = random
+
+        # 160 bits encode to 32 characters; the last 26 hold the 128-bit value
+        value = (ms << RANDOM_BITS) | random
+        return base64.b32encode(value.to_bytes(20, 'big')).decode('ascii')[6:].translate(_CROCKFORD)
+
+_generator = UlidGenerator()
+
+def new_id(prefix=''):
+    return prefix + _generator.new()
@@ -0,0 +1,185 @@
+from collections import Counter as StackCounter
+import os
+import re
+import sys
+import threading
+import time
+
+# Prometheus text-format metrics and a sampling profiler for slow requests.
+#
+# Metrics live in the process that recorded them; under gunicorn each
+# worker keeps its own and a scrape is answered by whichever worker takes
+# it, so label or aggregate by instance accordingly.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            labels = _labels(self.labelnames, key)
+            lines.append(f'{self.name}{{{labels}}} {_number(value)}' if labels else f'{self.name} {_number(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        # key -> [per-bucket counts..., sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in values:
+            labels = _labels(self.labelnames, key)
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_number(bound)}"}} {cumulative}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {_number(state[-1])}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+class Gauge:
+    # Read at scrape time: `collect` returns (label values..., value) rows
+    def __init__(self, name, documentation, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        for *key, value in sorted(self.collect()):
+            labels = _labels(self.labelnames, key)
+            lines.append(f'{self.name}{{{labels}}} {_number(value)}' if labels else f'{self.name} {_number(value)}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames, collect):
+        return self.register(Gauge(name, documentation, labelnames, collect))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+class SlowRequestProfiler:
+    # Samples the stacks of threads serving requests every `interval`
+    # seconds. When a request finishes after more than `threshold` seconds
+    # its samples are written to `directory` in the collapsed format read by
+    # flamegraph.pl and speedscope; faster requests are discarded.
+    def __init__(self, threshold, interval, directory):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self.dumped = 0
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_sampler(self):
+        # One sampler thread per process; threads don't survive a fork
+        if self._thread is None or self._pid != os.getpid():
+            self._thread = threading.Thread(target=self._sample_loop, name='slow-request-profiler', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+
+    def start(self):
+        with self._lock:
+            self._ensure_sampler()
+            self._active[threading.get_ident()] = StackCounter()
+
+    def stop(self, elapsed, name):
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or elapsed < self.threshold:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-') or 'request'
+        path = os.path.join(self.directory, f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{slug}-{int(elapsed * 1000)}ms.folded')
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with self._lock:
+            self.dumped += 1
+        return path
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
@@ -0,0 +1,436 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, Index, Integer, LargeBinary, MetaData, String, Table, Text,
+    inspect, select, text, tuple_
+)
+
+# Versioned schema migrations, applied in order by upgrade().
+#
+# Each migration describes the schema as it was at that version, so later
+# model changes never alter what an earlier migration creates.
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+def _add_missing_columns(conn, table):
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    quote = conn.dialect.identifier_preparer.quote
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=conn.dialect)}'
+        if column.server_default is not None:
+            ddl += f' DEFAULT {column.server_default.arg}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+        conn.execute(text(ddl))
+
+def _0001_baseline(conn):
+    metadata = MetaData()
+    tables = [
+        Table(
+            'user', metadata,
+            Column('id', String(50), primary_key=True),
+            Column('email', String(120), unique=True, nullable=False),
+            Column('name', String(100), nullable=False),
+            Column('password_hash', String(128), nullable=False),
+            Column('role', String(20), nullable=False),
+            Column('team_id', String(50), nullable=False),
+            Column('manager_id', String(50), nullable=True),
+            Column('token_version', Integer, nullable=False, server_default='1'),
+            Column('created_at', DateTime)
+        ),
+        Table(
+            'team', metadata,
+            Column('id', String(50), primary_key=True),
+            Column('name', String(100), nullable=False),
+            Column('manager_id', String(50), nullable=False),
+            Column('created_at', DateTime)
+        ),
+        Table(
+            'feedback', metadata,
+            Column('id', String(50), primary_key=True),
+            Column('manager_id', String(50), nullable=False),
+            Column('employee_id', String(50), nullable=False),
+            Column('strengths', Text, nullable=False),
+            Column('areas_to_improve', Text, nullable=False),
+            Column('sentiment', String(20), nullable=False),
+            Column('acknowledged', Boolean),
+            Column('acknowledged_at', DateTime, nullable=True),
+            Column('created_at', DateTime),
+            Column('updated_at', DateTime),
+            Index('ix_feedback_manager_created', 'manager_id', 'created_at', 'id'),
+            Index('ix_feedback_employee_created', 'employee_id', 'created_at', 'id')
+        ),
+        Table(
+            'feedback_counter', metadata,
+            Column('manager_id', String(50), primary_key=True),
+            Column('positive', Integer, nullable=False),
+            Column('neutral', Integer, nullable=False),
+            Column('negative', Integer, nullable=False),
+            Column('acknowledged', Integer, nullable=False)
+        )
+    ]
+    # Databases created by db.create_all() before migrations existed may
+    # already hold some of this schema
+    for table in tables:
+        table.create(conn, checkfirst=True)
+        _add_missing_columns(conn, table)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def _0002_user_updated_at(conn):
+    _add_missing_columns(conn, Table('user', MetaData(), Column('updated_at', DateTime)))
+
+# feedback's key is a string, so its rowid isn't stable: VACUUM or a dump
+# and restore may renumber it. The search index is keyed by search_id
+# instead, which the insert trigger numbers after the largest one so far
+# (migration 13)
+FEEDBACK_FTS_INSERT_TRIGGER = (
+    "CREATE TRIGGER feedback_fts_insert AFTER INSERT ON feedback BEGIN "
+    "UPDATE feedback SET search_id = (SELECT coalesce(max(search_id), 0) + 1 FROM feedback) "
+    "WHERE rowid = new.rowid AND search_id IS NULL; "
+    "INSERT INTO feedback_fts(rowid, strengths, areas_to_improve) "
+    "SELECT search_id, strengths, areas_to_improve FROM feedback WHERE rowid = new.rowid; END"
+)
+
+@contextmanager
+def deferred_search_index(conn):
+    # For bulk loads on SQLite: indexing rows one trigger at a time is far
+    # slower than numbering them and rebuilding once the rows are in
+    if conn.dialect.name != 'sqlite':
+        yield
+        return
+    conn.execute(text('DROP TRIGGER feedback_fts_insert'))
+    yield
+    _number_search_ids(conn)
+    conn.execute(text("INSERT INTO feedback_fts(feedback_fts) VALUES ('rebuild')"))
+    conn.execute(text(FEEDBACK_FTS_INSERT_TRIGGER))
+
+def _number_search_ids(conn):
+    # rowids are unique, so offsetting them past the largest search_id keeps search_id unique
+    conn.execute(text(
+        "UPDATE feedback SET search_id = rowid + (SELECT coalesce(max(search_id), 0) FROM feedback) "
+        "WHERE search_id IS NULL"
+    ))
+
+def _0003_feedback_search(conn):
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(
+            "ALTER TABLE feedback ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            "(to_tsvector('english', strengths || ' ' || areas_to_improve)) STORED"
+        ))
+        conn.execute(text('CREATE INDEX ix_feedback_search ON feedback USING GIN (search_vector)'))
+        return
+
+    # External-content FTS5 index over feedback, kept in sync by triggers so
+    # every write path (ORM, bulk insert, copy-data) is covered
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE feedback_fts USING fts5("
+        "strengths, areas_to_improve, content='feedback', content_rowid='rowid', tokenize='porter unicode61')"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER feedback_fts_insert AFTER INSERT ON feedback BEGIN "
+        "INSERT INTO feedback_fts(rowid, strengths, areas_to_improve) "
+        "VALUES (new.rowid, new.strengths, new.areas_to_improve); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER feedback_fts_delete AFTER DELETE ON feedback BEGIN "
+        "INSERT INTO feedback_fts(feedback_fts, rowid, strengths, areas_to_improve) "
+        "VALUES ('delete', old.rowid, old.strengths, old.areas_to_improve); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER feedback_fts_update AFTER UPDATE OF strengths, areas_to_improve ON feedback BEGIN "
+        "INSERT INTO feedback_fts(feedback_fts, rowid, strengths, areas_to_improve) "
+        "VALUES ('delete', old.rowid, old.strengths, old.areas_to_improve); "
+        "INSERT INTO feedback_fts(rowid, strengths, areas_to_improve) "
+        "VALUES (new.rowid, new.strengths, new.areas_to_improve); END"
+    ))
+    conn.execute(text("INSERT INTO feedback_fts(feedback_fts) VALUES ('rebuild')"))
+
+def _0004_feedback_rollups(conn):
+    counts = ['positive', 'neutral', 'negative', 'acknowledged']
+    latency = ['ack_le_5m', 'ack_le_15m', 'ack_le_1h', 'ack_le_4h', 'ack_le_12h', 'ack_le_1d', 'ack_le_2d', 'ack_le_3d',
+               'ack_le_7d', 'ack_le_14d', 'ack_le_30d', 'ack_gt_30d']
+    table = Table(
+        'feedback_rollup', MetaData(),
+        Column('period', String(10), primary_key=True),
+        Column('bucket_start', Date, primary_key=True),
+        Column('manager_id', String(50), primary_key=True),
+        Column('employee_id', String(50), primary_key=True),
+        *[Column(name, Integer, nullable=False) for name in counts],
+        Column('ack_seconds_total', Float, nullable=False),
+        *[Column(name, Integer, nullable=False) for name in latency],
+        Index('ix_feedback_rollup_manager', 'manager_id', 'period', 'bucket_start'),
+        Index('ix_feedback_rollup_employee', 'employee_id', 'period', 'bucket_start')
+    )
+    table.create(conn)
+
+def _0005_user_hierarchy(conn):
+    Table(
+        'user_hierarchy', MetaData(),
+        Column('ancestor_id', String(50), primary_key=True),
+        Column('descendant_id', String(50), primary_key=True),
+        Column('depth', Integer, nullable=False),
+        Index('ix_user_hierarchy_descendant', 'descendant_id', 'depth')
+    ).create(conn)
+
+def _0006_jobs(conn):
+    Table(
+        'job', MetaData(),
+        Column('id', String(50), primary_key=True),
+        Column('kind', String(50), nullable=False),
+        Column('payload', Text, nullable=False),
+        Column('idempotency_key', String(200), unique=True),
+        Column('status', String(20), nullable=False),
+        Column('attempts', Integer, nullable=False),
+        Column('max_attempts', Integer, nullable=False),
+        Column('run_at', DateTime, nullable=False),
+        Column('locked_by', String(100)),
+        Column('last_error', Text),
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime),
+        Index('ix_job_due', 'status', 'run_at')
+    ).create(conn)
+
+def _0007_feedback_version(conn):
+    # The default fills existing rows; PostgreSQL does that without rewriting the table
+    _add_missing_columns(conn, Table('feedback', MetaData(), Column('version', Integer, nullable=False, server_default='1')))
+
+def _rebuild_sqlite_table(conn, table):
+    # SQLite can't drop a constraint, so the table is recreated from `table`
+    # and the rows copied over; columns the old table lacks get their defaults
+    quote = conn.dialect.identifier_preparer.quote
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    columns = ', '.join(quote(column.name) for column in table.columns if column.name in existing)
+    staging = Table(f'{table.name}_rebuild', MetaData(), *[column._copy() for column in table.columns])
+    staging.create(conn)
+    conn.execute(text(f'INSERT INTO {quote(staging.name)} ({columns}) SELECT {columns} FROM {quote(table.name)}'))
+    conn.execute(text(f'DROP TABLE {quote(table.name)}'))
+    conn.execute(text(f'ALTER TABLE {quote(staging.name)} RENAME TO {quote(table.name)}'))
+
+def _0008_tenants(conn):
+    tenant = Table(
+        'tenant', MetaData(),
+        Column('id', String(50), primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('shard', String(50), nullable=False),
+        Column('status', String(20), nullable=False),
+        Column('created_at', DateTime)
+    )
+    tenant.create(conn)
+    # Everything already stored belongs to the default organization
+    conn.execute(tenant.insert().values(id='default', name='Default', shard='default', status='active', created_at=datetime.utcnow()))
+
+    def tenant_id():
+        return Column('tenant_id', String(50), nullable=False, server_default=text("'default'"))
+    for name in ('team', 'feedback'):
+        _add_missing_columns(conn, Table(name, MetaData(), tenant_id()))
+
+    # Email uniqueness moves from the whole table to each tenant
+    user = Table(
+        'user', MetaData(),
+        Column('id', String(50), primary_key=True),
+        tenant_id(),
+        Column('email', String(120), nullable=False),
+        Column('name', String(100), nullable=False),
+        Column('password_hash', String(128), nullable=False),
+        Column('role', String(20), nullable=False),
+        Column('team_id', String(50), nullable=False),
+        Column('manager_id', String(50), nullable=True),
+        Column('token_version', Integer, nullable=False, server_default='1'),
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime)
+    )
+    if conn.dialect.name == 'sqlite':
+        _rebuild_sqlite_table(conn, user)
+    else:
+        _add_missing_columns(conn, user)
+        for constraint in inspect(conn).get_unique_constraints('user'):
+            if constraint['column_names'] == ['email']:
+                conn.execute(text(f'ALTER TABLE "user" DROP CONSTRAINT "{constraint["name"]}"'))
+    Index('ix_user_tenant_email', user.c.tenant_id, user.c.email, unique=True).create(conn)
+    feedback = Table('feedback', MetaData(), Column('id', String(50)), Column('tenant_id', String(50)))
+    Index('ix_feedback_tenant', feedback.c.tenant_id, feedback.c.id).create(conn)
+
+def _0009_feedback_archive(conn):
+    Table(
+        'feedback_archive', MetaData(),
+        Column('id', String(50), primary_key=True),
+        Column('tenant_id', String(50), nullable=False),
+        Column('manager_id', String(50), nullable=False),
+        Column('employee_id', String(50), nullable=False),
+        Column('sentiment', String(20), nullable=False),
+        Column('acknowledged', Boolean),
+        Column('acknowledged_at', DateTime),
+        Column('created_at', DateTime),
+        Column('payload', LargeBinary, nullable=False),
+        Column('archived_at', DateTime, nullable=False),
+        Index('ix_feedback_archive_manager_created', 'manager_id', 'created_at', 'id'),
+        Index('ix_feedback_archive_employee_created', 'employee_id', 'created_at', 'id'),
+        Index('ix_feedback_archive_tenant', 'tenant_id', 'id')
+    ).create(conn)
+
+def _0010_feedback_counter_pairs(conn):
+    # Counters move from one row per manager, seeded lazily on first read, to
+    # one per manager and employee kept by every write. The old rows may be
+    # missing or partial, so the table is recreated and then backfilled
+    # from feedback (see BACKFILLS in app.py)
+    conn.execute(text('DROP TABLE feedback_counter'))
+    Table(
+        'feedback_counter', MetaData(),
+        Column('manager_id', String(50), primary_key=True),
+        Column('employee_id', String(50), primary_key=True),
+        *[Column(name, Integer, nullable=False) for name in ('positive', 'neutral', 'negative', 'acknowledged')],
+        Index('ix_feedback_counter_employee', 'employee_id')
+    ).create(conn)
+
+def _0011_feedback_counter_version(conn):
+    # Bumped by every write to a pair, so list ETags can be derived from the
+    # counter rows in scope instead of scanning feedback
+    _add_missing_columns(conn, Table('feedback_counter', MetaData(), Column('version', Integer, nullable=False, server_default='0')))
+
+def _0012_feedback_counter_archived(conn):
+    # Totals for archived feedback, kept apart so stats can match lists with
+    # and without include_archived; backfilled from both tiers
+    _add_missing_columns(conn, Table(
+        'feedback_counter', MetaData(),
+        *[Column(f'archived_{name}', Integer, nullable=False, server_default='0')
+          for name in ('positive', 'neutral', 'negative', 'acknowledged')]
+    ))
+
+def _0013_feedback_search_id(conn):
+    # Rekeys the SQLite search index from feedback's rowid to a stored
+    # search_id (see FEEDBACK_FTS_INSERT_TRIGGER). PostgreSQL keeps the
+    # tsvector on the row itself
+    if conn.dialect.name != 'sqlite':
+        return
+    for trigger in ('feedback_fts_insert', 'feedback_fts_delete', 'feedback_fts_update'):
+        conn.execute(text(f'DROP TRIGGER {trigger}'))
+    conn.execute(text('DROP TABLE feedback_fts'))
+    conn.execute(text('ALTER TABLE feedback ADD COLUMN search_id INTEGER'))
+    _number_search_ids(conn)
+    conn.execute(text('CREATE UNIQUE INDEX ix_feedback_search_id ON feedback (search_id)'))
+
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE feedback_fts USING fts5("
+        "strengths, areas_to_improve, content='feedback', content_rowid='search_id', tokenize='porter unicode61')"
+    ))
+    conn.execute(text(FEEDBACK_FTS_INSERT_TRIGGER))
+    conn.execute(text(
+        "CREATE TRIGGER feedback_fts_delete AFTER DELETE ON feedback BEGIN "
+        "INSERT INTO feedback_fts(feedback_fts, rowid, strengths, areas_to_improve) "
+        "VALUES ('delete', old.search_id, old.strengths, old.areas_to_improve); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER feedback_fts_update AFTER UPDATE OF strengths, areas_to_improve ON feedback BEGIN "
+        "INSERT INTO feedback_fts(feedback_fts, rowid, strengths, areas_to_improve) "
+        "VALUES ('delete', old.search_id, old.strengths, old.areas_to_improve); "
+        "INSERT INTO feedback_fts(rowid, strengths, areas_to_improve) "
+        "VALUES (new.search_id, new.strengths, new.areas_to_improve); END"
+    ))
+    conn.execute(text("INSERT INTO feedback_fts(feedback_fts) VALUES ('rebuild')"))
+
+MIGRATIONS = [
+    (1, 'baseline', _0001_baseline),
+    (2, 'user_updated_at', _0002_user_updated_at),
+    (3, 'feedback_search', _0003_feedback_search),
+    (4, 'feedback_rollups', _0004_feedback_rollups),
+    (5, 'user_hierarchy', _0005_user_hierarchy),
+    (6, 'jobs', _0006_jobs),
+    (7, 'feedback_version', _0007_feedback_version),
+    (8, 'tenants', _0008_tenants),
+    (9, 'feedback_archive', _0009_feedback_archive),
+    (10, 'feedback_counter_pairs', _0010_feedback_counter_pairs),
+    (11, 'feedback_counter_version', _0011_feedback_counter_version),
+    (12, 'feedback_counter_archived', _0012_feedback_counter_archived),
+    (13, 'feedback_search_id', _0013_feedback_search_id),
+]
+
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+
+    ran = []
+    for version, name, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        # One transaction per migration, so a failure leaves earlier ones applied
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        ran.append(name)
+    return ran
+
+# Arbitrary but fixed: every process asks PostgreSQL for the same advisory lock
+ADVISORY_LOCK_ID = 0x46464442
+
+@contextmanager
+def exclusive(engine):
+    # Serializes one-time setup (migrations, demo data) across processes,
+    # including separate containers sharing a PostgreSQL database
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as conn:
+            conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+                conn.commit()
+    elif engine.url.database and engine.url.database != ':memory:':
+        import fcntl
+        with open(f'{engine.url.database}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    else:
+        yield
+
+def copy_data(source, target, tables, batch_size=1000, log=print):
+    # Streams rows table by table in batches. Rows whose primary key is
+    # already in the target are skipped, so an interrupted copy can simply
+    # be rerun.
+    copied = {}
+    for table in tables:
+        if not inspect(source).has_table(table.name):
+            continue
+        source_columns = {column['name'] for column in inspect(source).get_columns(table.name)}
+        columns = [column for column in table.columns if column.name in source_columns]
+        # Compared on the whole key, so tables with composite keys (rollups,
+        # hierarchy, counters) are deduplicated correctly
+        pk = table.primary_key.columns.values()
+        if any(column.name not in source_columns for column in pk):
+            # The source predates this table's current key; it is a derived
+            # table the caller rebuilds
+            log(f'{table.name}: skipped, the source has an older key')
+            continue
+
+        count = 0
+        with source.connect() as src:
+            result = src.execution_options(stream_results=True, yield_per=batch_size).execute(select(*columns))
+            for batch in result.partitions(batch_size):
+                rows = [dict(row._mapping) for row in batch]
+                with target.begin() as dst:
+                    keys = [tuple(row[column.name] for column in pk) for row in rows]
+                    existing = {tuple(key) for key in dst.execute(select(*pk).where(tuple_(*pk).in_(keys)))}
+                    rows = [row for row, key in zip(rows, keys) if key not in existing]
+                    if rows:
+                        dst.execute(table.insert(), rows)
+                count += len(rows)
+                log(f'{table.name}: {count} rows copied')
+        copied[table.name] = count
+    return copied
@@ -0,0 +1,120 @@
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+# Token-bucket rate limiting.
+#
+# A limit of "10/minute" is a bucket holding 10 tokens that refills at
+# 10 per minute: bursts of up to 10 go through, and the sustained rate
+# is 10 a minute. Stores expose take(key, limit) and return a Decision.
+# The memory store is per process, so under gunicorn each worker enforces
+# its own copy of every limit; the Redis store shares buckets between them.
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+Limit = namedtuple('Limit', 'count period')
+# remaining is in whole tokens; reset is seconds until the bucket is full
+# again, retry_after seconds until the next token when not allowed
+Decision = namedtuple('Decision', 'allowed limit remaining reset retry_after')
+
+def parse_limit(spec):
+    # '10/minute' -> Limit(10, 60); 'off' -> None
+    spec = spec.strip()
+    if spec == 'off':
+        return None
+    count, _, period = spec.partition('/')
+    if period not in PERIODS or not count.isdigit() or int(count) < 1:
+        raise ValueError(f'Invalid rate limit {spec!r}; expected e.g. 10/minute')
+    return Limit(int(count), PERIODS[period])
+
+def parse_rules(spec, rules=None):
+    # 'login.ip=30/minute; default.user=off' -> {endpoint: {scope: Limit}};
+    # later entries override earlier ones
+    rules = {} if rules is None else rules
+    for entry in spec.split(';'):
+        if not entry.strip():
+            continue
+        target, _, limit = entry.partition('=')
+        endpoint, _, scope = target.strip().rpartition('.')
+        if not endpoint or not scope:
+            raise ValueError(f'Invalid rate limit rule {entry.strip()!r}; expected endpoint.scope=limit')
+        rules.setdefault(endpoint, {})[scope] = parse_limit(limit)
+    return rules
+
+def _decision(allowed, limit, tokens):
+    rate = limit.count / limit.period
+    return Decision(
+        allowed,
+        limit,
+        int(tokens),
+        (limit.count - tokens) / rate,
+        0.0 if allowed else (1 - tokens) / rate
+    )
+
+class MemoryStore:
+    # LRU over at most `maxsize` buckets; evicting one forgets its history,
+    # which at worst lets that client start over with a full bucket
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, limit):
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                tokens = limit.count
+            else:
+                tokens, last = state
+                tokens = min(limit.count, tokens + (now - last) * limit.count / limit.period)
+                self._buckets.move_to_end(key)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return _decision(allowed, limit, tokens)
+
+# Refill and take in one round trip, on Redis' clock so every worker agrees.
+# Buckets expire once they would be full again
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = capacity
+if state[1] then
+    tokens = math.min(capacity, tonumber(state[1]) + (now - tonumber(state[2])) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+class RedisStore:
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._take = self._redis.register_script(TAKE_SCRIPT)
+
+    def take(self, key, limit):
+        allowed, tokens = self._take(keys=[f'feedbackflow:ratelimit:{key}'], args=[limit.count, limit.count / limit.period])
+        return _decision(bool(allowed), limit, float(tokens))
+
+def create_store(url, maxsize):
+    if url:
+        return RedisStore(url)
+    return MemoryStore(maxsize)
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from functools import lru_cache
+import storage
+
+# Daily and weekly feedback rollups behind /api/analytics/trends.
+#
+# Each feedback row counts towards the day and ISO week (Monday start, UTC)
+# it was created in, keyed by manager and employee. Acknowledgement latency
+# is attributed to the same cohort and stored as a fixed histogram, so
+# percentiles can be read back from rollup rows alone.
+
+PERIODS = ('day', 'week')
+KEY_COLUMNS = ('period', 'bucket_start', 'manager_id', 'employee_id')
+
+# Upper bounds in seconds; anything slower lands in ack_gt_30d
+LATENCY_BUCKETS = (
+    ('ack_le_5m', 300),
+    ('ack_le_15m', 900),
+    ('ack_le_1h', 3600),
+    ('ack_le_4h', 4 * 3600),
+    ('ack_le_12h', 12 * 3600),
+    ('ack_le_1d', 86400),
+    ('ack_le_2d', 2 * 86400),
+    ('ack_le_3d', 3 * 86400),
+    ('ack_le_7d', 7 * 86400),
+    ('ack_le_14d', 14 * 86400),
+    ('ack_le_30d', 30 * 86400),
+)
+LATENCY_OVERFLOW = 'ack_gt_30d'
+LATENCY_COLUMNS = tuple(column for column, _ in LATENCY_BUCKETS) + (LATENCY_OVERFLOW,)
+VALUE_COLUMNS = ('positive', 'neutral', 'negative', 'acknowledged', 'ack_seconds_total') + LATENCY_COLUMNS
+
+def bucket_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+def latency_column(seconds):
+    for column, bound in LATENCY_BUCKETS:
+        if seconds <= bound:
+            return column
+    return LATENCY_OVERFLOW
+
+@lru_cache(maxsize=1024)
+def _bucket_starts(day):
+    return tuple((period, bucket_start(period, day)) for period in PERIODS)
+
+def add(deltas, manager_id, employee_id, created_at, **values):
+    # Accumulates into {key: {column: delta}} for both periods
+    for period, start in _bucket_starts(created_at.date()):
+        key = (period, start, manager_id, employee_id)
+        row = deltas.get(key)
+        if row is None:
+            row = deltas[key] = {}
+        for column, value in values.items():
+            row[column] = row.get(column, 0) + value
+
+def add_feedback(deltas, manager_id, employee_id, sentiment, created_at, acknowledged_at=None):
+    # Everything one feedback row contributes
+    add(deltas, manager_id, employee_id, created_at, **{sentiment: 1})
+    if acknowledged_at:
+        add_acknowledgement(deltas, manager_id, employee_id, created_at, acknowledged_at)
+
+def add_acknowledgement(deltas, manager_id, employee_id, created_at, acknowledged_at):
+    seconds = max(0.0, (acknowledged_at - created_at).total_seconds())
+    add(deltas, manager_id, employee_id, created_at, acknowledged=1, ack_seconds_total=seconds, **{latency_column(seconds): 1})
+
+def rows(deltas):
+    # Sorted by key so concurrent upserts lock rollup rows in the same order
+    return [
+        {**dict(zip(KEY_COLUMNS, key)), **{column: values.get(column, 0) for column in VALUE_COLUMNS}}
+        for key, values in sorted(deltas.items())
+    ]
+
+def upsert(connection, table, deltas):
+    if not deltas:
+        return
+    statement = storage.dialect_insert(connection, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={column: table.c[column] + statement.excluded[column] for column in VALUE_COLUMNS}
+    )
+    connection.execute(statement, rows(deltas))
+
+def percentile(counts, fraction):
+    # Linear interpolation inside the histogram bucket holding the rank;
+    # the open-ended overflow bucket reports its lower bound
+    total = sum(counts)
+    if not total:
+        return None
+    rank = fraction * total
+    cumulative = 0
+    lower = 0
+    for count, (_, upper) in zip(counts, LATENCY_BUCKETS):
+        if count and cumulative + count >= rank:
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = upper
+    return float(lower)
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+import bcrypt
+import random
+
+from app import Feedback, Team, User, UserHierarchy, add_to_counters, db, record_counters, record_rollups
+from ids import new_id
+import hierarchy
+import migrations
+import rollups
+
+# Synthetic data for load testing and benchmarks.
+#
+# Every user shares one password hash computed at a low cost factor, so
+# seeding time is dominated by the bulk inserts rather than bcrypt. Logins
+# follow the pattern {prefix}-manager-{n}@example.com and
+# {prefix}-employee-{n}@example.com.
+
+STRENGTHS = [
+    'Consistently delivers high-quality work ahead of deadlines.',
+    'Great collaboration with other teams and clear written updates.',
+    'Strong ownership of incidents and calm under pressure.',
+    'Mentors newer team members and shares knowledge generously.',
+    'Thorough testing and attention to detail in code reviews.',
+]
+AREAS_TO_IMPROVE = [
+    'Could raise blockers earlier instead of waiting for stand-up.',
+    'Would benefit from estimating tasks more conservatively.',
+    'Should delegate more of the routine work to grow the team.',
+    'Could be more vocal in planning discussions.',
+    'Needs to document decisions so others can follow them.',
+]
+
+def manager_email(prefix, n):
+    return f'{prefix}-manager-{n}@example.com'
+
+def employee_email(prefix, n):
+    return f'{prefix}-employee-{n}@example.com'
+
+def _insert(model, rows, batch_size):
+    # Core executemany: the ORM bulk path splits batches whenever the set of
+    # NULL columns changes from one row to the next
+    connection = db.session.connection()
+    for start in range(0, len(rows), batch_size):
+        connection.execute(model.__table__.insert(), rows[start:start + batch_size])
+
+def generate(teams, users, feedback, prefix='seed', password='password123', rounds=4, seed=0, batch_size=5000, log=print):
+    if users < teams:
+        raise ValueError('users must be at least the number of teams (one manager per team)')
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+    team_rows = []
+    manager_rows = []
+    for n in range(teams):
+        team_id = f'{prefix}-team-{n}'
+        manager_id = f'{prefix}-mgr-{n}'
+        team_rows.append({'id': team_id, 'name': f'Team {n}', 'manager_id': manager_id, 'created_at': now})
+        manager_rows.append({
+            'id': manager_id,
+            'email': manager_email(prefix, n),
+            'name': f'Manager {n}',
+            'password_hash': password_hash,
+            'role': 'manager',
+            'team_id': team_id,
+            'manager_id': None,
+            'token_version': 1,
+            'created_at': now,
+            'updated_at': now
+        })
+
+    employee_rows = []
+    for n in range(users - teams):
+        manager = manager_rows[n % teams]
+        employee_rows.append({
+            'id': f'{prefix}-emp-{n}',
+            'email': employee_email(prefix, n),
+            'name': f'Employee {n}',
+            'password_hash': password_hash,
+            'role': 'employee',
+            'team_id': manager['team_id'],
+            'manager_id': manager['id'],
+            'token_version': 1,
+            'created_at': now,
+            'updated_at': now
+        })
+
+    _insert(Team, team_rows, batch_size)
+    _insert(User, manager_rows + employee_rows, batch_size)
+    # Core inserts skip the User mapper events; generated managers have no
+    # manager of their own, so these rows are the whole closure
+    _insert(UserHierarchy, hierarchy.closure_rows([(row['id'], row['manager_id']) for row in manager_rows + employee_rows]), batch_size)
+    log(f'{teams} teams, {users} users')
+
+    if employee_rows:
+        with migrations.deferred_search_index(db.session.connection()):
+            _generate_feedback(rng, employee_rows, feedback, now, batch_size, log)
+
+    db.session.commit()
+    return {'teams': teams, 'users': users, 'feedback': feedback if employee_rows else 0}
+
+def _generate_feedback(rng, employee_rows, feedback, now, batch_size, log):
+    # Spread feedback over the past year; about half is acknowledged
+    created = 0
+    deltas = {}
+    counter_deltas = {}
+    while created < feedback:
+        rows = []
+        for _ in range(min(batch_size, feedback - created)):
+            employee = rng.choice(employee_rows)
+            created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            acknowledged = rng.random() < 0.5
+            rows.append({
+                'id': new_id('fb'),
+                'manager_id': employee['manager_id'],
+                'employee_id': employee['id'],
+                'strengths': rng.choice(STRENGTHS),
+                'areas_to_improve': rng.choice(AREAS_TO_IMPROVE),
+                'sentiment': rng.choice(('positive', 'positive', 'neutral', 'negative')),
+                'acknowledged': acknowledged,
+                'acknowledged_at': created_at + timedelta(hours=rng.randrange(1, 96)) if acknowledged else None,
+                'created_at': created_at,
+                'updated_at': created_at
+            })
+        _insert(Feedback, rows, batch_size)
+        for row in rows:
+            rollups.add_feedback(deltas, row['manager_id'], row['employee_id'], row['sentiment'], row['created_at'], row['acknowledged_at'])
+            add_to_counters(counter_deltas, row['manager_id'], row['employee_id'],
+                            **{row['sentiment']: 1, 'acknowledged': 1 if row['acknowledged'] else 0})
+        created += len(rows)
+        log(f'{created} feedback')
+    record_rollups(deltas)
+    record_counters(counter_deltas)
@@ -1,14 +1,15 @@
 import React from 'react';
 import { Users, MessageSquare, TrendingUp, CheckCircle } from 'lucide-react';
 import { useAuth } from '../../contexts/AuthContext';
-import { useUsers, useFeedback } from '../../hooks/useApi';
+import { useUsers, useFeedback, useFeedbackStats } from '../../hooks/useApi';
 
 const ManagerDashboard: React.FC = () => {
   const { user } = useAuth();
   const { users: teamMembers, loading: usersLoading } = useUsers();
   const { feedback: feedbackData, loading: feedbackLoading } = useFeedback();
+  const { stats: feedbackStats, loading: statsLoading } = useFeedbackStats();
 
-  if (usersLoading || feedbackLoading) {
+  if (usersLoading || feedbackLoading || statsLoading) {
     return (
       <div className="p-6">
         <div className="animate-pulse">
@@ -26,14 +27,9 @@ const ManagerDashboard: React.FC = () => {
     );
   }
 
-  const sentimentCounts = {
-    positive: feedbackData.filter(f => f.sentiment === 'positive').length,
-    neutral: feedbackData.filter(f => f.sentiment === 'neutral').length,
-    negative: feedbackData.filter(f => f.sentiment === 'negative').length
-  };
-
-  const acknowledgedCount = feedbackData.filter(f => f.acknowledged).length;
-  const pendingCount = feedbackData.filter(f => !f.acknowledged).length;
+  const sentimentCounts = feedbackStats?.sentiment ?? { positive: 0, neutral: 0, negative: 0 };
+  const acknowledgedCount = feedbackStats?.acknowledged ?? 0;
+  const pendingCount = feedbackStats?.pending ?? 0;
 
   const stats = [
     {
@@ -45,7 +41,7 @@ const ManagerDashboard: React.FC = () => {
     },
     {
       title: 'Total Feedback',
-      value: feedbackData.length,
+      value: feedbackStats?.total ?? 0,
       icon: MessageSquare,
       color: 'bg-green-500',
       bgColor: 'bg-green-50'
@@ -66,9 +62,8 @@ const ManagerDashboard: React.FC = () => {
     }
   ];
 
-  const recentFeedback = feedbackData
-    .sort((a, b) => new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime())
-    .slice(0, 5);
+  // The API returns feedback newest first
+  const recentFeedback = feedbackData.slice(0, 5);
 
   return (
     <div className="p-6">
@@ -6,7 +6,9 @@ import { Edit2, Save, X, CheckCircle, Clock } from 'lucide-react';
 const FeedbackHistory: React.FC = () => {
   const { user } = useAuth();
   const { users: teamMembers, loading: usersLoading } = useUsers();
-  const { feedback: feedbackData, loading: feedbackLoading, updateFeedback } = useFeedback();
+  // Archived feedback is read-only and left out unless asked for
+  const [showArchived, setShowArchived] = useState(false);
+  const { feedback: feedbackData, loading: feedbackLoading, updateFeedback, hasMore, loadMore } = useFeedback({ includeArchived: showArchived });
   const [editingId, setEditingId] = useState<string | null>(null);
   const [editForm, setEditForm] = useState({
     strengths: '',
@@ -70,6 +72,15 @@ const FeedbackHistory: React.FC = () => {
       <div className="mb-8">
         <h1 className="text-2xl font-bold text-gray-900 mb-2">Feedback History</h1>
         <p className="text-gray-600">Review and manage all feedback you've given to your team</p>
+        <label className="mt-4 inline-flex items-center space-x-2 text-sm text-gray-600 cursor-pointer">
+          <input
+            type="checkbox"
+            checked={showArchived}
+            onChange={(e) => setShowArchived(e.target.checked)}
+            className="h-4 w-4 rounded border-gray-300 text-blue-600 focus:ring-blue-500"
+          />
+          <span>Show archived</span>
+        </label>
       </div>
 
       <div className="space-y-6">
@@ -105,7 +116,7 @@ const FeedbackHistory: React.FC = () => {
                   <span className="text-sm text-gray-500">
                     {new Date(feedback.createdAt).toLocaleDateString()}
                   </span>
-                  {editingId !== feedback.id && (
+                  {editingId !== feedback.id && feedback.managerId === user?.id && (
                     <button
                       onClick={() => handleEdit(feedback)}
                       className="p-2 text-gray-400 hover:text-blue-600 hover:bg-blue-50 rounded-lg transition-colors"
@@ -220,6 +231,16 @@ const FeedbackHistory: React.FC = () => {
             <p className="text-gray-600">You haven't given any feedback yet. Start by giving feedback to your team members.</p>
           </div>
         )}
+        {hasMore && (
+          <div className="text-center">
+            <button
+              onClick={loadMore}
+              className="px-4 py-2 text-sm font-medium text-blue-600 bg-white border border-gray-200 rounded-lg hover:bg-gray-50 transition-colors"
+            >
+              Load more
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { useAuth } from '../../contexts/AuthContext';
 import { useUsers, useFeedback } from '../../hooks/useApi';
 import { CheckCircle, Clock, MessageSquare, User as UserIcon } from 'lucide-react';
@@ -6,7 +6,9 @@ import { CheckCircle, Clock, MessageSquare, User as UserIcon } from 'lucide-reac
 const MyFeedback: React.FC = () => {
   const { user } = useAuth();
   const { users, loading: usersLoading } = useUsers();
-  const { feedback: myFeedback, loading: feedbackLoading, acknowledgeFeedback } = useFeedback();
+  // Archived feedback is left out unless asked for
+  const [showArchived, setShowArchived] = useState(false);
+  const { feedback: myFeedback, loading: feedbackLoading, acknowledgeFeedback, hasMore, loadMore } = useFeedback({ includeArchived: showArchived });
 
   if (usersLoading || feedbackLoading) {
     return (
@@ -46,6 +48,15 @@ const MyFeedback: React.FC = () => {
         <p className="text-gray-600">
           Review feedback from {manager ? manager.name : 'your manager'}
         </p>
+        <label className="mt-4 inline-flex items-center space-x-2 text-sm text-gray-600 cursor-pointer">
+          <input
+            type="checkbox"
+            checked={showArchived}
+            onChange={(e) => setShowArchived(e.target.checked)}
+            className="h-4 w-4 rounded border-gray-300 text-blue-600 focus:ring-blue-500"
+          />
+          <span>Show archived</span>
+        </label>
       </div>
 
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6 mb-8">
@@ -180,6 +191,16 @@ const MyFeedback: React.FC = () => {
               <p className="text-gray-600">You haven't received any feedback from your manager yet.</p>
             </div>
           )}
+          {hasMore && (
+            <div className="text-center mt-6">
+              <button
+                onClick={loadMore}
+                className="px-4 py-2 text-sm font-medium text-blue-600 bg-white border border-gray-200 rounded-lg hover:bg-gray-50 transition-colors"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { apiService } from '../services/api';
-import { User, Feedback } from '../types';
+import { User, Feedback, FeedbackStats } from '../types';
 
 export const useUsers = () => {
   const [users, setUsers] = useState<User[]>([]);
@@ -27,16 +27,19 @@ export const useUsers = () => {
   return { users, loading, error, refetch: fetchUsers };
 };
 
-export const useFeedback = () => {
+// includeArchived also lists feedback moved to the archive
+export const useFeedback = ({ includeArchived = false }: { includeArchived?: boolean } = {}) => {
   const [feedback, setFeedback] = useState<Feedback[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
   const fetchFeedback = async () => {
     try {
       setLoading(true);
-      const response = await apiService.getFeedback();
+      const response = await apiService.getFeedback({ include_archived: includeArchived });
       setFeedback(response.feedback);
+      setNextCursor(response.nextCursor);
       setError(null);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch feedback');
@@ -45,6 +48,20 @@ export const useFeedback = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    try {
+      const response = await apiService.getFeedback({ cursor: nextCursor, include_archived: includeArchived });
+      setFeedback(prev => [...prev, ...response.feedback]);
+      setNextCursor(response.nextCursor);
+      setError(null);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to fetch feedback');
+    }
+  };
+
   const createFeedback = async (feedbackData: {
     employeeId: string;
     strengths: string;
@@ -67,7 +84,8 @@ export const useFeedback = () => {
     sentiment?: 'positive' | 'neutral' | 'negative';
   }) => {
     try {
-      await apiService.updateFeedback(feedbackId, feedbackData);
+      const current = feedback.find(item => item.id === feedbackId);
+      await apiService.updateFeedback(feedbackId, feedbackData, current?.version);
       await fetchFeedback(); // Refresh the list
       return true;
     } catch (err) {
@@ -89,6 +107,21 @@ export const useFeedback = () => {
 
   useEffect(() => {
     fetchFeedback();
+  }, [includeArchived]);
+
+  // Merge live updates instead of re-polling the list
+  useEffect(() => {
+    return apiService.subscribeToFeedback((item) => {
+      setFeedback(prev => {
+        const index = prev.findIndex(f => f.id === item.id);
+        if (index === -1) {
+          return [item, ...prev];
+        }
+        const next = [...prev];
+        next[index] = item;
+        return next;
+      });
+    });
   }, []);
 
   return { 
@@ -96,8 +129,35 @@ export const useFeedback = () => {
     loading, 
     error, 
     refetch: fetchFeedback,
+    hasMore: nextCursor !== null,
+    loadMore,
     createFeedback,
     updateFeedback,
     acknowledgeFeedback
   };
+};
+
+export const useFeedbackStats = ({ includeArchived = false }: { includeArchived?: boolean } = {}) => {
+  const [stats, setStats] = useState<FeedbackStats | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+
+  const fetchStats = async () => {
+    try {
+      setLoading(true);
+      const response = await apiService.getFeedbackStats({ include_archived: includeArchived });
+      setStats(response.stats);
+      setError(null);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to fetch feedback stats');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    fetchStats();
+  }, [includeArchived]);
+
+  return { stats, loading, error, refetch: fetchStats };
 };
\ No newline at end of file
@@ -1,7 +1,23 @@
+import { Feedback } from '../types';
+
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000/api';
+// The event stream may be served by its own deployment (see docker-compose.yml)
+const EVENTS_BASE_URL = import.meta.env.VITE_EVENTS_URL || API_BASE_URL;
+
+const FEEDBACK_EVENTS = ['feedback.created', 'feedback.updated', 'feedback.acknowledged'];
+// A server out of stream slots answers 503, which EventSource reports like
+// any dropped connection, so failed attempts back off up to the maximum
+const EVENTS_RETRY_MS = 3000;
+const EVENTS_MAX_RETRY_MS = 5 * 60 * 1000;
 
 class ApiService {
   private token: string | null = null;
+  private feedbackListeners = new Set<(feedback: Feedback) => void>();
+  private eventSource: EventSource | null = null;
+  private eventsGeneration = 0;
+  private lastEventId: string | null = null;
+  private eventsFailures = 0;
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
 
   constructor() {
     this.token = localStorage.getItem('authToken');
@@ -50,8 +66,28 @@ class ApiService {
     return this.request('/users');
   }
 
-  async getFeedback() {
-    return this.request('/feedback');
+  async getFeedback(params: {
+    cursor?: string;
+    limit?: number;
+    sentiment?: 'positive' | 'neutral' | 'negative';
+    acknowledged?: boolean;
+    from?: string;
+    to?: string;
+    // Also return feedback moved to the archive
+    include_archived?: boolean;
+  } = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined) {
+        query.set(key, String(value));
+      }
+    });
+    const search = query.toString();
+    return this.request(search ? `/feedback?${search}` : '/feedback');
+  }
+
+  async getFeedbackStats(params: { include_archived?: boolean } = {}) {
+    return this.request(params.include_archived ? '/feedback/stats?include_archived=true' : '/feedback/stats');
   }
 
   async createFeedback(feedbackData: {
@@ -70,10 +106,12 @@ class ApiService {
     strengths?: string;
     areasToImprove?: string;
     sentiment?: 'positive' | 'neutral' | 'negative';
-  }) {
+  }, version?: number) {
+    // With a version the server rejects the edit (409) if someone changed the feedback since
     return this.request(`/feedback/${feedbackId}`, {
-      method: 'PUT',
+      method: 'PATCH',
       body: JSON.stringify(feedbackData),
+      headers: version === undefined ? {} : { 'If-Match': `"${version}"` },
     });
   }
 
@@ -87,6 +125,85 @@ class ApiService {
     return this.request('/teams');
   }
 
+  // Server-sent events for feedback changes. Every subscriber in the tab
+  // shares one EventSource, opened with the first and closed with the last
+  subscribeToFeedback(onFeedback: (feedback: Feedback) => void) {
+    this.feedbackListeners.add(onFeedback);
+    if (this.feedbackListeners.size === 1) {
+      this.openEvents();
+    }
+    return () => {
+      this.feedbackListeners.delete(onFeedback);
+      if (this.feedbackListeners.size === 0) {
+        this.closeEvents();
+      }
+    };
+  }
+
+  // The stream authenticates with a short-lived token in the URL, so rather
+  // than let EventSource retry with an expired one, a dropped connection is
+  // reopened with a fresh token and resumes after the last event seen
+  private async openEvents() {
+    const generation = this.eventsGeneration;
+    let token: string;
+    try {
+      token = (await this.request('/events/token', { method: 'POST' })).token;
+    } catch {
+      this.reconnectEvents(generation);
+      return;
+    }
+    if (generation !== this.eventsGeneration) {
+      return;
+    }
+
+    const params = new URLSearchParams({ access_token: token });
+    if (this.lastEventId) {
+      params.set('lastEventId', this.lastEventId);
+    }
+    const source = new EventSource(`${EVENTS_BASE_URL}/events?${params}`);
+    FEEDBACK_EVENTS.forEach((type) => {
+      source.addEventListener(type, (event) => {
+        const message = event as MessageEvent;
+        this.lastEventId = message.lastEventId;
+        const feedback = JSON.parse(message.data).feedback;
+        this.feedbackListeners.forEach((listener) => listener(feedback));
+      });
+    });
+    source.onopen = () => {
+      this.eventsFailures = 0;
+    };
+    source.onerror = () => {
+      source.close();
+      this.eventSource = null;
+      this.reconnectEvents(generation);
+    };
+    this.eventSource = source;
+  }
+
+  private reconnectEvents(generation: number) {
+    if (generation !== this.eventsGeneration) {
+      return;
+    }
+    const backoff = Math.min(EVENTS_RETRY_MS * 2 ** this.eventsFailures, EVENTS_MAX_RETRY_MS);
+    this.eventsFailures += 1;
+    // Jitter keeps tabs turned away together from returning together
+    this.reconnectTimer = setTimeout(() => {
+      this.reconnectTimer = null;
+      this.openEvents();
+    }, backoff / 2 + Math.random() * backoff / 2);
+  }
+
+  private closeEvents() {
+    // Anything still in flight for the old connection sees the new generation and stops
+    this.eventsGeneration += 1;
+    this.eventSource?.close();
+    this.eventSource = null;
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+  }
+
   logout() {
     this.token = null;
     localStorage.removeItem('authToken');
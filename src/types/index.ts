@@ -18,6 +18,18 @@ export interface Feedback {
   updatedAt: string;
   acknowledged: boolean;
   acknowledgedAt?: string;
+  version: number;
+}
+
+export interface FeedbackStats {
+  total: number;
+  acknowledged: number;
+  pending: number;
+  sentiment: {
+    positive: number;
+    neutral: number;
+    negative: number;
+  };
 }
 
 export interface Team {
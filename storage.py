@@ -0,0 +1,92 @@
+from flask.globals import app_ctx
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+
+# Engine and session setup shared by app.py and the gunicorn hooks
+
+def sqlite_uri(path, readonly=False):
+    if readonly:
+        return f'sqlite:///file:{path}?mode=ro&uri=true'
+    return f'sqlite:///{path}'
+
+def normalize_url(url):
+    # Pin the driver we ship (psycopg2); some hosting providers still hand
+    # out the postgres:// scheme
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            return 'postgresql+psycopg2://' + url[len(scheme):]
+    return url
+
+def readonly_url(url):
+    # A read-only twin of a write URL: SQLite files are opened read-only,
+    # PostgreSQL gets read-only transactions from engine_options()
+    parsed = make_url(url)
+    if parsed.get_backend_name() == 'sqlite' and parsed.database:
+        return sqlite_uri(parsed.database, readonly=True)
+    return url
+
+def engine_options(config, readonly=False, url=''):
+    prefix = 'DB_READ_' if readonly else 'DB_'
+    options = {
+        'pool_size': config[f'{prefix}POOL_SIZE'],
+        'max_overflow': config[f'{prefix}MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.startswith('postgresql'):
+        options['pool_pre_ping'] = True
+        if readonly:
+            # Appended to any options in the URL, such as a schema shard's search_path
+            url_options = make_url(url).query.get('options', '')
+            options['connect_args'] = {'options': f'{url_options} -c default_transaction_read_only=on'.strip()}
+    return options
+
+def sqlite_pragmas(config, readonly=False):
+    pragmas = [
+        f"busy_timeout = {config['SQLITE_BUSY_TIMEOUT_MS']}",
+        f"mmap_size = {config['SQLITE_MMAP_SIZE']}",
+        f"cache_size = {config['SQLITE_CACHE_SIZE']}",
+    ]
+    if readonly:
+        pragmas.append('query_only = ON')
+    else:
+        # journal_mode is stored in the database file, so only the writer sets it
+        pragmas += ['journal_mode = WAL', 'synchronous = NORMAL']
+    return pragmas
+
+def install_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+
+def dialect_insert(connection, table):
+    # INSERT with the backend's ON CONFLICT support. The dialect modules are
+    # imported on first use so a SQLite deployment never loads PostgreSQL's
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+class RoutingSession(Session):
+    # Asks route() for the engine of every statement, so one session can
+    # serve whichever shard the current request belongs to
+    def __init__(self, route, **kwargs):
+        super().__init__(**kwargs)
+        self.route = route
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind if bind is not None else self.route()
+
+def create_read_session(route):
+    # Scoped to the app context like db.session; removed on teardown
+    return scoped_session(
+        sessionmaker(class_=RoutingSession, route=route),
+        scopefunc=lambda: id(app_ctx._get_current_object())
+    )
@@ -0,0 +1,79 @@
+from collections import OrderedDict, namedtuple
+import re
+import threading
+import time
+from sqlalchemy import select
+
+# Organizations (tenants) and the shards holding their rows.
+#
+# A shard is a database: the primary one (DATABASE_URL or DATABASE_PATH)
+# is shard "default", and SHARDS names any others. Every shard carries the
+# full schema; each tenant's rows live in exactly one of them, either alone
+# or next to other tenants. The tenant directory, which says which shard
+# that is, is read from the primary database only.
+
+DEFAULT_SHARD = 'default'
+DEFAULT_TENANT = 'default'
+
+ACTIVE = 'active'
+# Rows are being copied to another shard; writes are refused until the move ends
+MOVING = 'moving'
+
+Tenant = namedtuple('Tenant', 'id shard status')
+
+def parse_shards(spec):
+    # 'big=postgresql://db2/feedback; eu=sqlite:////data/eu.db' -> {name: url}
+    shards = OrderedDict()
+    for entry in spec.split(';'):
+        if not entry.strip():
+            continue
+        name, _, url = entry.partition('=')
+        name = name.strip()
+        if not re.fullmatch(r'[a-z0-9_-]+', name) or not url.strip():
+            raise ValueError(f'Invalid shard {entry.strip()!r}; expected name=url')
+        if name == DEFAULT_SHARD:
+            raise ValueError(f'Shard {name!r} is the primary database and cannot be redefined')
+        shards[name] = url.strip()
+    return shards
+
+def bind_key(shard, readonly=False):
+    # The Flask-SQLAlchemy bind for a shard; the primary keeps its usual ones
+    if shard == DEFAULT_SHARD:
+        return 'readonly' if readonly else None
+    return f'shard:{shard}:readonly' if readonly else f'shard:{shard}'
+
+class TenantDirectory:
+    # Caches lookup(tenant_id) -> Tenant or None for `ttl` seconds. A move
+    # waits out the TTL so every process sees each of its steps
+    def __init__(self, lookup, ttl):
+        self.lookup = lookup
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id):
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        tenant = self.lookup(tenant_id)
+        # Misses aren't cached, so made-up tenant ids can't fill the cache
+        if tenant is not None:
+            with self._lock:
+                self._entries[tenant_id] = (time.monotonic() + self.ttl, tenant)
+        return tenant
+
+    def invalidate(self, tenant_id):
+        with self._lock:
+            self._entries.pop(tenant_id, None)
+
+def copy_rows(source, target, table, where, batch_size=1000):
+    # Streams the rows matching `where` from one connection to the other,
+    # committing each batch; returns how many were copied
+    count = 0
+    result = source.execution_options(yield_per=batch_size).execute(select(*table.columns).where(where))
+    for batch in result.partitions(batch_size):
+        target.execute(table.insert(), [dict(row._mapping) for row in batch])
+        target.commit()
+        count += len(batch)
+    return count
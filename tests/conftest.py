@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+# app.py reads its configuration from the environment on import, so this
+# runs first. Tests use a throwaway SQLite file unless TEST_DATABASE_URL
+# points at a PostgreSQL database they may empty.
+data_dir = tempfile.mkdtemp()
+os.environ['DATABASE_PATH'] = os.path.join(data_dir, 'feedback.db')
+if os.environ.get('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+else:
+    os.environ.pop('DATABASE_URL', None)
+os.environ.pop('DATABASE_READ_URL', None)
+# A second shard, for organizations kept apart from the primary database
+os.environ['SHARDS'] = f"other=sqlite:///{os.path.join(data_dir, 'other.db')}"
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ['METRICS_ENABLED'] = 'false'
+os.environ['LOGIN_HASH_WORKERS'] = '0'
+os.environ['NOTIFY_EMAIL_URL'] = 'fake://'
+
+import pytest
+from sqlalchemy import delete
+
+import app as server
+import tenancy
+
+@pytest.fixture(scope='session', autouse=True)
+def schema():
+    with server.app.app_context():
+        server.upgrade_db()
+
+@pytest.fixture
+def client():
+    # Every test starts from the demo data, with the other shard empty
+    with server.app.app_context():
+        for shard in server.shard_names():
+            with server.use_shard(shard):
+                for table in reversed(server.db.metadata.sorted_tables):
+                    statement = delete(table)
+                    if table.name == 'tenant':
+                        statement = statement.where(table.c.id != tenancy.DEFAULT_TENANT)
+                    server.db.session.execute(statement)
+                server.db.session.commit()
+        server.load_fixture(server.app.config['DEMO_FIXTURE'])
+    server.user_cache.clear()
+    server.tenant_directory.invalidate(tenancy.DEFAULT_TENANT)
+    return server.app.test_client()
+
+@pytest.fixture
+def login(client):
+    def login(email, password='password123', **body):
+        response = client.post('/api/auth/login', json={'email': email, 'password': password, **body})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': 'Bearer ' + response.get_json()['token']}
+    return login
+
+@pytest.fixture
+def db_session():
+    with server.app.app_context():
+        yield server.db.session
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import app as server
+
+def test_archiving_is_off_by_default():
+    assert server.app.config['FEEDBACK_ARCHIVE_AFTER_DAYS'] == 0
+
+def test_stats_and_search_follow_the_list(client, login, db_session):
+    headers = login('sarah.manager@company.com')
+    before = client.get('/api/feedback', headers=headers).get_json()['feedback']
+    archived = {feedback['id'] for feedback in before if feedback['acknowledged']}
+    assert archived
+    assert server.archive_feedback(datetime.utcnow()) == 4
+
+    for include_archived, expected in (('false', len(before) - len(archived)), ('true', len(before))):
+        query = {'include_archived': include_archived}
+        listed = client.get('/api/feedback', query_string=query, headers=headers).get_json()['feedback']
+        stats = client.get('/api/feedback/stats', query_string=query, headers=headers).get_json()['stats']
+        assert len(listed) == stats['total'] == expected
+        assert stats['acknowledged'] == sum(feedback['acknowledged'] for feedback in listed)
+
+    term = next(feedback for feedback in before if feedback['id'] in archived)['strengths'].split()[0]
+    hot = client.get('/api/feedback/search', query_string={'q': term}, headers=headers).get_json()['results']
+    assert not archived & {result['feedback']['id'] for result in hot}
+    results = client.get('/api/feedback/search', query_string={'q': term, 'include_archived': 'true'},
+                         headers=headers).get_json()['results']
+    found = [result for result in results if result['feedback']['id'] in archived]
+    assert found
+    assert results[:len(hot)] == hot
+    assert '<mark>' in found[0]['highlights']['strengths'] + found[0]['highlights']['areasToImprove']
+    assert found[0]['feedback'] == next(feedback for feedback in before if feedback['id'] == found[0]['feedback']['id'])
+
+    # Counters kept by the archiver agree with a rebuild from both tiers
+    rows = db_session.execute(server.select(server.FeedbackCounter)).scalars().all()
+    kept = {(row.manager_id, row.employee_id, row.positive, row.acknowledged, row.archived_positive, row.archived_acknowledged)
+            for row in rows}
+    server.rebuild_counters()
+    rows = db_session.execute(server.select(server.FeedbackCounter)).scalars().all()
+    assert kept == {(row.manager_id, row.employee_id, row.positive, row.acknowledged, row.archived_positive,
+                     row.archived_acknowledged) for row in rows}
+
+def test_search_pages_run_on_into_the_archive(client, login, db_session):
+    manager = login('sarah.manager@company.com')
+    employee = login('john.smith@company.com')
+    created = []
+    for _ in range(3):
+        response = client.post('/api/feedback', json={'employeeId': 'emp1', 'strengths': 'Quartz planning',
+                                                      'areasToImprove': 'Pacing', 'sentiment': 'positive'}, headers=manager)
+        created.append(response.get_json()['feedback']['id'])
+    for feedback_id in created[:2]:
+        client.post(f'/api/feedback/{feedback_id}/acknowledge', headers=employee)
+    server.archive_feedback(datetime.utcnow())
+
+    query = {'q': 'quartz', 'include_archived': 'true', 'limit': 1}
+    paged, offset = [], 0
+    while offset is not None:
+        body = client.get('/api/feedback/search', query_string={**query, 'offset': offset}, headers=manager).get_json()
+        paged += [result['feedback']['id'] for result in body['results']]
+        offset = body['nextOffset']
+    # The hot match ranks first, then the archived ones newest first
+    assert paged == [created[2], created[1], created[0]]
@@ -0,0 +1,27 @@
+import time
+from types import SimpleNamespace
+
+import app as server
+
+def me(client, headers):
+    return client.get('/api/auth/me', headers=headers).status_code
+
+def test_role_change_revokes_tokens(client, login, db_session):
+    headers = login('john.smith@company.com')
+    assert me(client, headers) == 200
+    db_session.get(server.User, 'emp1').role = 'manager'
+    db_session.commit()
+    assert me(client, headers) == 401
+
+def test_other_processes_revoke_within_the_cache_ttl(client, login, db_session, monkeypatch):
+    headers = login('john.smith@company.com')
+    assert me(client, headers) == 200
+    # Another worker's write: the row changes but this process's cache isn't told
+    db_session.execute(server.update(server.User).where(server.User.id == 'emp1')
+                       .values(token_version=server.User.token_version + 1))
+    db_session.commit()
+    assert me(client, headers) == 200
+
+    later = time.monotonic() + server.app.config['USER_CACHE_TTL'] + 1
+    monkeypatch.setattr(server, 'time', SimpleNamespace(**{**vars(time), 'monotonic': lambda: later}))
+    assert me(client, headers) == 401
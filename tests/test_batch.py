@@ -0,0 +1,44 @@
+import app as server
+import ids
+
+def item(employee_id='emp1', **fields):
+    return {'employeeId': employee_id, 'strengths': 'Ownership', 'areasToImprove': 'Estimates',
+            'sentiment': 'positive', **fields}
+
+def test_invalid_items_fail_alone(client, login):
+    headers = login('sarah.manager@company.com')
+    items = [item(), item(['emp1']), item(sentiment='great'), 'not an object', item('mgr2'), item(strengths=7), item()]
+    response = client.post('/api/feedback/batch', json={'items': items}, headers=headers)
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body['created'] == 2
+    assert [(result['index'], result['status']) for result in body['results']] == [
+        (0, 201), (1, 400), (2, 400), (3, 400), (4, 404), (5, 400), (6, 201)
+    ]
+    assert body['results'][1]['message'] == 'employeeId must be a string'
+
+    response = client.post('/api/feedback/batch', json={'items': [item({'id': 'emp1'})]}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['status'] == 400
+
+def test_batch_size_is_limited(client, login, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'FEEDBACK_BATCH_LIMIT', 3)
+    headers = login('sarah.manager@company.com')
+    response = client.post('/api/feedback/batch', json={'items': [item()] * 4}, headers=headers)
+    assert response.status_code == 400
+    assert client.post('/api/feedback/batch', json={'items': [item()] * 3}, headers=headers).status_code == 201
+
+def test_ids_sort_in_creation_order(client, login):
+    generated = [ids.new_id('fb') for _ in range(1000)]
+    assert sorted(generated) == generated
+    assert len(set(generated)) == len(generated)
+
+    headers = login('sarah.manager@company.com')
+    response = client.post('/api/feedback/batch', json={'items': [item()] * 20}, headers=headers)
+    created = [result['feedback']['id'] for result in response.get_json()['results']]
+    assert sorted(created) == created
+    later = client.post('/api/feedback', json=item(), headers=headers).get_json()['feedback']['id']
+    assert later > created[-1]
+    # Newest first, ties on created_at broken by id
+    listed = [feedback['id'] for feedback in client.get('/api/feedback', headers=headers).get_json()['feedback']]
+    assert listed[:21] == [later] + created[::-1]
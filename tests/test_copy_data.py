@@ -0,0 +1,28 @@
+from sqlalchemy import create_engine, func, select
+
+import app as server
+import migrations
+
+def count(connection, table):
+    return connection.scalar(select(func.count()).select_from(table))
+
+def test_copy_data_deduplicates_on_the_whole_key(client, db_session, tmp_path):
+    target = create_engine(f"sqlite:///{tmp_path / 'copy.db'}")
+    migrations.upgrade(target)
+    tables = [server.FeedbackRollup.__table__, server.UserHierarchy.__table__, server.FeedbackCounter.__table__]
+    source = db_session.get_bind()
+    with source.connect() as connection:
+        expected = {table.name: count(connection, table) for table in tables}
+        # Several rows share the first key column, and all of them must be copied
+        for table in tables[:2]:
+            first = table.primary_key.columns.values()[0]
+            assert connection.scalar(select(func.count(first.distinct()))) < expected[table.name]
+
+    copied = migrations.copy_data(source, target, tables, batch_size=7, log=lambda message: None)
+    assert copied == expected
+    # Rerunning an interrupted copy skips what is already there
+    copied = migrations.copy_data(source, target, tables, batch_size=7, log=lambda message: None)
+    assert copied == {name: 0 for name in expected}
+    with target.connect() as connection:
+        assert {table.name: count(connection, table) for table in tables} == expected
+    target.dispose()
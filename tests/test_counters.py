@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+import app as server
+
+def counters(session):
+    rows = session.execute(select(server.FeedbackCounter)).scalars()
+    return {(row.manager_id, row.employee_id): tuple(getattr(row, column) for column in server.COUNTER_COLUMNS)
+            for row in rows}
+
+def new_feedback(employee_id, sentiment='positive'):
+    return {'employeeId': employee_id, 'strengths': 'Clear writing', 'areasToImprove': 'Estimates', 'sentiment': sentiment}
+
+def test_concurrent_first_writes_for_a_pair_all_succeed(client, login):
+    # emp7 has no feedback yet, so every request races to create the counter row
+    headers = login('alex.manager@company.com')
+    def create(_):
+        return server.app.test_client().post('/api/feedback', json=new_feedback('emp7'), headers=headers).status_code
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(create, range(8)))
+    assert statuses == [201] * 8
+
+    stats = client.get('/api/feedback/stats', headers=headers).get_json()['stats']
+    assert stats['total'] == 10
+    assert stats['sentiment']['positive'] == 10
+    employee_stats = client.get('/api/feedback/stats', headers=login('anna.lee@company.com')).get_json()['stats']
+    assert employee_stats['total'] == 8
+
+def test_stats_do_not_write(client, login, db_session):
+    db_session.execute(server.FeedbackCounter.__table__.delete())
+    db_session.commit()
+    response = client.get('/api/feedback/stats', headers=login('sarah.manager@company.com'))
+    assert response.status_code == 200
+    assert response.get_json()['stats']['total'] == 0
+    assert db_session.scalar(select(func.count()).select_from(server.FeedbackCounter)) == 0
+
+def test_writes_keep_counters_equal_to_a_rebuild(client, login, db_session):
+    manager = login('sarah.manager@company.com')
+    created = client.post('/api/feedback', json=new_feedback('emp2', 'negative'), headers=manager).get_json()['feedback']
+    response = client.patch(f"/api/feedback/{created['id']}", json={'sentiment': 'neutral'},
+                            headers={**manager, 'If-Match': str(created['version'])})
+    assert response.status_code == 200
+    response = client.post(f"/api/feedback/{created['id']}/acknowledge", headers=login('emily.davis@company.com'))
+    assert response.status_code == 200
+
+    written = counters(db_session)
+    assert written[('mgr1', 'emp2')] == (1, 1, 0, 1)
+    server.rebuild_counters()
+    assert counters(db_session) == written
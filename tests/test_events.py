@@ -0,0 +1,69 @@
+import os
+import runpy
+from types import SimpleNamespace
+
+import app as server
+
+def test_streams_are_capped_per_process(client, login):
+    headers = login('john.smith@company.com')
+    streams = []
+    for _ in range(server.app.config['SSE_MAX_STREAMS']):
+        response = client.get('/api/events', headers=headers, buffered=False)
+        assert response.status_code == 200
+        assert next(response.response).startswith(b'retry:')
+        streams.append(response)
+
+    response = client.get('/api/events', headers=headers)
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+
+    # Closing a stream frees its slot
+    streams.pop().close()
+    response = client.get('/api/events', headers=headers, buffered=False)
+    assert response.status_code == 200
+    streams.append(response)
+    for response in streams:
+        response.close()
+
+def gunicorn_config(monkeypatch, **env):
+    monkeypatch.setattr(os, 'environ', {key: str(value) for key, value in env.items()})
+    return runpy.run_path(os.path.join(os.path.dirname(server.__file__), 'gunicorn.conf.py'))
+
+def start(config, workers):
+    warnings = []
+    log = SimpleNamespace(warning=lambda message, *args: warnings.append(message % args))
+    config['on_starting'](SimpleNamespace(cfg=SimpleNamespace(workers=workers), log=log))
+    return warnings
+
+def test_gunicorn_sizes_streams_from_the_worker(monkeypatch):
+    # Several workers without a broker still start, with the stream off
+    config = gunicorn_config(monkeypatch, GUNICORN_WORKERS=3)
+    assert os.environ['SSE_MAX_STREAMS'] == '0'
+    assert '/api/events is off' in start(config, 3)[0]
+
+    config = gunicorn_config(monkeypatch, GUNICORN_WORKERS=1, GUNICORN_THREADS=8)
+    assert os.environ['SSE_MAX_STREAMS'] == '4'
+    assert start(config, 1) == []
+    config = gunicorn_config(monkeypatch, GUNICORN_WORKERS=3, GUNICORN_WORKER_CLASS='gevent',
+                             EVENT_BROKER_URL='redis://localhost:6379/0')
+    assert os.environ['SSE_MAX_STREAMS'] == '900'
+    assert start(config, 3) == []
+
+    # An explicit cap is kept, with a warning that workers won't share events
+    config = gunicorn_config(monkeypatch, GUNICORN_WORKERS=3, SSE_MAX_STREAMS=5)
+    assert os.environ['SSE_MAX_STREAMS'] == '5'
+    assert 'EVENT_BROKER_URL' in start(config, 3)[0]
+
+def test_only_stream_tokens_go_in_the_url(client, login):
+    headers = login('john.smith@company.com')
+    response = client.get('/api/events', query_string={'access_token': headers['Authorization'][7:]})
+    assert response.status_code == 401
+
+    stream_token = client.post('/api/events/token', headers=headers).get_json()['token']
+    response = client.get('/api/events', query_string={'access_token': stream_token}, buffered=False)
+    assert response.status_code == 200
+    response.close()
+
+    # A leaked stream token opens no other endpoint
+    response = client.get('/api/feedback', headers={'Authorization': f'Bearer {stream_token}'})
+    assert response.status_code == 401
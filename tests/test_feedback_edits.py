@@ -0,0 +1,45 @@
+def current(client, headers):
+    return client.get('/api/feedback', headers=headers).get_json()['feedback']
+
+def test_patch_validates_like_create(client, login):
+    headers = login('sarah.manager@company.com')
+    before = next(feedback for feedback in current(client, headers) if feedback['id'] == 'fb1')
+    for body in ({'strengths': None}, {'strengths': ''}, {'areasToImprove': 7}, {'sentiment': 'great'},
+                 {'sentiment': ['positive']}):
+        response = client.patch('/api/feedback/fb1', json=body, headers=headers)
+        assert response.status_code == 400, body
+    assert client.patch('/api/feedback/fb1', json=['strengths'], headers=headers).status_code == 400
+    assert next(feedback for feedback in current(client, headers) if feedback['id'] == 'fb1') == before
+
+def test_if_match_makes_edits_conditional(client, login):
+    headers = login('sarah.manager@company.com')
+    version = next(feedback for feedback in current(client, headers) if feedback['id'] == 'fb1')['version']
+
+    response = client.patch('/api/feedback/fb1', json={'strengths': 'First'}, headers={**headers, 'If-Match': f'"{version}"'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{version + 1}"'
+
+    # The same version again is stale: nothing is written and the current row comes back
+    response = client.patch('/api/feedback/fb1', json={'strengths': 'Second'}, headers={**headers, 'If-Match': f'"{version}"'})
+    assert response.status_code == 409
+    assert response.get_json()['feedback']['strengths'] == 'First'
+    assert response.headers['ETag'] == f'"{version + 1}"'
+
+    # The ETag of a compressed response names the same version
+    response = client.patch('/api/feedback/fb1', json={'strengths': 'Third'},
+                            headers={**headers, 'If-Match': f'"{version + 1}-gzip"'})
+    assert response.status_code == 200
+
+    # Without If-Match the write is unconditional
+    response = client.patch('/api/feedback/fb1', json={'strengths': 'Fourth'}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['feedback']['version'] == version + 3
+
+def test_acknowledge_checks_if_match(client, login):
+    headers = login('emily.davis@company.com')
+    response = client.post('/api/feedback/fb2/acknowledge', headers={**headers, 'If-Match': '"999"'})
+    assert response.status_code == 409
+    assert response.get_json()['feedback']['acknowledged'] is False
+    version = response.get_json()['feedback']['version']
+    response = client.post('/api/feedback/fb2/acknowledge', headers={**headers, 'If-Match': f'"{version}"'})
+    assert response.status_code == 200
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import app as server
+
+def page_through(client, headers, limit):
+    ids, cursor = [], None
+    while True:
+        query = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        body = client.get('/api/feedback', query_string=query, headers=headers).get_json()
+        ids += [feedback['id'] for feedback in body['feedback']]
+        cursor = body['nextCursor']
+        if not cursor:
+            return ids
+
+def test_cursor_pages_cover_the_list_once(client, login):
+    headers = login('sarah.manager@company.com')
+    for _ in range(5):
+        client.post('/api/feedback', json={'employeeId': 'emp1', 'strengths': 'Pairing', 'areasToImprove': 'Docs',
+                                           'sentiment': 'neutral'}, headers=headers)
+    everything = [feedback['id'] for feedback in client.get('/api/feedback', headers=headers).get_json()['feedback']]
+    assert len(everything) == 9
+    assert page_through(client, headers, 2) == everything
+
+def test_etag_answers_304_until_feedback_changes(client, login):
+    manager = login('sarah.manager@company.com')
+    response = client.get('/api/feedback', headers=manager)
+    etag = response.headers['ETag']
+    assert client.get('/api/feedback', headers={**manager, 'If-None-Match': etag}).status_code == 304
+    # Another query is another representation
+    other = client.get('/api/feedback', query_string={'limit': 1}, headers={**manager, 'If-None-Match': etag})
+    assert other.status_code == 200
+
+    # A text edit changes neither count nor sentiment but must still show
+    fb = response.get_json()['feedback'][0]
+    client.patch(f"/api/feedback/{fb['id']}", json={'strengths': 'Edited'}, headers={**manager, 'If-Match': str(fb['version'])})
+    response = client.get('/api/feedback', headers={**manager, 'If-None-Match': etag})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    employee = login('emily.davis@company.com')
+    assert client.post('/api/feedback/fb2/acknowledge', headers=employee).status_code == 200
+    assert client.get('/api/feedback', headers={**manager, 'If-None-Match': etag}).status_code == 200
+
+def test_etag_follows_archiving(client, login, db_session):
+    manager = login('sarah.manager@company.com')
+    etag = client.get('/api/feedback', headers=manager).headers['ETag']
+    assert server.archive_feedback(server.datetime.utcnow()) > 0
+    assert client.get('/api/feedback', headers={**manager, 'If-None-Match': etag}).status_code == 200
+
+def test_manager_pages_are_read_in_index_order(client, login, db_session):
+    if db_session.get_bind().dialect.name != 'sqlite':
+        pytest.skip('checks the SQLite query plan')
+    headers = login('sarah.manager@company.com')
+    cursor = client.get('/api/feedback', query_string={'limit': 1}, headers=headers).get_json()['nextCursor']
+
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'ORDER BY' in statement:
+            statements.append((statement, parameters))
+    event.listen(Engine, 'before_cursor_execute', capture)
+    try:
+        for query in ({'limit': 1, 'cursor': cursor}, {'sentiment': 'positive', 'include_archived': 'true'}):
+            assert client.get('/api/feedback', query_string=query, headers=headers).status_code == 200
+    finally:
+        event.remove(Engine, 'before_cursor_execute', capture)
+
+    assert len(statements) == 3
+    connection = db_session.connection()
+    for statement, parameters in statements:
+        plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+        assert 'MERGE (UNION ALL)' in plan
+        assert not [step for step in plan if 'TEMP B-TREE' in step], plan
+
+def test_304_echoes_the_compressed_etag(client, login, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'COMPRESS_MIN_SIZE', 0)
+    headers = {**login('sarah.manager@company.com'), 'Accept-Encoding': 'gzip'}
+    response = client.get('/api/feedback', headers=headers)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    response = client.get('/api/feedback', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    # A client that no longer takes gzip gets the identity representation
+    response = client.get('/api/feedback', headers={**headers, 'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
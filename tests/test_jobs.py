@@ -0,0 +1,117 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as server
+import jobs
+
+class Clock(datetime):
+    # app.py's datetime, moved forward by tests
+    offset = timedelta()
+
+    @classmethod
+    def utcnow(cls):
+        return datetime.utcnow() + cls.offset
+
+@pytest.fixture
+def transport(client, monkeypatch):
+    transport = jobs.FakeTransport()
+    monkeypatch.setitem(server.transports, 'email', transport)
+    monkeypatch.setattr(Clock, 'offset', timedelta())
+    monkeypatch.setattr(server, 'datetime', Clock)
+    return transport
+
+def job_rows(db_session):
+    db_session.commit()
+    return db_session.execute(server.select(server.Job)).scalars().all()
+
+def test_an_idempotency_key_is_delivered_once(transport, db_session):
+    for _ in range(2):
+        server.enqueue_jobs(server.notification_jobs('feedback.created', ['fb1']))
+        db_session.commit()
+    assert server.work_batch('worker') == 1
+    assert server.work_batch('worker') == 0
+    assert [message.recipient for message in transport.sent] == ['john.smith@company.com']
+
+def test_a_failed_send_is_retried_after_backoff(transport, db_session):
+    server.enqueue_jobs(server.notification_jobs('feedback.created', ['fb1']))
+    db_session.commit()
+    transport.fail()
+    assert server.work_batch('worker') == 1
+    [job] = job_rows(db_session)
+    assert (job.status, job.attempts) == (jobs.PENDING, 1)
+    assert 'fake transport failure' in job.last_error
+    # Not due again until the backoff has passed, which is at most JOB_BACKOFF_BASE
+    assert server.work_batch('worker') == 0
+    Clock.offset = timedelta(seconds=server.app.config['JOB_BACKOFF_BASE'])
+    assert server.work_batch('worker') == 1
+    [job] = job_rows(db_session)
+    assert (job.status, job.attempts, job.last_error) == (jobs.DONE, 2, None)
+    assert len(transport.sent) == 1
+
+def test_jobs_that_keep_failing_are_parked(transport, db_session, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'JOB_MAX_ATTEMPTS', 2)
+    server.enqueue_jobs(server.notification_jobs('feedback.created', ['fb1']))
+    db_session.commit()
+    transport.fail(2)
+    for attempt in range(2):
+        Clock.offset = timedelta(hours=attempt)
+        assert server.work_batch('worker') == 1
+    [job] = job_rows(db_session)
+    assert (job.status, job.attempts) == (jobs.FAILED, 2)
+    Clock.offset = timedelta(days=1)
+    assert server.work_batch('worker') == 0
+
+    assert jobs.requeue_failed(db_session.connection(), server.Job.__table__, Clock.utcnow()) == 1
+    db_session.commit()
+    assert server.work_batch('worker') == 1
+    assert len(transport.sent) == 1
+
+def test_a_lapsed_lease_is_reclaimed_once(transport, db_session):
+    lease = server.app.config['JOB_LEASE_SECONDS']
+    server.enqueue_jobs(server.notification_jobs('feedback.created', ['fb1']))
+    db_session.commit()
+
+    claims = []
+    def other_worker(name):
+        with server.app.app_context():
+            claims.append((name, server.work_batch(name)))
+
+    send = transport.send
+    def slow_send(messages):
+        # The first send outlives its lease, and two other workers poll meanwhile
+        if Clock.offset < timedelta(seconds=lease):
+            Clock.offset = timedelta(seconds=lease + 1)
+            for name in ('worker-b', 'worker-c'):
+                thread = threading.Thread(target=other_worker, args=(name,))
+                thread.start()
+                thread.join()
+        return send(messages)
+    transport.send = slow_send
+
+    assert server.work_batch('worker-a') == 1
+    assert claims == [('worker-b', 1), ('worker-c', 0)]
+    # Delivery is at least once: both holders sent it
+    assert len(transport.sent) == 2
+    [job] = job_rows(db_session)
+    assert (job.status, job.attempts) == (jobs.DONE, 2)
+    Clock.offset = timedelta(seconds=lease * 3)
+    assert server.work_batch('worker-a') == 0
+
+def test_reminders_go_out_once_per_interval(transport, db_session, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'REMINDER_AFTER_HOURS', 0)
+    pending = db_session.execute(
+        server.select(server.Feedback.employee_id).where(server.Feedback.acknowledged.is_(False)).distinct()
+    ).scalars().all()
+    assert pending
+    # Every worker proposes the scan each period; rescans within the reminder interval queue nothing new
+    for _ in range(2):
+        server.scan_reminders([])
+        db_session.commit()
+    while server.work_batch('worker'):
+        pass
+    reminders = [message for message in transport.sent if message.subject.startswith('You have')]
+    assert len(reminders) == len(pending)
+    emails = db_session.execute(server.select(server.User.email).where(server.User.id.in_(pending))).scalars().all()
+    assert sorted(message.recipient for message in reminders) == sorted(emails)
@@ -0,0 +1,19 @@
+import pytest
+
+import app as server
+import ratelimit
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setitem(server.app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(server, 'rate_limit_store', ratelimit.MemoryStore(1000))
+
+def attempt(client, address, password):
+    return client.post('/api/auth/login', json={'email': 'john.smith@company.com', 'password': password},
+                       environ_base={'REMOTE_ADDR': address}).status_code
+
+def test_failed_logins_elsewhere_do_not_lock_the_owner_out(client, limits):
+    limit = server.app.config['RATE_LIMITS']['login']['account'].count
+    statuses = [attempt(client, '203.0.113.7', 'wrong') for _ in range(limit + 1)]
+    assert statuses == [401] * limit + [429]
+    assert attempt(client, '198.51.100.2', 'password123') == 200
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+def test_search_results_have_the_list_types(client, login):
+    headers = login('sarah.manager@company.com')
+    listed = {feedback['id']: feedback for feedback in client.get('/api/feedback', headers=headers).get_json()['feedback']}
+    acknowledged = next(feedback for feedback in listed.values() if feedback['acknowledged'])
+    term = acknowledged['strengths'].split()[0]
+
+    response = client.get('/api/feedback/search', query_string={'q': term}, headers=headers)
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results
+    for result in results:
+        feedback = result['feedback']
+        assert feedback == listed[feedback['id']]
+        assert isinstance(feedback['acknowledged'], bool)
+        datetime.fromisoformat(feedback['createdAt'])
+        assert isinstance(result['score'], float)
+        assert '<mark>' in result['highlights']['strengths'] + result['highlights']['areasToImprove']
+
+def test_search_survives_renumbered_rowids(client, login, db_session):
+    if db_session.get_bind().dialect.name != 'sqlite':
+        pytest.skip('checks the SQLite FTS5 index')
+    headers = login('sarah.manager@company.com')
+    for word in ('Quokka', 'Narwhal', 'Axolotl'):
+        client.post('/api/feedback', json={'employeeId': 'emp1', 'strengths': f'{word} wrangling',
+                                           'areasToImprove': 'Pacing', 'sentiment': 'positive'}, headers=headers)
+    # VACUUM, or a dump and restore, may hand out new rowids to a table
+    # whose key isn't an INTEGER PRIMARY KEY
+    db_session.execute(text('UPDATE feedback SET rowid = 1000 - rowid'))
+    db_session.commit()
+
+    for word in ('Quokka', 'Narwhal', 'Axolotl'):
+        [result] = client.get('/api/feedback/search', query_string={'q': word}, headers=headers).get_json()['results']
+        assert result['feedback']['strengths'] == f'{word} wrangling'
+        assert result['highlights']['strengths'] == f'<mark>{word}</mark> wrangling'
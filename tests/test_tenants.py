@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import app as server
+
+@pytest.fixture
+def other_tenant(client, tmp_path):
+    # The demo organization again, with the same user ids, on the other shard
+    with open(server.app.config['DEMO_FIXTURE'], encoding='utf-8') as f:
+        fixture = json.load(f)
+    for rows in fixture.values():
+        for row in rows:
+            row['tenant_id'] = 'acme'
+    for user in fixture['user']:
+        user['name'] = f"Acme {user['name']}"
+    path = tmp_path / 'acme.json'
+    path.write_text(json.dumps(fixture), encoding='utf-8')
+
+    with server.app.app_context():
+        server.db.session.add(server.Tenant(id='acme', name='Acme', shard='other'))
+        server.db.session.commit()
+        with server.use_shard('other'):
+            server.load_fixture(str(path))
+    return 'acme'
+
+def me(client, headers):
+    return client.get('/api/auth/me', headers=headers).get_json()['user']
+
+def test_same_user_id_in_two_shards(client, login, other_tenant):
+    default = login('john.smith@company.com')
+    acme = login('john.smith@company.com', tenant=other_tenant)
+    # Both cached, neither served for the other
+    for _ in range(2):
+        assert me(client, default)['name'] == 'John Smith'
+        assert me(client, acme)['name'] == 'Acme John Smith'
+
+def test_events_stay_in_their_tenant(client, login, other_tenant):
+    acme_employee = server.event_channel(other_tenant, 'emp1')
+    after = server.broker.latest_id(acme_employee)
+    client.post('/api/feedback', json={'employeeId': 'emp1', 'strengths': 'Focus', 'areasToImprove': 'Tests',
+                                       'sentiment': 'positive'}, headers=login('sarah.manager@company.com'))
+    assert server.broker.read(acme_employee, after, 0) == []
+    default_employee = server.event_channel(server.tenancy.DEFAULT_TENANT, 'emp1')
+    assert [event.event for event in server.broker.read(default_employee, after, 0)] == ['feedback.created']
+
+def test_token_must_match_the_users_tenant(client, login, db_session):
+    headers = login('john.smith@company.com')
+    db_session.execute(server.update(server.User).where(server.User.id == 'emp1').values(tenant_id='elsewhere'))
+    db_session.commit()
+    server.user_cache.clear()
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
@@ -0,0 +1,37 @@
+import app as server
+
+def move(db_session, user_id, manager_id):
+    # Through the ORM, so the hierarchy index follows
+    db_session.get(server.User, user_id).manager_id = manager_id
+    db_session.commit()
+    server.user_cache.clear()
+
+def listed(client, headers):
+    return {feedback['id']: feedback for feedback in client.get('/api/feedback', headers=headers).get_json()['feedback']}
+
+def total(client, headers):
+    return client.get('/api/feedback/stats', headers=headers).get_json()['stats']['total']
+
+def test_director_stats_match_the_list(client, login, db_session):
+    move(db_session, 'mgr1', 'mgr2')
+    headers = login('alex.manager@company.com')
+    feedback = listed(client, headers)
+    assert {item['managerId'] for item in feedback.values()} == {'mgr1', 'mgr2'}
+    assert total(client, headers) == len(feedback) == 6
+
+def test_managers_keep_seeing_feedback_they_wrote(client, login, db_session):
+    move(db_session, 'emp1', 'mgr3')
+    author = login('sarah.manager@company.com')
+    feedback = listed(client, author)
+    assert 'fb1' in feedback
+    assert total(client, author) == len(feedback)
+    results = client.get('/api/feedback/search', query_string={'q': feedback['fb1']['strengths'].split()[0]},
+                         headers=author).get_json()['results']
+    assert 'fb1' in {result['feedback']['id'] for result in results}
+
+    # The new manager sees it too, but only its author may change it
+    new_manager = login('maria.manager@company.com')
+    assert 'fb1' in listed(client, new_manager)
+    assert total(client, new_manager) == len(listed(client, new_manager))
+    response = client.patch('/api/feedback/fb1', json={'strengths': 'Edited'}, headers=new_manager)
+    assert response.status_code == 403